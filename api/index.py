@@ -1,21 +1,78 @@
 """
 Vercel Serverless Entry Point for ReMindMe Backend
 This file wraps the FastAPI application for Vercel serverless deployment.
+
+Every cold start imports this module, so it is kept lean: the database
+connection is started before the web framework loads, index creation runs
+off the request path once per instance, and libraries only some routes need
+(bcrypt, SMTP) are imported on first use. Measure with
+backend/benchmarks/bench_cold_start.py.
 """
-from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File
+import os
+import sys
+
+# Shared data layer lives alongside the local development server
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from database import Database
+
+# MongoDB Connection Pooling for Serverless
+_database = None
+
+def get_database():
+    """Singleton async database handle for serverless functions"""
+    global _database
+    if _database is None:
+        MONGO_URL = os.getenv("MONGO_URL")
+        if not MONGO_URL:
+            raise ValueError("MONGO_URL environment variable is not set")
+        _database = Database(
+            MONGO_URL,
+            maxPoolSize=10,
+            minPoolSize=1,
+            maxIdleTimeMS=45000,
+            serverSelectionTimeoutMS=5000
+        )
+    return _database
+
+# Pre-warm: the driver connects in background threads while the imports
+# below (FastAPI and pydantic take most of a cold start) are loading
+if os.getenv("MONGO_URL"):
+    get_database().warm_up()
+
+from fastapi import FastAPI, HTTPException, Depends, Query, Header, Request, Response, status, UploadFile, File, BackgroundTasks
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime, timedelta
-from pymongo import MongoClient
-from passlib.context import CryptContext
 from jose import JWTError, jwt
-import os
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import hashlib
+import json
+import time
 import uuid
-import pandas as pd
-import io
-import pytz
+
+from cache import TTLCache, cache_stats
+from message_cache import MessageCache
+from ai_service import AIMessageGenerator
+from sse import SSE_HEADERS, sse_event
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PaginationError
+from passwords import PasswordHasherBusy, hash_password, verify_password
+from repositories import UserRepository, ContactRepository, ReminderRepository, MessageRepository, ImportJobRepository, UserStatsRepository, EmailRepository
+from csv_import import CSVImportError, import_contacts
+from contact_bulk import MAX_BULK_OPERATIONS, apply_bulk
+from contact_export import ExportError, export_contacts, export_format
+from etags import conditional_get
+from contact_search import DEFAULT_SEARCH_RESULTS, MAX_SEARCH_RESULTS, search_contacts
+from reminder_schedule import compute_next_fire_at, roll_forward
+from user_stats import get_dashboard
+from email_delivery import EmailRateLimited, create_smtp_pool, enqueue_email, drain_outbox
+from reminder_dispatch import dispatch_until_idle
+from batch_generation import MAX_BATCH_ITEMS, generate_batch, items_due
+from import_jobs import create_import_job, process_job
 
 # Initialize FastAPI
 app = FastAPI(title="ReMindMe API")
@@ -33,53 +90,76 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# MongoDB Connection Pooling for Serverless
-_mongo_client = None
-
-def get_mongo_client():
-    """Singleton MongoDB client for serverless functions"""
-    global _mongo_client
-    if _mongo_client is None:
-        MONGO_URL = os.getenv("MONGO_URL")
-        if not MONGO_URL:
-            raise ValueError("MONGO_URL environment variable is not set")
-        _mongo_client = MongoClient(
-            MONGO_URL,
-            maxPoolSize=10,
-            minPoolSize=1,
-            maxIdleTimeMS=45000,
-            serverSelectionTimeoutMS=5000
-        )
-    return _mongo_client
-
-def get_database():
-    """Get database instance"""
-    client = get_mongo_client()
-    return client.get_database()
-
-# Initialize database and collections
+# Initialize database and repositories
 db = None
-users_collection = None
-contacts_collection = None
-reminders_collection = None
-messages_collection = None
+user_repo = None
+contact_repo = None
+reminder_repo = None
+message_repo = None
+import_job_repo = None
+user_stats_repo = None
+email_repo = None
+message_cache = None
+ai_generator = None
+smtp_pool = None
+indexes_task = None
+
+async def apply_indexes():
+    from indexes import ensure_indexes
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        print(f"Index creation failed: {e}")
 
 def init_collections():
-    """Initialize database collections"""
-    global db, users_collection, contacts_collection, reminders_collection, messages_collection
+    """Initialize database repositories"""
+    global db, user_repo, contact_repo, reminder_repo, message_repo, import_job_repo, user_stats_repo, email_repo
+    global message_cache, ai_generator, smtp_pool, indexes_task
     if db is None:
         db = get_database()
-        users_collection = db["users"]
-        contacts_collection = db["contacts"]
-        reminders_collection = db["reminders"]
-        messages_collection = db["messages"]
+        user_repo = UserRepository(db)
+        contact_repo = ContactRepository(db)
+        reminder_repo = ReminderRepository(db)
+        message_repo = MessageRepository(db)
+        import_job_repo = ImportJobRepository(db)
+        user_stats_repo = UserStatsRepository(db)
+        email_repo = EmailRepository(db)
+        message_cache = MessageCache(db)
+        ai_generator = AIMessageGenerator(message_cache)
+        smtp_pool = create_smtp_pool()
+        # Once per instance and off the request path, rather than on every cold start's critical path
+        indexes_task = asyncio.get_running_loop().create_task(apply_indexes())
+
+# Vercel stops a function at its maxDuration, 10 s unless vercel.json raises it.
+# A slice cut off there leaves its import, email or reminder leases to expire
+# instead of being released, so every slice below, plus the request that
+# starts it, must fit in FUNCTION_TIMEOUT_SECONDS. Raise them together.
+FUNCTION_TIMEOUT_SECONDS = float(os.getenv("FUNCTION_TIMEOUT_SECONDS", "10"))
+# Background imports run in bounded slices; progress is checkpointed and the
+# next slice resumes it
+IMPORT_SLICE_SECONDS = float(os.getenv("IMPORT_SLICE_SECONDS", "7"))
+# Queued emails are sent the same way, after the response that queued them
+EMAIL_SLICE_SECONDS = float(os.getenv("EMAIL_SLICE_SECONDS", "6"))
+# Reminders are dispatched by a Vercel cron job (see vercel.json), which
+# authenticates with "Authorization: Bearer $CRON_SECRET"
+CRON_SECRET = os.getenv("CRON_SECRET")
+# /api/metrics requires "Authorization: Bearer $METRICS_TOKEN" and is disabled while unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+REMINDER_SLICE_SECONDS = float(os.getenv("REMINDER_SLICE_SECONDS", "5"))
+# Kept free of slices for the cold start and the response itself
+SLICE_HEADROOM_SECONDS = 2
+WORKER_ID = f"vercel-{uuid.uuid4()}"
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 JWT_SECRET = os.getenv("JWT_SECRET_KEY", "your-secret-key")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXPIRATION = int(os.getenv("JWT_EXPIRATION_MINUTES", "43200"))
+token_cache = TTLCache(
+    "tokens",
+    int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "3600"))
+)
 
 # Pydantic Models
 class UserSignup(BaseModel):
@@ -112,6 +192,15 @@ class ContactUpdate(BaseModel):
     tags: Optional[List[str]] = None
     custom_fields: Optional[Dict[str, Any]] = None
 
+class ContactBulkOperation(BaseModel):
+    op: Literal["create", "update", "delete", "add_tags", "remove_tags"]
+    contact_id: Optional[str] = None  # all but create
+    contact: Optional[ContactUpdate] = None  # fields for create and update
+    tags: Optional[List[str]] = None  # for add_tags and remove_tags
+
+class ContactBulk(BaseModel):
+    operations: List[ContactBulkOperation]
+
 class ReminderCreate(BaseModel):
     contact_id: str
     occasion_type: str
@@ -125,19 +214,27 @@ class MessageGenerate(BaseModel):
     occasion_type: str
     tone: str = "friendly"
     custom_context: Optional[str] = None
+    force_regenerate: bool = False
+
+class BatchMessageItem(BaseModel):
+    contact_id: str
+    occasion_type: str
+    tone: str = "friendly"
+    custom_context: Optional[str] = None
+
+class MessageGenerateBatch(BaseModel):
+    items: Optional[List[BatchMessageItem]] = None
+    due_within_days: Optional[int] = Field(None, ge=0, le=365)  # or every reminder due in this window
+    tone: str = "friendly"  # used for reminders due within the window
+    force_regenerate: bool = False
 
 class EmailSend(BaseModel):
     to_email: str
     subject: str
     body: str
+    message_id: Optional[str] = None
 
 # Utility Functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=JWT_EXPIRATION)
@@ -145,14 +242,20 @@ def create_access_token(data: dict) -> str:
     return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 def decode_token(token: str) -> dict:
+    # Verified payloads are cached by token hash until the token's exp
+    token_key = hashlib.sha256(token.encode()).hexdigest()
+    payload = token_cache.get(token_key)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
         )
+    token_cache.set(token_key, payload, expires_at=payload.get("exp"))
+    return payload
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     init_collections()
@@ -164,7 +267,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
         )
-    user = users_collection.find_one({"user_id": user_id})
+    user = await user_repo.get_by_id(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -172,16 +275,36 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
     return user
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy(request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
 # API Routes
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "service": "ReMindMe API", "environment": "vercel"}
 
+@app.get("/api/metrics")
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    if not METRICS_TOKEN or authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    init_collections()
+    return {
+        "caches": cache_stats(),
+        "ai_message_cache": message_cache.stats(),
+        "ai_generator": ai_generator.stats(),
+        "email": smtp_pool.stats() if smtp_pool else None
+    }
+
 # Authentication Routes
 @app.post("/api/auth/signup")
 async def signup(user_data: UserSignup):
     init_collections()
-    if users_collection.find_one({"email": user_data.email}):
+    if await user_repo.get_by_email(user_data.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -191,7 +314,7 @@ async def signup(user_data: UserSignup):
     user = {
         "user_id": user_id,
         "email": user_data.email,
-        "password": hash_password(user_data.password),
+        "password": await hash_password(user_data.password),
         "name": user_data.name,
         "timezone": user_data.timezone,
         "subscription_tier": "free",
@@ -201,7 +324,14 @@ async def signup(user_data: UserSignup):
             "reminder_advance_days": 3
         }
     }
-    users_collection.insert_one(user)
+    try:
+        await user_repo.create(user)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent signup for the same email
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     
     token = create_access_token({"sub": user_id})
     
@@ -215,13 +345,18 @@ async def signup(user_data: UserSignup):
 @app.post("/api/auth/login")
 async def login(credentials: UserLogin):
     init_collections()
-    user = users_collection.find_one({"email": credentials.email})
-    if not user or not verify_password(credentials.password, user["password"]):
+    user = await user_repo.get_by_email(credentials.email)
+    valid, new_hash = await verify_password(credentials.password, user["password"]) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
+    # Transparently upgrade hashes made with an outdated bcrypt cost
+    if new_hash:
+        await user_repo.update(user["user_id"], {"password": new_hash})
+    
     token = create_access_token({"sub": user["user_id"]})
     
     return {
@@ -254,25 +389,75 @@ async def create_contact(contact: ContactCreate, current_user: dict = Depends(ge
         "last_contacted": None,
         "contact_frequency": 0
     }
-    contacts_collection.insert_one(contact_data)
+    await contact_repo.create(contact_data)
     return {"contact_id": contact_id, "message": "Contact created successfully"}
 
 @app.get("/api/contacts")
-async def get_contacts(current_user: dict = Depends(get_current_user)):
+async def get_contacts(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+    include_total: bool = False,
+    tag: Optional[List[str]] = Query(None),
+    relationship: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    init_collections()
+    not_modified = await conditional_get(request, response, user_stats_repo, current_user["user_id"])
+    if not_modified:
+        return not_modified
+    try:
+        page = await contact_repo.list_page(
+            current_user["user_id"], sort, limit, cursor, fields, include_total, tag, relationship
+        )
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    body = {"contacts": page["items"], "next_cursor": page["next_cursor"]}
+    if include_total:
+        body["total"] = page["total"]
+    return body
+
+# Declared before /api/contacts/{contact_id}, which would otherwise match them
+@app.get("/api/contacts/facets")
+async def get_contact_facets(current_user: dict = Depends(get_current_user)):
     init_collections()
-    contacts = list(contacts_collection.find(
-        {"user_id": current_user["user_id"]},
-        {"_id": 0}
-    ))
+    return await contact_repo.facets(current_user["user_id"])
+
+@app.get("/api/contacts/search")
+async def find_contacts(
+    q: str,
+    limit: int = Query(DEFAULT_SEARCH_RESULTS, ge=1, le=MAX_SEARCH_RESULTS),
+    current_user: dict = Depends(get_current_user)
+):
+    init_collections()
+    contacts = await search_contacts(contact_repo, current_user["user_id"], q, limit)
     return {"contacts": contacts}
 
+@app.get("/api/contacts/export")
+async def export_contacts_file(
+    format: str = "csv",
+    current_user: dict = Depends(get_current_user)
+):
+    init_collections()
+    try:
+        media_type, extension = export_format(format)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        export_contacts(contact_repo, current_user["user_id"], format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="contacts.{extension}"'}
+    )
+
 @app.get("/api/contacts/{contact_id}")
 async def get_contact(contact_id: str, current_user: dict = Depends(get_current_user)):
     init_collections()
-    contact = contacts_collection.find_one(
-        {"contact_id": contact_id, "user_id": current_user["user_id"]},
-        {"_id": 0}
-    )
+    contact = await contact_repo.get(current_user["user_id"], contact_id)
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
     return contact
@@ -288,12 +473,9 @@ async def update_contact(
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    result = contacts_collection.update_one(
-        {"contact_id": contact_id, "user_id": current_user["user_id"]},
-        {"$set": update_data}
-    )
+    matched = await contact_repo.update(current_user["user_id"], contact_id, update_data)
     
-    if result.matched_count == 0:
+    if matched == 0:
         raise HTTPException(status_code=404, detail="Contact not found")
     
     return {"message": "Contact updated successfully"}
@@ -301,62 +483,70 @@ async def update_contact(
 @app.delete("/api/contacts/{contact_id}")
 async def delete_contact(contact_id: str, current_user: dict = Depends(get_current_user)):
     init_collections()
-    result = contacts_collection.delete_one(
-        {"contact_id": contact_id, "user_id": current_user["user_id"]}
-    )
-    if result.deleted_count == 0:
+    deleted = await contact_repo.delete(current_user["user_id"], contact_id)
+    if deleted == 0:
         raise HTTPException(status_code=404, detail="Contact not found")
     
-    reminders_collection.delete_many({"contact_id": contact_id})
+    await reminder_repo.delete_for_contact(current_user["user_id"], contact_id)
     
     return {"message": "Contact deleted successfully"}
 
+@app.post("/api/contacts/bulk")
+async def bulk_update_contacts(bulk: ContactBulk, current_user: dict = Depends(get_current_user)):
+    init_collections()
+    if len(bulk.operations) > MAX_BULK_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_OPERATIONS} operations per request")
+    
+    operations = [operation.dict() for operation in bulk.operations]
+    return await apply_bulk(contact_repo, reminder_repo, current_user["user_id"], operations)
+
 @app.post("/api/contacts/import/csv")
 async def import_contacts_csv(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    background: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
     init_collections()
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
     
+    if background:
+        job = await create_import_job(file, current_user["user_id"], import_job_repo)
+        background_tasks.add_task(
+            process_job, import_job_repo, contact_repo, WORKER_ID, job["job_id"], IMPORT_SLICE_SECONDS
+        )
+        return {"job_id": job["job_id"], "status": job["status"], "message": "Import queued"}
+    
     try:
-        contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-        
-        imported_count = 0
-        for _, row in df.iterrows():
-            contact_id = str(uuid.uuid4())
-            contact_data = {
-                "contact_id": contact_id,
-                "user_id": current_user["user_id"],
-                "name": row.get('name', row.get('Name', '')),
-                "email": row.get('email', row.get('Email', None)),
-                "phone": row.get('phone', row.get('Phone', None)),
-                "birthday": row.get('birthday', row.get('Birthday', None)),
-                "relationship": row.get('relationship', row.get('Relationship', None)),
-                "notes": row.get('notes', row.get('Notes', None)),
-                "tags": [],
-                "custom_fields": {},
-                "created_at": datetime.utcnow().isoformat(),
-                "last_contacted": None,
-                "contact_frequency": 0
-            }
-            contacts_collection.insert_one(contact_data)
-            imported_count += 1
-        
-        return {"message": f"Successfully imported {imported_count} contacts"}
-    except Exception as e:
+        report = await import_contacts(file.file, current_user["user_id"], contact_repo)
+    except CSVImportError as e:
         raise HTTPException(status_code=400, detail=f"Error importing CSV: {str(e)}")
+    
+    return report.to_dict()
+
+@app.get("/api/contacts/import/jobs/{job_id}")
+async def get_import_job(
+    job_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    init_collections()
+    job = await import_job_repo.get(current_user["user_id"], job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    # Polling drives the job forward: claim succeeds only if no live slice holds it
+    if job["status"] in ("pending", "running"):
+        background_tasks.add_task(
+            process_job, import_job_repo, contact_repo, WORKER_ID, job_id, IMPORT_SLICE_SECONDS
+        )
+    return job
 
 # Reminder Routes
 @app.post("/api/reminders")
 async def create_reminder(reminder: ReminderCreate, current_user: dict = Depends(get_current_user)):
     init_collections()
-    contact = contacts_collection.find_one({
-        "contact_id": reminder.contact_id,
-        "user_id": current_user["user_id"]
-    })
+    contact = await contact_repo.get(current_user["user_id"], reminder.contact_id)
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
     
@@ -366,59 +556,75 @@ async def create_reminder(reminder: ReminderCreate, current_user: dict = Depends
         "user_id": current_user["user_id"],
         **reminder.dict(),
         "status": "active",
+        "next_fire_at": compute_next_fire_at(
+            reminder.occasion_date, reminder.reminder_days_before, reminder.is_recurring
+        ),
         "created_at": datetime.utcnow().isoformat()
     }
-    reminders_collection.insert_one(reminder_data)
+    await reminder_repo.create(reminder_data)
     return {"reminder_id": reminder_id, "message": "Reminder created successfully"}
 
 @app.get("/api/reminders")
-async def get_reminders(current_user: dict = Depends(get_current_user)):
+async def get_reminders(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+    include_total: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
     init_collections()
-    reminders = list(reminders_collection.find(
-        {"user_id": current_user["user_id"]},
-        {"_id": 0}
-    ))
-    return {"reminders": reminders}
+    not_modified = await conditional_get(request, response, user_stats_repo, current_user["user_id"])
+    if not_modified:
+        return not_modified
+    try:
+        page = await reminder_repo.list_page(
+            current_user["user_id"], sort, limit, cursor, fields, include_total
+        )
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    body = {"reminders": page["items"], "next_cursor": page["next_cursor"]}
+    if include_total:
+        body["total"] = page["total"]
+    return body
 
 @app.get("/api/reminders/upcoming")
-async def get_upcoming_reminders(days: int = 30, current_user: dict = Depends(get_current_user)):
+async def get_upcoming_reminders(
+    request: Request,
+    response: Response,
+    days: int = Query(30, ge=1, le=366),
+    current_user: dict = Depends(get_current_user)
+):
     init_collections()
-    reminders = list(reminders_collection.find(
-        {"user_id": current_user["user_id"], "status": "active"},
-        {"_id": 0}
-    ))
-    
-    upcoming = []
+    not_modified = await conditional_get(request, response, user_stats_repo, current_user["user_id"])
+    if not_modified:
+        return not_modified
     today = datetime.utcnow().date()
+    window_start = datetime.combine(today, datetime.min.time())
+    window_end = window_start + timedelta(days=days + 1)
+    
+    await roll_forward(reminder_repo, current_user["user_id"], today)
+    reminders = await reminder_repo.list_upcoming(current_user["user_id"], window_start, window_end)
+    contacts = await contact_repo.get_summaries(
+        current_user["user_id"], {reminder["contact_id"] for reminder in reminders}
+    )
     
     for reminder in reminders:
-        try:
-            occasion_date = datetime.fromisoformat(reminder['occasion_date']).date()
-            reminder_date = occasion_date - timedelta(days=reminder.get('reminder_days_before', 3))
-            
-            if today <= reminder_date <= today + timedelta(days=days):
-                contact = contacts_collection.find_one(
-                    {"contact_id": reminder['contact_id']},
-                    {"_id": 0, "name": 1, "email": 1}
-                )
-                reminder['contact_name'] = contact.get('name', 'Unknown') if contact else 'Unknown'
-                reminder['contact_email'] = contact.get('email', '') if contact else ''
-                reminder['days_until'] = (reminder_date - today).days
-                upcoming.append(reminder)
-        except Exception:
-            continue
+        contact = contacts.get(reminder["contact_id"])
+        reminder['contact_name'] = contact.get('name', 'Unknown') if contact else 'Unknown'
+        reminder['contact_email'] = contact.get('email', '') if contact else ''
+        reminder['days_until'] = (reminder["next_fire_at"].date() - today).days
     
-    upcoming.sort(key=lambda x: x.get('days_until', 999))
-    return {"upcoming_reminders": upcoming}
+    return {"upcoming_reminders": reminders}
 
 @app.delete("/api/reminders/{reminder_id}")
 async def delete_reminder(reminder_id: str, current_user: dict = Depends(get_current_user)):
     init_collections()
-    result = reminders_collection.delete_one({
-        "reminder_id": reminder_id,
-        "user_id": current_user["user_id"]
-    })
-    if result.deleted_count == 0:
+    deleted = await reminder_repo.delete(current_user["user_id"], reminder_id)
+    if deleted == 0:
         raise HTTPException(status_code=404, detail="Reminder not found")
     return {"message": "Reminder deleted successfully"}
 
@@ -426,73 +632,21 @@ async def delete_reminder(reminder_id: str, current_user: dict = Depends(get_cur
 @app.post("/api/messages/generate")
 async def generate_message(message_request: MessageGenerate, current_user: dict = Depends(get_current_user)):
     init_collections()
-    contact = contacts_collection.find_one(
-        {"contact_id": message_request.contact_id, "user_id": current_user["user_id"]},
-        {"_id": 0}
-    )
+    # Get contact info
+    contact = await contact_repo.get(current_user["user_id"], message_request.contact_id)
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
     
-    # AI Message Generation
-    try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
-        
-        # Build tone-specific instructions
-        tone_instructions = {
-            "friendly": "You are a friendly and casual message writer. Write warm, approachable messages that feel personal and genuine.",
-            "professional": "You are a professional message writer. Write polite, respectful messages suitable for business contexts.",
-            "warm": "You are a warm and affectionate message writer. Write heartfelt, caring messages that express genuine emotion.",
-            "concise": "You are a concise message writer. Write brief, to-the-point messages that are friendly but efficient."
-        }
-        
-        system_message = tone_instructions.get(message_request.tone, tone_instructions["friendly"])
-        
-        # Build prompt
-        occasion_prompts = {
-            "birthday": f"Write a {message_request.tone} birthday message for {contact['name']}.",
-            "anniversary": f"Write a {message_request.tone} anniversary message for {contact['name']}.",
-            "follow-up": f"Write a {message_request.tone} follow-up/check-in message for {contact['name']} to reconnect.",
-            "custom": f"Write a {message_request.tone} personalized message for {contact['name']}."
-        }
-        
-        base_prompt = occasion_prompts.get(message_request.occasion_type, occasion_prompts["custom"])
-        
-        if contact.get('relationship'):
-            base_prompt += f" They are my {contact['relationship'].lower()}."
-        
-        if contact.get('notes'):
-            base_prompt += f" Context: {contact['notes'][:200]}"
-        
-        if message_request.custom_context:
-            base_prompt += f" Additional context: {message_request.custom_context}"
-        
-        base_prompt += " Do not include greetings like 'Subject:' or email formatting. Just write the message content."
-        
-        # Get AI response
-        api_key = os.getenv("EMERGENT_LLM_KEY")
-        session_id = f"msg_{message_request.occasion_type}_{hash(contact['name'])}"
-        
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("gemini", "gemini-2.0-flash")
-        
-        user_message = UserMessage(text=base_prompt)
-        response = await chat.send_message(user_message)
-        message = response.strip()
-        
-        # Clean up response
-        for prefix in ["Subject:", "Message:", "Here's", "Here is"]:
-            if message.startswith(prefix):
-                message = message[len(prefix):].strip()
-                if message.startswith(":"):
-                    message = message[1:].strip()
-        
-    except Exception as e:
-        print(f"AI generation failed: {e}")
-        # Fallback template
-        message = f"Hi {contact['name']}! Hope you're doing well. Looking forward to catching up soon!"
+    # Falls back to a template when the AI is unavailable
+    message = await ai_generator.generate_message(
+        contact_name=contact['name'],
+        occasion_type=message_request.occasion_type,
+        tone=message_request.tone,
+        custom_context=message_request.custom_context,
+        relationship=contact.get('relationship'),
+        notes=contact.get('notes'),
+        force_regenerate=message_request.force_regenerate
+    )
     
     # Save generated message
     message_id = str(uuid.uuid4())
@@ -505,53 +659,168 @@ async def generate_message(message_request: MessageGenerate, current_user: dict
         "generated_message": message,
         "created_at": datetime.utcnow().isoformat()
     }
-    messages_collection.insert_one(message_data)
+    await message_repo.create(message_data)
     
     return {"message": message, "message_id": message_id}
 
+@app.post("/api/messages/generate/stream")
+async def generate_message_stream(message_request: MessageGenerate, current_user: dict = Depends(get_current_user)):
+    init_collections()
+    contact = await contact_repo.get(current_user["user_id"], message_request.contact_id)
+    if not contact:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    
+    async def events():
+        # "token" events carry text as it is generated; "done" carries the
+        # saved message, which replaces the streamed text if the AI failed midway
+        parts = []
+        replaced = False
+        try:
+            async for text in ai_generator.stream_message(
+                contact_name=contact['name'],
+                occasion_type=message_request.occasion_type,
+                tone=message_request.tone,
+                custom_context=message_request.custom_context,
+                relationship=contact.get('relationship'),
+                notes=contact.get('notes'),
+                force_regenerate=message_request.force_regenerate
+            ):
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+            message = "".join(parts)
+        except Exception:
+            replaced = True
+            message = ai_generator.fallback_message(
+                contact['name'], message_request.occasion_type, message_request.tone
+            )
+        
+        message_id = str(uuid.uuid4())
+        await message_repo.create({
+            "message_id": message_id,
+            "user_id": current_user["user_id"],
+            "contact_id": message_request.contact_id,
+            "occasion_type": message_request.occasion_type,
+            "tone": message_request.tone,
+            "generated_message": message,
+            "created_at": datetime.utcnow().isoformat()
+        })
+        yield sse_event("done", {"message": message, "message_id": message_id, "replaced": replaced})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/api/messages/generate/batch")
+async def generate_messages_batch(
+    batch: MessageGenerateBatch,
+    stream: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    init_collections()
+    if batch.items:
+        if len(batch.items) > MAX_BATCH_ITEMS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ITEMS} items per batch")
+        items = [item.dict() for item in batch.items]
+    elif batch.due_within_days is not None:
+        await roll_forward(reminder_repo, current_user["user_id"])
+        items = await items_due(current_user["user_id"], batch.due_within_days, batch.tone, reminder_repo)
+    else:
+        raise HTTPException(status_code=400, detail="Provide items or due_within_days")
+    
+    results = generate_batch(
+        current_user["user_id"], items, ai_generator, contact_repo, message_repo, batch.force_regenerate
+    )
+    
+    # Newline-delimited JSON, one line per draft in completion order
+    if stream:
+        async def lines():
+            async for result in results:
+                yield json.dumps(result) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    collected = [result async for result in results]
+    collected.sort(key=lambda result: result["index"])
+    return {"results": collected, "generated": sum(1 for result in collected if "message" in result)}
+
 # Analytics Routes
 @app.get("/api/analytics/stale-contacts")
 async def get_stale_contacts(months: int = 3, current_user: dict = Depends(get_current_user)):
     init_collections()
     cutoff_date = datetime.utcnow() - timedelta(days=months * 30)
     
-    contacts = list(contacts_collection.find(
-        {
-            "user_id": current_user["user_id"],
-            "$or": [
-                {"last_contacted": {"$lt": cutoff_date.isoformat()}},
-                {"last_contacted": None}
-            ]
-        },
-        {"_id": 0}
-    ))
+    contacts = await contact_repo.list_stale(current_user["user_id"], cutoff_date.isoformat())
     
     return {"stale_contacts": contacts, "count": len(contacts)}
 
 @app.get("/api/analytics/dashboard")
-async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
+async def get_dashboard_stats(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     init_collections()
-    total_contacts = contacts_collection.count_documents({"user_id": current_user["user_id"]})
-    total_reminders = reminders_collection.count_documents({"user_id": current_user["user_id"], "status": "active"})
-    
-    upcoming = await get_upcoming_reminders(7, current_user)
-    stale = await get_stale_contacts(3, current_user)
-    
-    return {
-        "total_contacts": total_contacts,
-        "total_reminders": total_reminders,
-        "upcoming_events_count": len(upcoming["upcoming_reminders"]),
-        "stale_contacts_count": stale["count"]
-    }
-
-# Email sending route (placeholder)
-@app.post("/api/email/send")
-async def send_email(email_data: EmailSend, current_user: dict = Depends(get_current_user)):
-    return {
-        "message": "Email sending is configured as placeholder. Add SMTP credentials to environment.",
-        "to": email_data.to_email,
-        "subject": email_data.subject
-    }
+    not_modified = await conditional_get(request, response, user_stats_repo, current_user["user_id"])
+    if not_modified:
+        return not_modified
+    return await get_dashboard(current_user["user_id"], contact_repo, reminder_repo, user_stats_repo)
+
+# Email Routes
+@app.post("/api/email/send", status_code=status.HTTP_202_ACCEPTED)
+async def send_email(
+    email_data: EmailSend,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    init_collections()
+    if smtp_pool is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Email delivery is not configured. Add SMTP credentials to environment."
+        )
+    try:
+        email = await enqueue_email(
+            email_repo,
+            current_user["user_id"],
+            email_data.to_email,
+            email_data.subject,
+            email_data.body,
+            email_data.message_id
+        )
+    except EmailRateLimited as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    # Also picks up earlier emails that are due for a retry
+    background_tasks.add_task(drain_outbox, email_repo, message_repo, smtp_pool, WORKER_ID, EMAIL_SLICE_SECONDS)
+    return {"email_id": email["email_id"], "status": email["status"], "message": "Email queued"}
+
+@app.get("/api/email/{email_id}")
+async def get_email_status(
+    email_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    init_collections()
+    email = await email_repo.get(current_user["user_id"], email_id)
+    if not email:
+        raise HTTPException(status_code=404, detail="Email not found")
+    # Polling drives retries forward, as with import jobs
+    if email["status"] in ("queued", "sending") and smtp_pool:
+        background_tasks.add_task(drain_outbox, email_repo, message_repo, smtp_pool, WORKER_ID, EMAIL_SLICE_SECONDS)
+    return email
+
+# Scheduled Jobs
+@app.get("/api/cron/reminders")
+async def dispatch_reminders(background_tasks: BackgroundTasks, authorization: Optional[str] = Header(None)):
+    if not CRON_SECRET or authorization != f"Bearer {CRON_SECRET}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid cron secret")
+    init_collections()
+    started = time.monotonic()
+    # No background roll-forward runs here, so recurring reminders are re-armed first
+    await roll_forward(reminder_repo)
+    dispatched = await dispatch_until_idle(
+        reminder_repo, contact_repo, user_repo, message_repo, email_repo, ai_generator, WORKER_ID,
+        send_email=smtp_pool is not None, time_budget=REMINDER_SLICE_SECONDS
+    )
+    # Emails get what the dispatch left of the function's limit; the rest stay queued
+    email_budget = min(
+        EMAIL_SLICE_SECONDS, FUNCTION_TIMEOUT_SECONDS - SLICE_HEADROOM_SECONDS - (time.monotonic() - started)
+    )
+    if dispatched and smtp_pool and email_budget > 0:
+        background_tasks.add_task(drain_outbox, email_repo, message_repo, smtp_pool, WORKER_ID, email_budget)
+    return {"dispatched": dispatched}
 
 # Vercel serverless handler
 handler = app
@@ -1,16 +1,103 @@
 """
-AI Service for generating personalized messages using Gemini via Emergent LLM Key
+AI Service for generating personalized messages using Gemini
+
+The model is reached through a provider from llm_providers.py (LLM_BACKEND).
+
+Generated messages are cached by prompt (see message_cache.py); template
+fallbacks are never cached so a transient AI failure is retried next time.
+Concurrent requests for the same prompt share a single model call.
+
+Every model call has a deadline (LLM_TIMEOUT_SECONDS) and goes through a
+circuit breaker: after LLM_BREAKER_FAILURES consecutive failures or timeouts
+the fallback template is served without calling the model, until a probe
+call after LLM_BREAKER_RESET_SECONDS succeeds.
+
+generate_messages packs up to LLM_PACK_SIZE prompts that share a system
+message into one model request (see prompt_packing.py), falling back to
+individual generations for any item the packed reply does not cover.
 """
 import os
-from emergentintegrations.llm.chat import LlmChat, UserMessage
 import asyncio
-from typing import Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from llm_providers import LLMProvider, create_provider
+from message_cache import MessageCache, cache_key
+from prompt_packing import build_packed_prompt, parse_packed_reply
+from single_flight import SingleFlight
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "10"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+LLM_PACK_SIZE = int(os.getenv("LLM_PACK_SIZE", "10"))
+LLM_PACK_TIMEOUT_SECONDS = float(os.getenv("LLM_PACK_TIMEOUT_SECONDS", "30"))
+
+PROMPT_FIELDS = ("contact_name", "occasion_type", "tone", "custom_context", "relationship", "notes")
+
+# Common prefixes that AI might add
+MESSAGE_PREFIXES = ["Subject:", "Message:", "Here's", "Here is"]
+MAX_PREFIX_LENGTH = max(len(prefix) for prefix in MESSAGE_PREFIXES)
+
+
+def strip_leading_prefixes(message: str) -> str:
+    """Remove leading whitespace and any MESSAGE_PREFIXES (with a trailing colon)"""
+    message = message.lstrip()
+    for prefix in MESSAGE_PREFIXES:
+        if message.startswith(prefix):
+            message = message[len(prefix):].lstrip()
+            if message.startswith(":"):
+                message = message[1:].lstrip()
+    return message
+
+
+def clean_message(message: str) -> str:
+    return strip_leading_prefixes(message).rstrip()
+
+
+class StreamingCleaner:
+    """
+    clean_message applied to a reply arriving in chunks
+
+    The opening text is held back until enough of it has arrived that no
+    prefix can still match, and trailing whitespace until more text follows,
+    so the concatenated output equals clean_message of the whole reply.
+    """
 
-class AIMessageGenerator:
     def __init__(self):
-        self.api_key = os.getenv("EMERGENT_LLM_KEY")
-        if not self.api_key:
-            raise ValueError("EMERGENT_LLM_KEY not found in environment variables")
+        self._head = ""
+        self._started = False
+        self._whitespace = ""
+
+    def feed(self, chunk: str) -> str:
+        if self._started:
+            text = chunk
+        else:
+            self._head += chunk
+            text = strip_leading_prefixes(self._head)
+            if len(text) < MAX_PREFIX_LENGTH:
+                return ""
+            self._started = True
+        text = self._whitespace + text
+        body = text.rstrip()
+        self._whitespace = text[len(body):]
+        return body
+
+    def finish(self) -> str:
+        if self._started:
+            return ""
+        self._started = True
+        return clean_message(self._head)
+
+
+class AIMessageGenerator:
+    def __init__(self, cache: Optional[MessageCache] = None, provider: Optional[LLMProvider] = None):
+        self.provider = provider or create_provider()
+        self.cache = cache
+        self.in_flight = SingleFlight()
+        self.breaker = CircuitBreaker("llm", LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+        self.fallbacks = 0
+        self.packed_calls = 0
+        self.packed_items = 0
     
     async def generate_message(
         self,
@@ -19,7 +106,8 @@ class AIMessageGenerator:
         tone: str,
         custom_context: Optional[str] = None,
         relationship: Optional[str] = None,
-        notes: Optional[str] = None
+        notes: Optional[str] = None,
+        force_regenerate: bool = False
     ) -> str:
         """
         Generate a personalized message using Gemini AI
@@ -31,10 +119,134 @@ class AIMessageGenerator:
             custom_context: Optional additional context
             relationship: Optional relationship type
             notes: Optional notes about the contact
+            force_regenerate: Skip the cache lookup and ask the AI for a fresh draft
         
         Returns:
             Generated message string
         """
+        system_message, prompt = self.build_prompt(
+            contact_name, occasion_type, tone, custom_context, relationship, notes
+        )
+        key = cache_key(self.provider.name, system_message, prompt)
+        
+        if self.cache and not force_regenerate:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        async def complete_and_cache() -> str:
+            try:
+                message = await self.breaker.call(
+                    lambda: asyncio.wait_for(self._complete(system_message, prompt), LLM_TIMEOUT_SECONDS)
+                )
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                # Logged by the shared call, not once per coalesced waiter
+                print(f"Error generating message with AI: {e!r}")
+                raise
+            if self.cache:
+                await self.cache.set(key, message, self.provider.name)
+            return message
+        
+        try:
+            # Identical in-flight generations share one model call and its outcome
+            return await self.in_flight.do(key, complete_and_cache)
+        except Exception:
+            self.fallbacks += 1
+            # Fallback to template if AI fails
+            return self.fallback_message(contact_name, occasion_type, tone)
+    
+    async def generate_messages(self, requests: List[dict], force_regenerate: bool = False) -> List[str]:
+        """
+        Generate messages for several contacts with as few model calls as possible
+        
+        Args:
+            requests: generate_message keyword arguments per message
+                (contact_name, occasion_type, tone and optional context)
+            force_regenerate: Skip the cache lookup for every message
+        
+        Returns:
+            Messages in request order
+        """
+        prompts = [self.build_prompt(*(request.get(field) for field in PROMPT_FIELDS)) for request in requests]
+        keys = [cache_key(self.provider.name, system_message, prompt) for system_message, prompt in prompts]
+        cached = await self.cache.get_many(keys) if self.cache and not force_regenerate else {}
+        
+        results: List[Optional[str]] = [cached.get(key) for key in keys]
+        pending: Dict[str, List[Tuple[int, str, str]]] = {}
+        for index, ((system_message, prompt), key) in enumerate(zip(prompts, keys)):
+            if results[index] is None:
+                pending.setdefault(system_message, []).append((index, prompt, key))
+        
+        # One packed request per group of prompts sharing a system message
+        await asyncio.gather(*(
+            self._generate_packed(system_message, entries[start:start + LLM_PACK_SIZE], results)
+            for system_message, entries in pending.items()
+            for start in range(0, len(entries), LLM_PACK_SIZE)
+        ))
+        
+        missing = [index for index, message in enumerate(results) if message is None]
+        retried = await asyncio.gather(*(
+            self.generate_message(**{field: requests[index].get(field) for field in PROMPT_FIELDS}, force_regenerate=True)
+            for index in missing
+        ))
+        for index, message in zip(missing, retried):
+            results[index] = message
+        return results
+    
+    async def _generate_packed(self, system_message: str, entries: List[Tuple[int, str, str]], results: List[Optional[str]]) -> None:
+        """Fill results for the entries one packed reply covers; a lone entry is left to the individual path"""
+        if len(entries) < 2:
+            return
+        by_id = {str(n): entry for n, entry in enumerate(entries)}
+        packed_prompt = build_packed_prompt({item_id: prompt for item_id, (_, prompt, _) in by_id.items()})
+        try:
+            reply = await self.breaker.call(
+                lambda: asyncio.wait_for(self._send(system_message, packed_prompt), LLM_PACK_TIMEOUT_SECONDS)
+            )
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                print(f"Error generating packed messages with AI: {e!r}")
+            return
+        
+        self.packed_calls += 1
+        for item_id, message in parse_packed_reply(reply, by_id).items():
+            message = clean_message(message)
+            if not message:
+                continue
+            index, _, key = by_id[item_id]
+            results[index] = message
+            self.packed_items += 1
+            if self.cache:
+                await self.cache.set(key, message, self.provider.name)
+    
+    def stats(self) -> dict:
+        return {
+            "generations": self.in_flight.calls,
+            "coalesced": self.in_flight.coalesced,
+            "in_flight": self.in_flight.in_flight(),
+            "fallbacks": self.fallbacks,
+            "packed_calls": self.packed_calls,
+            "packed_items": self.packed_items,
+            "breaker": self.breaker.stats()
+        }
+    
+    def build_prompt(
+        self,
+        contact_name: str,
+        occasion_type: str,
+        tone: str,
+        custom_context: Optional[str] = None,
+        relationship: Optional[str] = None,
+        notes: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        Build the system message and user prompt for a generation
+        
+        Returns:
+            (system_message, prompt)
+        """
         
         # Build the system message based on tone
         tone_instructions = {
@@ -80,43 +292,99 @@ class AIMessageGenerator:
         
         base_prompt += " Do not include greetings like 'Subject:' or email formatting. Just write the message content itself."
         
+        return system_message, base_prompt
+    
+    async def warm_up(self) -> None:
+        """Create the provider's clients ahead of the first generation"""
         try:
-            # Create a unique session ID for each generation
-            session_id = f"message_gen_{occasion_type}_{hash(contact_name)}"
-            
-            # Initialize the chat with Gemini
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=session_id,
-                system_message=system_message
-            ).with_model("gemini", "gemini-2.0-flash")
-            
-            # Create user message
-            user_message = UserMessage(text=base_prompt)
-            
-            # Get response from AI
-            response = await chat.send_message(user_message)
-            
-            # Clean up the response
-            message = response.strip()
-            
-            # Remove common prefixes that AI might add
-            prefixes_to_remove = ["Subject:", "Message:", "Here's", "Here is"]
-            for prefix in prefixes_to_remove:
-                if message.startswith(prefix):
-                    message = message[len(prefix):].strip()
-                    if message.startswith(":"):
-                        message = message[1:].strip()
-            
-            return message
-            
+            await self.provider.warm_up()
         except Exception as e:
-            print(f"Error generating message with AI: {e}")
-            # Fallback to template if AI fails
-            return self._get_fallback_template(contact_name, occasion_type, tone)
+            print(f"AI provider warm-up failed: {e!r}")
+    
+    async def _send(self, system_message: str, prompt: str) -> str:
+        """Send one prompt to the model and return its raw reply"""
+        return await self.provider.complete(system_message, prompt)
     
-    def _get_fallback_template(self, contact_name: str, occasion_type: str, tone: str) -> str:
-        """Fallback templates if AI generation fails"""
+    def _send_stream(self, system_message: str, prompt: str) -> AsyncIterator[str]:
+        """Raw reply chunks as the model produces them"""
+        return self.provider.stream(system_message, prompt)
+    
+    async def _complete(self, system_message: str, prompt: str) -> str:
+        """Send one prompt to the model and clean up its reply"""
+        return clean_message(await self._send(system_message, prompt))
+    
+    async def stream_message(
+        self,
+        contact_name: str,
+        occasion_type: str,
+        tone: str,
+        custom_context: Optional[str] = None,
+        relationship: Optional[str] = None,
+        notes: Optional[str] = None,
+        force_regenerate: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Generate a personalized message, yielding cleaned text as it arrives
+        
+        Takes the same arguments as generate_message. A cached message is
+        yielded whole. If the model fails before producing any text, the
+        fallback template is yielded instead; a failure after text has been
+        yielded is re-raised so the caller can replace the partial message.
+        """
+        system_message, prompt = self.build_prompt(
+            contact_name, occasion_type, tone, custom_context, relationship, notes
+        )
+        key = cache_key(self.provider.name, system_message, prompt)
+        
+        if self.cache and not force_regenerate:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        
+        if not self.breaker.allow():
+            self.fallbacks += 1
+            yield self.fallback_message(contact_name, occasion_type, tone)
+            return
+        
+        cleaner = StreamingCleaner()
+        parts = []
+        chunks = self._send_stream(system_message, prompt)
+        try:
+            # The deadline applies to the wait for each chunk
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), LLM_TIMEOUT_SECONDS)
+                except StopAsyncIteration:
+                    break
+                text = cleaner.feed(chunk)
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            print(f"Error streaming message with AI: {e!r}")
+            self.breaker.record_failure()
+            self.fallbacks += 1
+            if parts:
+                raise
+            yield self.fallback_message(contact_name, occasion_type, tone)
+            return
+        except BaseException:
+            self.breaker.release()
+            raise
+        finally:
+            await chunks.aclose()
+        self.breaker.record_success()
+        
+        text = cleaner.finish()
+        if text:
+            parts.append(text)
+            yield text
+        if self.cache:
+            await self.cache.set(key, "".join(parts), self.provider.name)
+    
+    def fallback_message(self, contact_name: str, occasion_type: str, tone: str) -> str:
+        """Template message for when AI generation fails, times out or is skipped"""
         templates = {
             "birthday": {
                 "friendly": f"Happy Birthday {contact_name}! 🎉 Hope you have an amazing day filled with joy and laughter!",
@@ -144,6 +412,3 @@ class AIMessageGenerator:
         
         return templates[occasion].get(tone, templates[occasion]["friendly"])
 
-
-# Global instance
-ai_generator = AIMessageGenerator()
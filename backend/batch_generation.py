@@ -0,0 +1,161 @@
+"""
+Batch AI message generation
+
+Items are grouped by tone into packs of up to LLM_PACK_SIZE, each drafted
+with one packed model request (see AIMessageGenerator.generate_messages).
+Packs run concurrently, at most BATCH_GENERATION_CONCURRENCY at a time; a
+pack that takes longer than BATCH_PACK_TIMEOUT_SECONDS gets template
+fallbacks instead of holding up the batch. Results are yielded as each pack
+completes and saved with a single insert_many once the batch is done.
+"""
+import asyncio
+import os
+import uuid
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, List, Optional
+
+from ai_service import LLM_PACK_SIZE, AIMessageGenerator
+from repositories import ContactRepository, MessageRepository, ReminderRepository
+
+BATCH_GENERATION_CONCURRENCY = int(os.getenv("BATCH_GENERATION_CONCURRENCY", "4"))
+BATCH_PACK_TIMEOUT_SECONDS = float(os.getenv("BATCH_PACK_TIMEOUT_SECONDS", "45"))
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "50"))
+
+
+async def items_due(
+    user_id: str,
+    days: int,
+    tone: str,
+    reminder_repo: ReminderRepository,
+    today: Optional[date] = None
+) -> List[dict]:
+    """One batch item per active reminder firing in the next `days` days, soonest first"""
+    today = today or datetime.utcnow().date()
+    window_start = datetime.combine(today, datetime.min.time())
+    reminders = await reminder_repo.list_upcoming(user_id, window_start, window_start + timedelta(days=days + 1))
+    return [
+        {
+            "contact_id": reminder["contact_id"],
+            "occasion_type": reminder["occasion_type"],
+            "tone": tone,
+            "custom_context": reminder.get("custom_message"),
+            "reminder_id": reminder["reminder_id"]
+        }
+        for reminder in reminders[:MAX_BATCH_ITEMS]
+    ]
+
+
+async def generate_batch(
+    user_id: str,
+    items: List[dict],
+    generator: AIMessageGenerator,
+    contact_repo: ContactRepository,
+    message_repo: MessageRepository,
+    force_regenerate: bool = False
+) -> AsyncIterator[dict]:
+    """
+    Generate a draft for every item, yielding each result as it completes
+
+    Args:
+        user_id: Owner of the contacts
+        items: Dicts with contact_id, occasion_type, tone and optionally
+            custom_context and reminder_id
+        generator: Message generator to draft with
+        contact_repo: Used to load every contact in one query
+        message_repo: Receives all drafts in one insert_many at the end
+        force_regenerate: Bypass the message cache
+
+    Yields:
+        Per item: index, contact_id, occasion_type, tone and either message,
+        message_id and timed_out, or error
+    """
+    contacts = await contact_repo.get_summaries(
+        user_id, {item["contact_id"] for item in items}, ("name", "relationship", "notes")
+    )
+    semaphore = asyncio.Semaphore(BATCH_GENERATION_CONCURRENCY)
+
+    def describe(index: int) -> dict:
+        item = items[index]
+        result = {
+            "index": index,
+            "contact_id": item["contact_id"],
+            "occasion_type": item["occasion_type"],
+            "tone": item["tone"]
+        }
+        if item.get("reminder_id"):
+            result["reminder_id"] = item["reminder_id"]
+        return result
+
+    async def missing_contact(index: int) -> List[dict]:
+        return [{**describe(index), "error": "Contact not found"}]
+
+    async def generate(pack: List[int]) -> List[dict]:
+        requests = []
+        for index in pack:
+            item, contact = items[index], contacts[items[index]["contact_id"]]
+            requests.append({
+                "contact_name": contact["name"],
+                "occasion_type": item["occasion_type"],
+                "tone": item["tone"],
+                "custom_context": item.get("custom_context"),
+                "relationship": contact.get("relationship"),
+                "notes": contact.get("notes")
+            })
+
+        timed_out = False
+        async with semaphore:
+            try:
+                messages = await asyncio.wait_for(
+                    generator.generate_messages(requests, force_regenerate),
+                    BATCH_PACK_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                timed_out = True
+                messages = [
+                    generator.fallback_message(request["contact_name"], request["occasion_type"], request["tone"])
+                    for request in requests
+                ]
+        return [
+            {**describe(index), "message": message, "message_id": str(uuid.uuid4()), "timed_out": timed_out}
+            for index, message in zip(pack, messages)
+        ]
+
+    found = sorted(
+        (index for index, item in enumerate(items) if item["contact_id"] in contacts),
+        key=lambda index: items[index]["tone"]
+    )
+    packs = []
+    for index in found:
+        # Packs share a tone, and so a system message
+        if packs and len(packs[-1]) < LLM_PACK_SIZE and items[packs[-1][0]]["tone"] == items[index]["tone"]:
+            packs[-1].append(index)
+        else:
+            packs.append([index])
+
+    tasks = [asyncio.ensure_future(generate(pack)) for pack in packs] + [
+        asyncio.ensure_future(missing_contact(index))
+        for index, item in enumerate(items) if item["contact_id"] not in contacts
+    ]
+    documents = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for result in await next_done:
+                if "message" in result:
+                    documents.append({
+                        "message_id": result["message_id"],
+                        "user_id": user_id,
+                        "contact_id": result["contact_id"],
+                        "occasion_type": result["occasion_type"],
+                        "tone": result["tone"],
+                        "generated_message": result["message"],
+                        "created_at": datetime.utcnow().isoformat()
+                    })
+                yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Drafts already handed to the caller are kept even if the batch is cut short
+        try:
+            await message_repo.insert_many(documents)
+        except Exception as e:
+            print(f"Failed to save batch messages: {e}")
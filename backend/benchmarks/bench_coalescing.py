@@ -0,0 +1,107 @@
+"""
+Single-flight coalescing check for AI message generation
+
+Runs in-process with the model call replaced by a fixed-latency stub, so no
+API key or database is needed:
+
+    python benchmarks/bench_coalescing.py --concurrency 50 --latency 0.5
+
+First checks SingleFlight on its own: N concurrent calls for one key must
+run the function once and all receive its value, or all receive the same
+exception. Then fires N concurrent identical generations, and N concurrent
+generations whose model call fails. Each round should make exactly one model
+call. In the failing round every caller should get the template fallback,
+and the failure should be logged once. Exits 1 if any expectation does not
+hold.
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ai_service import AIMessageGenerator
+from single_flight import SingleFlight
+
+REQUEST = {"contact_name": "Alex", "occasion_type": "birthday", "tone": "friendly"}
+
+
+async def check_single_flight(concurrency: int, latency: float) -> bool:
+    calls = 0
+
+    async def work(fail: bool):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(latency)
+        if fail:
+            raise RuntimeError("shared failure")
+        return object()
+
+    ok = True
+    for fail in (False, True):
+        flight, calls = SingleFlight(), 0
+        results = await asyncio.gather(
+            *(flight.do("key", lambda: work(fail)) for _ in range(concurrency)),
+            return_exceptions=True
+        )
+        shared = results[0]
+        passed = (
+            calls == 1
+            and all(result is shared for result in results)
+            and isinstance(shared, RuntimeError) == fail
+            and flight.coalesced == concurrency - 1
+            and flight.in_flight() == 0
+        )
+        label = "raising" if fail else "returning"
+        print(f"SingleFlight {label:<9} {concurrency} calls -> {calls} run(s) {'OK' if passed else 'FAILED'}")
+        ok = ok and passed
+    return ok
+
+
+async def run_round(concurrency: int, latency: float, fail: bool) -> bool:
+    generator = AIMessageGenerator()
+    calls = 0
+
+    async def stub(system_message: str, prompt: str) -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(latency)
+        if fail:
+            raise RuntimeError("provider unavailable")
+        return "Happy birthday, Alex!"
+
+    generator._complete = stub
+    log = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(log):
+        results = await asyncio.gather(*(generator.generate_message(**REQUEST) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    expected = generator.fallback_message(**REQUEST) if fail else "Happy birthday, Alex!"
+    errors_logged = log.getvalue().count("Error generating message")
+    ok = calls == 1 and all(result == expected for result in results) and errors_logged == int(fail)
+    label = "failing" if fail else "succeeding"
+    print(f"{label:<11} {concurrency} requests -> {calls} model call(s), {errors_logged} error(s) logged "
+          f"in {elapsed:.2f}s {'OK' if ok else 'FAILED'}  {generator.stats()}")
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    ok = await check_single_flight(args.concurrency, args.latency)
+    ok = await run_round(args.concurrency, args.latency, fail=False) and ok
+    ok = await run_round(args.concurrency, args.latency, fail=True) and ok
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
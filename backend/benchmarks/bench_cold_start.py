@@ -0,0 +1,138 @@
+"""
+Cold-start benchmark for the API entry points
+
+Each run starts a fresh interpreter, as a serverless cold start does, and
+measures module import time (from `python -X importtime`) and the time from
+interpreter start to the first response of an in-process request:
+
+    python benchmarks/bench_cold_start.py --runs 5
+    python benchmarks/bench_cold_start.py --entry api --max-import-ms 1500
+
+The slowest imports beneath the entry module are listed so a regression can
+be traced to the module that caused it. With --max-import-ms the script
+exits 1 when the median import time of any entry point exceeds the budget.
+No database is needed: the default path, /api/health, does not touch it.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+ENTRIES = {
+    "api": (os.path.join(ROOT, "api"), "index"),
+    "backend": (os.path.join(ROOT, "backend"), "server"),
+}
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+FIRST_RESPONSE = """
+import asyncio, sys, time
+started = time.perf_counter()
+import {module} as entry
+
+async def main():
+    sent = []
+    scope = {{
+        "type": "http", "asgi": {{"version": "3.0"}}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": {path!r}, "raw_path": {path!r}.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 1),
+        "server": ("localhost", 80)
+    }}
+
+    async def receive():
+        return {{"type": "http.request", "body": b"", "more_body": False}}
+
+    async def send(message):
+        sent.append(message)
+
+    await entry.app(scope, receive, send)
+    return sent[0]["status"]
+
+imported = time.perf_counter()
+status = asyncio.run(main())
+print(status, (imported - started) * 1000, (time.perf_counter() - started) * 1000)
+"""
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017/remindme")
+    # Bytecode must be cached for runs to measure imports rather than compilation
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def import_profile(directory: str, module: str) -> tuple:
+    """Cumulative import time of the entry module and of each module it imports directly, in ms"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=directory, env=child_env(), capture_output=True, text=True, check=True
+    )
+    total = None
+    children, pending = {}, {}
+    # Children are printed before their parent, one indent level deeper
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)) / 1000, len(match.group(3)), match.group(4)
+        if depth == 3:
+            pending[name] = cumulative
+        elif depth == 1:
+            if name == module:
+                total, children = cumulative, pending
+            pending = {}
+    return total, children
+
+
+def first_response(directory: str, module: str, path: str) -> tuple:
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_RESPONSE.format(module=module, path=path)],
+        cwd=directory, env=child_env(), capture_output=True, text=True, check=True
+    )
+    status, imported_ms, responded_ms = result.stdout.split()[-3:]
+    return int(status), float(imported_ms), float(responded_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entry", choices=[*ENTRIES, "all"], default="all")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/health", help="route requested after import")
+    parser.add_argument("--top", type=int, default=10, help="slowest direct imports to list")
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import time exceeds this")
+    args = parser.parse_args()
+
+    over_budget = False
+    for name in (ENTRIES if args.entry == "all" else [args.entry]):
+        directory, module = ENTRIES[name]
+        import_profile(directory, module)
+        imports, children = [], {}
+        for _ in range(args.runs):
+            total, direct = import_profile(directory, module)
+            imports.append(total)
+            for child, ms in direct.items():
+                children.setdefault(child, []).append(ms)
+        responses = [first_response(directory, module, args.path) for _ in range(args.runs)]
+
+        median_import = statistics.median(imports)
+        first = [response[2] for response in responses]
+        print(f"{name} ({module}.py), {args.runs} runs")
+        print(f"  import time:     median {median_import:7.1f} ms   min {min(imports):7.1f} ms")
+        print(f"  first response:  median {statistics.median(first):7.1f} ms   min {min(first):7.1f} ms  "
+              f"(GET {args.path} -> {responses[0][0]})")
+        print("  slowest direct imports:")
+        slowest = sorted(children.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+        for child, times in slowest:
+            print(f"    {statistics.median(times):8.1f} ms  {child}")
+        if args.max_import_ms is not None and median_import > args.max_import_ms:
+            print(f"  FAIL: import time exceeds {args.max_import_ms:.0f} ms")
+            over_budget = True
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
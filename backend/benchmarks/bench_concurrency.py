@@ -0,0 +1,82 @@
+"""
+Concurrent-request throughput benchmark for the ReMindMe API
+
+Run the API first (python server.py), then:
+
+    python benchmarks/bench_concurrency.py --url http://localhost:8001 --levels 1 8 32 128
+
+Throughput on /api/contacts and /api/reminders/upcoming should scale with the
+concurrency level instead of flat-lining once the event loop is saturated.
+Compare MONGO_DRIVER=motor against MONGO_DRIVER=threadpool by restarting the
+server with each setting.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+ENDPOINTS = ["/api/contacts", "/api/reminders/upcoming"]
+
+
+async def create_user(client: httpx.AsyncClient, contacts: int) -> dict:
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    response = await client.post("/api/auth/signup", json={
+        "email": email,
+        "password": "benchmark",
+        "name": "Benchmark User"
+    })
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+    for i in range(contacts):
+        response = await client.post("/api/contacts", headers=headers, json={
+            "name": f"Contact {i}",
+            "email": f"contact{i}@example.com"
+        })
+        contact_id = response.json()["contact_id"]
+        await client.post("/api/reminders", headers=headers, json={
+            "contact_id": contact_id,
+            "occasion_type": "birthday",
+            "occasion_date": "2030-01-01"
+        })
+    return headers
+
+
+async def run_level(client: httpx.AsyncClient, path: str, headers: dict, concurrency: int, requests: int) -> float:
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--contacts", type=int, default=50)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=max(args.levels))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        headers = await create_user(client, args.contacts)
+        print(f"{'endpoint':<28}{'concurrency':>12}{'req/s':>12}")
+        for path in ENDPOINTS:
+            for level in args.levels:
+                rate = await run_level(client, path, headers, level, args.requests)
+                print(f"{path:<28}{level:>12}{rate:>12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Conditional GET: full responses vs 304 Not Modified for the ETag-tagged views
+
+Requires a reachable MongoDB (MONGO_URL). Seeds one user's contacts and
+reminders, then times the work behind GET /api/contacts, /api/reminders,
+/api/reminders/upcoming and /api/analytics/dashboard against the version
+lookup a revalidation with a matching If-None-Match costs instead:
+
+    python benchmarks/bench_conditional_get.py --contacts 5000 --requests 500
+
+Benchmark data is written under a throwaway user_id and deleted afterwards.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import Database
+from indexes import ensure_indexes
+from repositories import ContactRepository, ReminderRepository, UserStatsRepository
+from user_stats import get_dashboard
+
+
+async def seed(contact_repo: ContactRepository, reminder_repo: ReminderRepository, user_id: str, count: int):
+    today = datetime.utcnow().date()
+    contacts = [
+        {"contact_id": str(uuid.uuid4()), "user_id": user_id, "name": f"Contact {n}", "tags": ["work"],
+         "last_contacted": None, "created_at": f"2024-01-01T00:00:00.{n:06d}"}
+        for n in range(count)
+    ]
+    await contact_repo.insert_many(contacts)
+    for contact in contacts[:count // 2]:
+        fire_at = datetime.combine(today + timedelta(days=hash(contact["contact_id"]) % 60), datetime.min.time())
+        await reminder_repo.create({
+            "reminder_id": str(uuid.uuid4()), "user_id": user_id, "contact_id": contact["contact_id"],
+            "occasion_type": "birthday", "occasion_date": (fire_at.date() + timedelta(days=3)).isoformat(),
+            "reminder_days_before": 3, "is_recurring": False, "status": "active",
+            "next_fire_at": fire_at, "created_at": datetime.utcnow().isoformat()
+        })
+
+
+async def timed(call, requests: int) -> list:
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+    contact_repo, reminder_repo, stats_repo = ContactRepository(db), ReminderRepository(db), UserStatsRepository(db)
+    user_id = f"bench-{uuid.uuid4()}"
+    start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    end = start + timedelta(days=31)
+    views = {
+        "contacts": lambda: contact_repo.list_page(user_id),
+        "reminders": lambda: reminder_repo.list_page(user_id),
+        "upcoming": lambda: reminder_repo.list_upcoming(user_id, start, end),
+        "dashboard": lambda: get_dashboard(user_id, contact_repo, reminder_repo, stats_repo),
+        "304": lambda: stats_repo.get_version(user_id)
+    }
+    try:
+        await ensure_indexes(db)
+        await seed(contact_repo, reminder_repo, user_id, args.contacts)
+        print(f"{'view':>10}{'p50 ms':>9}{'p95 ms':>9}")
+        for label, call in views.items():
+            timings = sorted(await timed(call, args.requests))
+            print(f"{label:>10}{statistics.median(timings):>9.2f}{timings[int(0.95 * len(timings))]:>9.2f}")
+    finally:
+        await contact_repo.collection.delete_many({"user_id": user_id})
+        await reminder_repo.collection.delete_many({"user_id": user_id})
+        await stats_repo.collection.delete_many({"user_id": user_id})
+        db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Bulk contact mutations: one call per contact vs POST /api/contacts/bulk
+
+Requires a reachable MongoDB (MONGO_URL). Seeds contacts with one reminder
+each, then applies the same mix of updates, tag changes and deletes (with
+their reminder cascade) twice: through the per-contact repository calls the
+single-contact routes make, and through contact_bulk.apply_bulk:
+
+    python benchmarks/bench_contact_bulk.py --operations 5000
+
+Benchmark data is written under throwaway user_ids and deleted afterwards.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from contact_bulk import apply_bulk
+from database import Database
+from repositories import ContactRepository, ReminderRepository
+
+
+async def seed(contact_repo: ContactRepository, reminder_repo: ReminderRepository, user_id: str, count: int) -> list:
+    contacts = [
+        {"contact_id": str(uuid.uuid4()), "user_id": user_id, "name": f"Contact {n}", "tags": ["work"], "created_at": "2024-01-01"}
+        for n in range(count)
+    ]
+    await contact_repo.insert_many(contacts)
+    await reminder_repo.collection.insert_many([
+        {"reminder_id": str(uuid.uuid4()), "user_id": user_id, "contact_id": contact["contact_id"], "status": "active"}
+        for contact in contacts
+    ])
+    return [contact["contact_id"] for contact in contacts]
+
+
+def make_operations(contact_ids: list) -> list:
+    kinds = ("update", "add_tags", "delete")
+    operations = []
+    for n, contact_id in enumerate(contact_ids):
+        op = kinds[n % len(kinds)]
+        if op == "update":
+            operations.append({"op": op, "contact_id": contact_id, "contact": {"notes": f"Updated {n}"}})
+        elif op == "add_tags":
+            operations.append({"op": op, "contact_id": contact_id, "tags": ["vip"]})
+        else:
+            operations.append({"op": op, "contact_id": contact_id})
+    return operations
+
+
+async def one_by_one(contact_repo: ContactRepository, reminder_repo: ReminderRepository, user_id: str, operations: list):
+    for operation in operations:
+        if operation["op"] == "update":
+            await contact_repo.update(user_id, operation["contact_id"], operation["contact"])
+        elif operation["op"] == "add_tags":
+            contact = await contact_repo.get(user_id, operation["contact_id"])
+            await contact_repo.update(user_id, operation["contact_id"], {"tags": contact["tags"] + operation["tags"]})
+        elif await contact_repo.delete(user_id, operation["contact_id"]):
+            await reminder_repo.delete_for_contact(user_id, operation["contact_id"])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=5000)
+    args = parser.parse_args()
+
+    db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+    contact_repo, reminder_repo = ContactRepository(db), ReminderRepository(db)
+    user_ids = []
+    try:
+        rates = {}
+        for label, run in (("one call per contact", one_by_one), ("bulk", apply_bulk)):
+            user_id = f"bench-{uuid.uuid4()}"
+            user_ids.append(user_id)
+            operations = make_operations(await seed(contact_repo, reminder_repo, user_id, args.operations))
+            start = time.perf_counter()
+            await run(contact_repo, reminder_repo, user_id, operations)
+            elapsed = time.perf_counter() - start
+            rates[label] = args.operations / elapsed
+            print(f"{label:<22} {args.operations:>6} operations in {elapsed:6.2f}s  {rates[label]:9.0f} ops/sec")
+        print(f"speedup: {rates['bulk'] / rates['one call per contact']:.1f}x")
+    finally:
+        for user_id in user_ids:
+            await contact_repo.collection.delete_many({"user_id": user_id})
+            await reminder_repo.collection.delete_many({"user_id": user_id})
+            await contact_repo.stats.collection.delete_many({"user_id": user_id})
+        db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+"""
+Contact export benchmark: throughput, time to first byte and peak RSS
+
+Compares the streaming export with materializing the whole address book and
+encoding it in one go. Requires a reachable MongoDB (MONGO_URL); benchmark
+contacts are written under a throwaway user_id and deleted afterwards:
+
+    python benchmarks/bench_contact_export.py --rows 500000
+
+With --synthetic no database is used: contacts are generated in process, in
+the same batches the cursor would return, which isolates encoding cost and
+memory from the database. Each run is a separate subprocess so the reported
+peak RSS belongs to that export alone; "growth" is the peak minus the RSS
+measured before the export started.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from contact_export import EXPORT_BATCH_SIZE, EXPORT_FORMATS, export_contacts
+from database import Database
+from repositories import ContactRepository
+
+SEED_CHUNK_ROWS = 10_000
+
+
+def make_contact(user_id: str, n: int) -> dict:
+    return {
+        "contact_id": f"{n:08d}-{uuid.uuid4()}",
+        "user_id": user_id,
+        "name": f"Contact {n}",
+        "email": f"contact{n}@example.com",
+        "phone": f"+1-555-{n % 10000:04d}",
+        "birthday": "1990-05-15",
+        "relationship": "Friend",
+        "notes": f"Met at conference {n % 97}, likes hiking",
+        "tags": ["work", f"team-{n % 10}"],
+        "custom_fields": {},
+        "created_at": f"2024-01-01T00:00:00.{n:06d}",
+        "last_contacted": None,
+        "contact_frequency": 0
+    }
+
+
+class SyntheticContacts:
+    """Yields generated contacts in batches, as ContactRepository.iter_batches does"""
+
+    def __init__(self, rows: int):
+        self.rows = rows
+
+    async def iter_batches(self, user_id: str, batch_size: int):
+        for start in range(0, self.rows, batch_size):
+            yield [make_contact(user_id, n) for n in range(start, min(start + batch_size, self.rows))]
+
+
+async def materialized(contact_repo, user_id: str, format: str):
+    """The whole export built in memory before the first byte is sent"""
+    _, _, header, encode = EXPORT_FORMATS[format]
+    contacts = []
+    async for batch in contact_repo.iter_batches(user_id, EXPORT_BATCH_SIZE):
+        contacts.extend(batch)
+    yield (header + encode(contacts)).encode("utf-8")
+
+
+async def run_export(contact_repo, user_id: str, format: str, mode: str) -> tuple:
+    chunks = export_contacts(contact_repo, user_id, format) if mode == "streaming" else materialized(contact_repo, user_id, format)
+    size = 0
+    first_byte = None
+    start = time.perf_counter()
+    async for chunk in chunks:
+        # The CSV header is sent before any query; time the first contact data
+        if first_byte is None and size + len(chunk) > len(EXPORT_FORMATS[format][2]):
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    return size, first_byte, time.perf_counter() - start
+
+
+async def seed(rows: int) -> str:
+    db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+    contact_repo = ContactRepository(db)
+    user_id = f"bench-{uuid.uuid4()}"
+    try:
+        for start in range(0, rows, SEED_CHUNK_ROWS):
+            await contact_repo.collection.insert_many(
+                [make_contact(user_id, n) for n in range(start, min(start + SEED_CHUNK_ROWS, rows))]
+            )
+    finally:
+        db.close()
+    return user_id
+
+
+async def cleanup(user_id: str):
+    db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+    try:
+        await ContactRepository(db).collection.delete_many({"user_id": user_id})
+    finally:
+        db.close()
+
+
+def single(rows: int, format: str, mode: str, user_id: str):
+    db = None
+    if user_id:
+        db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+        contact_repo = ContactRepository(db)
+    else:
+        contact_repo = SyntheticContacts(rows)
+    baseline_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        size, first_byte, elapsed = asyncio.run(run_export(contact_repo, user_id or "bench", format, mode))
+    finally:
+        if db is not None:
+            db.close()
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"{format:>7}{mode:>13}{rows:>10}{elapsed:>9.2f}{rows / elapsed:>11.0f}{size / elapsed / 2**20:>8.1f}"
+        f"{first_byte * 1000:>12.1f}{peak_mb:>9.1f}{peak_mb - baseline_mb:>9.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--formats", nargs="+", choices=list(EXPORT_FORMATS), default=list(EXPORT_FORMATS))
+    parser.add_argument("--synthetic", action="store_true", help="generate contacts instead of reading MongoDB")
+    parser.add_argument("--single", nargs=3, metavar=("FORMAT", "MODE", "USER_ID"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        format, mode, user_id = args.single
+        single(args.rows, format, mode, user_id if user_id != "-" else None)
+        return
+
+    user_id = "-" if args.synthetic else asyncio.run(seed(args.rows))
+    try:
+        print(f"{'format':>7}{'mode':>13}{'rows':>10}{'seconds':>9}{'rows/sec':>11}{'MB/s':>8}"
+              f"{'first byte':>12}{'peak MB':>9}{'growth':>9}")
+        for format in args.formats:
+            for mode in ("streaming", "materialized"):
+                subprocess.run(
+                    [sys.executable, __file__, "--rows", str(args.rows), "--single", format, mode, user_id],
+                    check=True
+                )
+    finally:
+        if user_id != "-":
+            asyncio.run(cleanup(user_id))
+
+
+if __name__ == "__main__":
+    main()
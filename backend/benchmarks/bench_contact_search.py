@@ -0,0 +1,136 @@
+"""
+Contact search latency: p50/p95/p99 per kind of query at 100k contacts per user
+
+Requires a reachable MongoDB (MONGO_URL). Seeds one user's address book,
+applies the indexes, then times contact_search.search_contacts (the work
+behind GET /api/contacts/search) over a mix of as-you-type prefixes, multi-word
+names, email and phone fragments, tags and words that only appear in notes:
+
+    python benchmarks/bench_contact_search.py --contacts 100000 --p99-ms 50
+
+Exits 1 when the overall p99 exceeds --p99-ms. Benchmark contacts are written
+under a throwaway user_id and deleted afterwards.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from contact_search import DEFAULT_SEARCH_RESULTS, search_contacts
+from database import Database
+from indexes import ensure_indexes
+from repositories import ContactRepository
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Christopher", "Lisa", "Daniel", "Nancy", "Matthew", "Betty", "Anthony", "Sandra", "Mark", "Ashley",
+    "José", "Zoë", "Amélie", "Søren", "Chloé", "Noah", "Liam", "Olivia", "Emma", "Ava"
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson"
+]
+RELATIONSHIPS = ["Friend", "Family", "Colleague", "Client", "Neighbor", "Mentor"]
+TAGS = ["work", "college", "climbing", "book-club", "vip", "conference", "school", "gym"]
+NOTE_WORDS = ["hiking", "sailing", "chess", "gardening", "photography", "pottery", "marathon", "jazz", "baking", "surfing"]
+SEED_CHUNK_ROWS = 10_000
+
+
+def make_contact(user_id: str, n: int, rng: random.Random) -> dict:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        "contact_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "name": f"{first} {last}",
+        "email": f"{first.lower()}.{last.lower()}{n}@example.com",
+        "phone": f"+1-{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(0, 9999):04d}",
+        "birthday": None,
+        "relationship": rng.choice(RELATIONSHIPS),
+        "notes": f"Enjoys {rng.choice(NOTE_WORDS)} and {rng.choice(NOTE_WORDS)}",
+        "tags": rng.sample(TAGS, 2),
+        "custom_fields": {},
+        "created_at": f"2024-01-01T00:00:00.{n:06d}",
+        "last_contacted": None,
+        "contact_frequency": 0
+    }
+
+
+def make_queries(contacts: list, count: int, rng: random.Random) -> list:
+    """(kind, query) pairs drawn from the seeded contacts"""
+    kinds = {
+        "prefix": lambda c: c["name"][:rng.randint(1, 5)],
+        "full name": lambda c: c["name"].split()[0] + " " + c["name"].split()[1][:rng.randint(1, 3)],
+        "email": lambda c: c["email"].split("@")[0][:rng.randint(3, 12)],
+        "phone": lambda c: c["phone"].split("-", 2)[2][:rng.randint(3, 8)],
+        "tag": lambda c: rng.choice(c["tags"]),
+        "notes": lambda c: rng.choice(NOTE_WORDS) + " " + rng.choice(NOTE_WORDS),
+        "no match": lambda c: f"zq{rng.randint(0, 10**6)}"
+    }
+    queries = []
+    for _ in range(count):
+        kind = rng.choice(list(kinds))
+        queries.append((kind, kinds[kind](rng.choice(contacts))))
+    return queries
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=DEFAULT_SEARCH_RESULTS)
+    parser.add_argument("--p99-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+    contact_repo = ContactRepository(db)
+    user_id = f"bench-{uuid.uuid4()}"
+    try:
+        await ensure_indexes(db)
+        contacts = [make_contact(user_id, n, rng) for n in range(args.contacts)]
+        start = time.perf_counter()
+        for offset in range(0, len(contacts), SEED_CHUNK_ROWS):
+            await contact_repo.insert_many(contacts[offset:offset + SEED_CHUNK_ROWS])
+        print(f"Seeded {args.contacts} contacts in {time.perf_counter() - start:.1f}s")
+
+        queries = make_queries(contacts, args.queries, rng)
+        for _, query in queries[:100]:
+            await search_contacts(contact_repo, user_id, query, args.limit)
+
+        timings = {}
+        for kind, query in queries:
+            start = time.perf_counter()
+            await search_contacts(contact_repo, user_id, query, args.limit)
+            timings.setdefault(kind, []).append((time.perf_counter() - start) * 1000)
+    finally:
+        await contact_repo.collection.delete_many({"user_id": user_id})
+        db.close()
+
+    print(f"{'query':>10}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for kind, values in [*timings.items(), ("all", [v for values in timings.values() for v in values])]:
+        print(
+            f"{kind:>10}{len(values):>7}{statistics.median(values):>9.1f}{percentile(values, 0.95):>9.1f}"
+            f"{percentile(values, 0.99):>9.1f}{max(values):>9.1f}"
+        )
+    overall = percentile([v for values in timings.values() for v in values], 0.99)
+    if overall > args.p99_ms:
+        print(f"FAIL: p99 {overall:.1f} ms exceeds {args.p99_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
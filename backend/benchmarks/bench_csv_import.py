@@ -0,0 +1,75 @@
+"""
+CSV import benchmark: rows/sec and peak RSS for the streaming importer
+
+Requires a reachable MongoDB (MONGO_URL). Each size runs in its own
+subprocess so the reported peak RSS belongs to that import alone:
+
+    python benchmarks/bench_csv_import.py --sizes 10000 100000 1000000
+
+Benchmark contacts are written under a throwaway user_id and deleted afterwards.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from csv_import import import_contacts
+from database import Database
+from repositories import ContactRepository
+
+
+def write_csv(path: str, rows: int):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Name,Email,Phone,Birthday,Relationship,Notes\n")
+        for i in range(rows):
+            f.write(f"Contact {i},contact{i}@example.com,+1-555-{i % 10000:04d},1990-05-15,Friend,Imported row {i}\n")
+
+
+async def run_import(path: str) -> tuple:
+    db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+    contact_repo = ContactRepository(db)
+    user_id = f"bench-{uuid.uuid4()}"
+    try:
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            report = await import_contacts(f, user_id, contact_repo)
+        elapsed = time.perf_counter() - start
+    finally:
+        await contact_repo.collection.delete_many({"user_id": user_id})
+        db.close()
+    return report.imported, elapsed
+
+
+def single(rows: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "contacts.csv")
+        write_csv(path, rows)
+        imported, elapsed = asyncio.run(run_import(path))
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{rows:>10}{imported:>10}{elapsed:>10.2f}{imported / elapsed:>12.0f}{peak_mb:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        single(args.single)
+        return
+
+    print(f"{'rows':>10}{'imported':>10}{'seconds':>10}{'rows/sec':>12}{'peak MB':>12}")
+    for size in args.sizes:
+        subprocess.run([sys.executable, __file__, "--single", str(size)], check=True)
+
+
+if __name__ == "__main__":
+    main()
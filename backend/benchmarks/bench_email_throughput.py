@@ -0,0 +1,105 @@
+"""
+SMTP throughput: one connection per email vs the pooled sender
+
+Starts a local sink SMTP server (requires `pip install aiosmtpd`), so no
+mail provider is needed:
+
+    python benchmarks/bench_email_throughput.py --emails 500 --pool-size 4
+
+--handshake-latency adds a delay to each EHLO, standing in for the TLS and
+AUTH round trips a real provider costs on every new connection.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from aiosmtpd.controller import Controller
+from aiosmtplib import SMTP
+
+from smtp_pool import SMTPPool
+
+HOST = "127.0.0.1"
+
+
+class SinkHandler:
+    def __init__(self, handshake_latency: float):
+        self.handshake_latency = handshake_latency
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake_latency)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def make_message(n: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "bench@localhost"
+    message["To"] = f"contact{n}@example.com"
+    message["Subject"] = "Happy birthday!"
+    message.set_content("Wishing you a wonderful year ahead.")
+    return message
+
+
+async def send_unpooled(port: int, emails: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send_one(n: int):
+        async with semaphore:
+            smtp = SMTP(hostname=HOST, port=port)
+            await smtp.connect()
+            await smtp.send_message(make_message(n))
+            await smtp.quit()
+
+    await asyncio.gather(*(send_one(n) for n in range(emails)))
+
+
+async def send_pooled(port: int, emails: int, concurrency: int) -> dict:
+    pool = SMTPPool(HOST, port, size=concurrency, max_messages=emails)
+    await asyncio.gather(*(pool.send(make_message(n)) for n in range(emails)))
+    await pool.close()
+    return pool.stats()
+
+
+async def timed(label: str, handler: SinkHandler, coro) -> float:
+    before = handler.received
+    start = time.perf_counter()
+    result = await coro
+    elapsed = time.perf_counter() - start
+    sent = handler.received - before
+    print(f"{label:<24} {sent:>5} emails in {elapsed:6.2f}s  {sent / elapsed:8.1f} msgs/sec")
+    if result:
+        print(f"{'':<24} connections opened: {result['connections_opened']}")
+    return sent / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4, help="concurrent sessions for both modes")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--handshake-latency", type=float, default=0.02, help="seconds added to each EHLO")
+    args = parser.parse_args()
+
+    handler = SinkHandler(args.handshake_latency)
+    controller = Controller(handler, hostname=HOST, port=args.port)
+    controller.start()
+    try:
+        unpooled = await timed("connect per email", handler, send_unpooled(args.port, args.emails, args.pool_size))
+        pooled = await timed("pooled sessions", handler, send_pooled(args.port, args.emails, args.pool_size))
+    finally:
+        controller.stop()
+    print(f"speedup: {pooled / unpooled:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+Login storm benchmark for the ReMindMe API
+
+Run the API first (python server.py), then:
+
+    python benchmarks/bench_login_storm.py --url http://localhost:8001 --logins 200
+
+Fires a burst of concurrent logins while probing /api/health, and reports the
+health-check latency seen during the storm. With bcrypt offloaded from the
+event loop, health p99 should stay in the low milliseconds instead of growing
+with the number of queued logins. Logins rejected with 503 (queue full) are
+counted separately; tune PASSWORD_HASH_CONCURRENCY / PASSWORD_HASH_MAX_QUEUE.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    credentials = {"email": f"bench-{uuid.uuid4().hex[:8]}@example.com", "password": "benchmark"}
+    limits = httpx.Limits(max_connections=args.logins + 10)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120) as client:
+        response = await client.post("/api/auth/signup", json={**credentials, "name": "Benchmark User"})
+        response.raise_for_status()
+
+        latencies = []
+        done = asyncio.Event()
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/api/health")
+                latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(args.probe_interval)
+
+        async def login():
+            response = await client.post("/api/auth/login", json=credentials)
+            return response.status_code
+
+        prober = asyncio.create_task(probe())
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(login() for _ in range(args.logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await prober
+
+    print(f"logins: {args.logins} in {elapsed:.2f}s "
+          f"({statuses.count(200)} ok, {statuses.count(503)} busy, "
+          f"{len(statuses) - statuses.count(200) - statuses.count(503)} other)")
+    print(f"health probes: {len(latencies)}  "
+          f"p50 {statistics.median(latencies):.1f}ms  "
+          f"p99 {percentile(latencies, 99):.1f}ms  "
+          f"max {max(latencies):.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
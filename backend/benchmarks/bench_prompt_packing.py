@@ -0,0 +1,76 @@
+"""
+Prompt packing benchmark: one model call per contact vs packed multi-contact calls
+
+Runs in-process against the stub provider, so no API key is needed. The
+stub charges a fixed per-call overhead plus a per-message cost:
+
+    python benchmarks/bench_prompt_packing.py --contacts 40 --latency 0.8 --item-latency 0.1
+
+Both paths draft the same birthday messages with the same concurrency
+limit; wall time and provider calls are reported for each.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ai_service import LLM_PACK_SIZE, AIMessageGenerator
+from llm_providers import StubProvider
+
+
+def make_requests(count: int) -> list:
+    return [
+        {"contact_name": f"Teammate {i}", "occasion_type": "birthday", "tone": "friendly", "relationship": "colleague"}
+        for i in range(count)
+    ]
+
+
+async def one_per_contact(generator: AIMessageGenerator, requests: list, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate(request: dict) -> str:
+        async with semaphore:
+            return await generator.generate_message(**request)
+
+    return await asyncio.gather(*(generate(request) for request in requests))
+
+
+async def packed(generator: AIMessageGenerator, requests: list, concurrency: int, pack_size: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate(pack: list) -> list:
+        async with semaphore:
+            return await generator.generate_messages(pack)
+
+    packs = [requests[i:i + pack_size] for i in range(0, len(requests), pack_size)]
+    return [message for pack in await asyncio.gather(*(generate(pack) for pack in packs)) for message in pack]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pack-size", type=int, default=LLM_PACK_SIZE)
+    parser.add_argument("--latency", type=float, default=0.8, help="stub overhead per call, seconds")
+    parser.add_argument("--item-latency", type=float, default=0.1, help="stub cost per message, seconds")
+    args = parser.parse_args()
+
+    requests = make_requests(args.contacts)
+    print(f"{'strategy':<18}{'wall time':>12}{'provider calls':>16}{'drafts':>8}")
+    for label in ("one-per-contact", "packed"):
+        provider = StubProvider(latency=args.latency, failure_rate=0, item_latency=args.item_latency)
+        generator = AIMessageGenerator(provider=provider)
+        start = time.perf_counter()
+        if label == "packed":
+            messages = await packed(generator, requests, args.concurrency, args.pack_size)
+        else:
+            messages = await one_per_contact(generator, requests, args.concurrency)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<18}{elapsed:>11.2f}s{provider.calls:>16}{len(messages):>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Upcoming-reminders latency benchmark: scan + per-reminder contact lookups vs indexed range + one batched query
+
+Requires a reachable MongoDB (MONGO_URL):
+
+    python benchmarks/bench_upcoming.py --sizes 100 1000 10000
+
+For each size a throwaway user is seeded with that many reminders (a third of
+them inside a 30 day window) and both strategies are timed over several runs.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import Database
+from reminder_schedule import compute_next_fire_at
+from repositories import ContactRepository, ReminderRepository
+
+WINDOW_DAYS = 30
+
+
+async def seed(contact_repo: ContactRepository, reminder_repo: ReminderRepository, user_id: str, size: int):
+    today = datetime.utcnow().date()
+    contacts, reminders = [], []
+    for i in range(size):
+        contact_id = str(uuid.uuid4())
+        contacts.append({"contact_id": contact_id, "user_id": user_id, "name": f"Contact {i}", "email": f"c{i}@example.com"})
+        occasion_date = (today + timedelta(days=i % 90)).isoformat()
+        reminders.append({
+            "reminder_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "contact_id": contact_id,
+            "occasion_type": "birthday",
+            "occasion_date": occasion_date,
+            "reminder_days_before": 3,
+            "is_recurring": True,
+            "status": "active",
+            "next_fire_at": compute_next_fire_at(occasion_date, 3, True, today)
+        })
+    await contact_repo.collection.insert_many(contacts)
+    await reminder_repo.collection.insert_many(reminders)
+
+
+async def n_plus_one(contact_repo: ContactRepository, reminder_repo: ReminderRepository, user_id: str) -> int:
+    reminders = await reminder_repo.collection.find({"user_id": user_id, "status": "active"}, {"_id": 0}).to_list(None)
+    today = datetime.utcnow().date()
+    upcoming = []
+    for reminder in reminders:
+        reminder_date = datetime.fromisoformat(reminder["occasion_date"]).date() - timedelta(days=reminder["reminder_days_before"])
+        if today <= reminder_date <= today + timedelta(days=WINDOW_DAYS):
+            await contact_repo.collection.find_one({"contact_id": reminder["contact_id"]}, {"_id": 0, "name": 1, "email": 1})
+            upcoming.append(reminder)
+    return len(upcoming)
+
+
+async def batched(contact_repo: ContactRepository, reminder_repo: ReminderRepository, user_id: str) -> int:
+    start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    reminders = await reminder_repo.list_upcoming(user_id, start, start + timedelta(days=WINDOW_DAYS + 1))
+    await contact_repo.get_summaries(user_id, {reminder["contact_id"] for reminder in reminders})
+    return len(reminders)
+
+
+async def timed(fn, *args, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+    contact_repo, reminder_repo = ContactRepository(db), ReminderRepository(db)
+
+    print(f"{'reminders':>10}{'N+1 ms':>12}{'batched ms':>12}{'speedup':>10}")
+    for size in args.sizes:
+        user_id = f"bench-{uuid.uuid4()}"
+        try:
+            await seed(contact_repo, reminder_repo, user_id, size)
+            slow = await timed(n_plus_one, contact_repo, reminder_repo, user_id, runs=args.runs)
+            fast = await timed(batched, contact_repo, reminder_repo, user_id, runs=args.runs)
+            print(f"{size:>10}{slow:>12.1f}{fast:>12.1f}{slow / fast:>9.1f}x")
+        finally:
+            await contact_repo.collection.delete_many({"user_id": user_id})
+            await reminder_repo.collection.delete_many({"user_id": user_id})
+    db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+In-process TTL + LRU caches with hit/miss counters
+
+Every cache registers itself so its counters can be reported from a single
+monitoring endpoint via cache_stats().
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+_registry: List["TTLCache"] = []
+
+
+class TTLCache:
+    """
+    Least-recently-used cache whose entries also expire after a time-to-live
+
+    Entries can override the default TTL, or carry an absolute wall-clock
+    expiry (e.g. a JWT exp claim).
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        _registry.append(self)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires = entry
+        if expires <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, expires_at: Optional[float] = None) -> None:
+        if expires_at is not None:
+            ttl = min(ttl or self.ttl, expires_at - time.time())
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def cache_stats() -> List[dict]:
+    return [cache.stats() for cache in _registry]
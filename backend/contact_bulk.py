@@ -0,0 +1,184 @@
+"""
+Bulk contact mutations
+
+POST /api/contacts/bulk applies up to MAX_BULK_OPERATIONS creates, updates,
+deletes and tag changes in one request. Operations are processed in batches
+of BULK_BATCH_SIZE, and each batch costs a fixed number of round-trips
+whatever its size:
+
+- one $in lookup of the contacts it references, so updates and deletes of
+  contacts that do not exist (or belong to someone else) are reported
+  instead of silently matching nothing;
+- one unordered bulk_write with every write in the batch;
+- one $in lookup and bulk_write refreshing search_keys of updated contacts;
+- one user-scoped $in delete of the deleted contacts' reminders (see
+  ReminderRepository.delete_for_contacts).
+
+Every operation gets a result with its index, contact_id and status.
+Operations run in no particular order, so a contact may appear in only
+one operation per request.
+"""
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import DeleteOne, InsertOne, UpdateOne
+
+from contact_search import SEARCH_FIELDS, search_keys
+from repositories import ContactRepository, ReminderRepository
+
+MAX_BULK_OPERATIONS = int(os.getenv("MAX_BULK_OPERATIONS", "5000"))
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+CONTACT_DEFAULTS = {
+    "email": None, "phone": None, "birthday": None, "relationship": None, "notes": None,
+    "tags": [], "custom_fields": {}
+}
+
+
+class BulkResults:
+    def __init__(self, size: int):
+        self.results: List[Optional[dict]] = [None] * size
+
+    def add(self, index: int, contact_id: Optional[str], status: str, error: Optional[str] = None):
+        result = {"index": index, "contact_id": contact_id, "status": status}
+        if error:
+            result["error"] = error
+        self.results[index] = result
+
+    def to_dict(self) -> dict:
+        counts = {"created": 0, "updated": 0, "deleted": 0, "failed": 0}
+        for result in self.results:
+            counts[result["status"]] += 1
+        return {**counts, "results": self.results}
+
+
+def contact_fields(operation: dict) -> dict:
+    return {field: value for field, value in (operation.get("contact") or {}).items() if value is not None}
+
+
+def build_write(operation: dict, user_id: str, now: str):
+    """
+    The bulk_write request for one operation
+
+    Returns:
+        (request, contact_id), or (None, error message) for an invalid operation
+    """
+    op = operation["op"]
+    fields = contact_fields(operation)
+    tags = operation.get("tags") or []
+    if op == "create":
+        if not fields.get("name"):
+            return None, "name is required"
+        contact = {
+            "contact_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            **CONTACT_DEFAULTS,
+            **fields,
+            "created_at": now,
+            "last_contacted": None,
+            "contact_frequency": 0
+        }
+        contact["search_keys"] = search_keys(contact)
+        return InsertOne(contact), contact["contact_id"]
+
+    query = {"user_id": user_id, "contact_id": operation["contact_id"]}
+    if op == "delete":
+        return DeleteOne(query), operation["contact_id"]
+    if op == "update":
+        if not fields:
+            return None, "No data to update"
+        return UpdateOne(query, {"$set": fields}), operation["contact_id"]
+    if not tags:
+        return None, "No tags given"
+    if op == "add_tags":
+        return UpdateOne(query, {"$addToSet": {"tags": {"$each": tags}}}), operation["contact_id"]
+    return UpdateOne(query, {"$pull": {"tags": {"$in": tags}}}), operation["contact_id"]
+
+
+async def apply_batch(
+    contact_repo: ContactRepository,
+    reminder_repo: ReminderRepository,
+    user_id: str,
+    batch: List[tuple],
+    results: BulkResults
+) -> None:
+    """Apply (index, operation) pairs with one bulk_write"""
+    now = datetime.utcnow().isoformat()
+    referenced = [operation["contact_id"] for _, operation in batch if operation["op"] != "create"]
+    existing = await contact_repo.get_summaries(user_id, referenced, ()) if referenced else {}
+
+    requests: List = []
+    pending: List[tuple] = []
+    for index, operation in batch:
+        if operation["op"] != "create" and operation["contact_id"] not in existing:
+            results.add(index, operation["contact_id"], "failed", "Contact not found")
+            continue
+        request, contact_id_or_error = build_write(operation, user_id, now)
+        if request is None:
+            results.add(index, operation.get("contact_id"), "failed", contact_id_or_error)
+            continue
+        requests.append(request)
+        pending.append((index, operation, contact_id_or_error))
+
+    errors: Dict[int, str] = {
+        error["index"]: error.get("errmsg", "Write failed")
+        for error in await contact_repo.bulk_mutate(user_id, requests)
+    }
+    deleted, changed = [], []
+    for position, (index, operation, contact_id) in enumerate(pending):
+        if position in errors:
+            results.add(index, contact_id, "failed", errors[position])
+            continue
+        op = operation["op"]
+        results.add(index, contact_id, {"create": "created", "delete": "deleted"}.get(op, "updated"))
+        if op == "delete":
+            deleted.append(contact_id)
+        elif op != "create":
+            # Tag changes always alter search_keys; updates only through a search field
+            if op != "update" or any(field in contact_fields(operation) for field in SEARCH_FIELDS):
+                changed.append(contact_id)
+
+    await contact_repo.refresh_search_keys(user_id, changed)
+    await reminder_repo.delete_for_contacts(user_id, deleted)
+
+
+async def apply_bulk(
+    contact_repo: ContactRepository,
+    reminder_repo: ReminderRepository,
+    user_id: str,
+    operations: List[dict]
+) -> dict:
+    """
+    Apply a bulk request in batches of BULK_BATCH_SIZE
+
+    Args:
+        contact_repo, reminder_repo: Data access
+        user_id: Owner of the contacts
+        operations: Dicts with op (create, update, delete, add_tags or
+            remove_tags), contact_id (all but create), contact (fields for
+            create and update) and tags (add_tags and remove_tags)
+
+    Returns:
+        Counts per status and one result per operation, in request order
+    """
+    results = BulkResults(len(operations))
+    batch = []
+    seen = set()
+    for index, operation in enumerate(operations):
+        contact_id = operation.get("contact_id")
+        if operation["op"] != "create":
+            if not contact_id:
+                results.add(index, None, "failed", "contact_id is required")
+                continue
+            if contact_id in seen:
+                results.add(index, contact_id, "failed", "Contact appears in an earlier operation")
+                continue
+            seen.add(contact_id)
+        batch.append((index, operation))
+        if len(batch) >= BULK_BATCH_SIZE:
+            await apply_batch(contact_repo, reminder_repo, user_id, batch, results)
+            batch = []
+    if batch:
+        await apply_batch(contact_repo, reminder_repo, user_id, batch, results)
+    return results.to_dict()
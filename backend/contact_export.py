@@ -0,0 +1,140 @@
+"""
+Streaming contact export (CSV, NDJSON, vCard)
+
+Contacts are read from a batched cursor and each batch is encoded into one
+chunk of the response as soon as it arrives, so an export holds at most
+EXPORT_BATCH_SIZE contacts in memory whatever the size of the address book,
+and the first bytes go out before the second batch is fetched.
+
+CSV exports start with the columns the CSV importer reads (see
+csv_import.py), so an exported file can be imported again as is.
+"""
+import csv
+import io
+import json
+import os
+from typing import AsyncIterator, Callable, Dict, List, Tuple
+
+from csv_import import CONTACT_COLUMNS
+from repositories import ContactRepository
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+CSV_COLUMNS = CONTACT_COLUMNS + (
+    "tags", "custom_fields", "contact_id", "created_at", "updated_at", "last_contacted", "contact_frequency"
+)
+# Content lines longer than this many characters are folded (RFC 6350 3.2)
+VCARD_LINE_LENGTH = 75
+
+
+class ExportError(ValueError):
+    """Raised for an unknown export format"""
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ";".join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, default=str) if value else ""
+    return str(value)
+
+
+def encode_csv(contacts: List[dict]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_csv_value(contact.get(column)) for column in CSV_COLUMNS] for contact in contacts)
+    return buffer.getvalue()
+
+
+def encode_ndjson(contacts: List[dict]) -> str:
+    return "".join(json.dumps(contact, default=str) + "\n" for contact in contacts)
+
+
+def _vcard_escape(value) -> str:
+    return (
+        str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _vcard_line(name: str, value: str) -> str:
+    line = f"{name}:{value}"
+    if len(line) <= VCARD_LINE_LENGTH:
+        return line + "\r\n"
+    # Continuation lines start with a space, which counts towards their length
+    parts = [line[:VCARD_LINE_LENGTH]]
+    for start in range(VCARD_LINE_LENGTH, len(line), VCARD_LINE_LENGTH - 1):
+        parts.append(" " + line[start:start + VCARD_LINE_LENGTH - 1])
+    return "\r\n".join(parts) + "\r\n"
+
+
+def encode_vcard(contact: dict) -> str:
+    name = _vcard_escape(contact.get("name") or "")
+    lines = ["BEGIN:VCARD\r\n", "VERSION:3.0\r\n", _vcard_line("FN", name), _vcard_line("N", f"{name};;;;")]
+    if contact.get("email"):
+        lines.append(_vcard_line("EMAIL;TYPE=INTERNET", _vcard_escape(contact["email"])))
+    if contact.get("phone"):
+        lines.append(_vcard_line("TEL", _vcard_escape(contact["phone"])))
+    if contact.get("birthday"):
+        lines.append(_vcard_line("BDAY", _vcard_escape(contact["birthday"])))
+    if contact.get("tags"):
+        lines.append(_vcard_line("CATEGORIES", ",".join(_vcard_escape(tag) for tag in contact["tags"])))
+    if contact.get("relationship"):
+        lines.append(_vcard_line("X-REMINDME-RELATIONSHIP", _vcard_escape(contact["relationship"])))
+    if contact.get("notes"):
+        lines.append(_vcard_line("NOTE", _vcard_escape(contact["notes"])))
+    lines.append(_vcard_line("UID", _vcard_escape(contact["contact_id"])))
+    lines.append("END:VCARD\r\n")
+    return "".join(lines)
+
+
+def encode_vcf(contacts: List[dict]) -> str:
+    return "".join(encode_vcard(contact) for contact in contacts)
+
+
+# format: (media type, file extension, header, batch encoder)
+EXPORT_FORMATS: Dict[str, Tuple[str, str, str, Callable[[List[dict]], str]]] = {
+    "csv": ("text/csv; charset=utf-8", "csv", encode_csv([dict(zip(CSV_COLUMNS, CSV_COLUMNS))]), encode_csv),
+    "ndjson": ("application/x-ndjson", "ndjson", "", encode_ndjson),
+    "vcf": ("text/vcard; charset=utf-8", "vcf", "", encode_vcf),
+}
+
+
+def export_format(name: str) -> Tuple[str, str]:
+    """
+    Media type and file extension of an export format
+
+    Raises:
+        ExportError: If the format is not one of EXPORT_FORMATS
+    """
+    if name not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown export format '{name}', expected one of: {', '.join(EXPORT_FORMATS)}")
+    media_type, extension, _, _ = EXPORT_FORMATS[name]
+    return media_type, extension
+
+
+async def export_contacts(
+    contact_repo: ContactRepository,
+    user_id: str,
+    format: str,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """
+    Encode all of a user's contacts, yielding one chunk per cursor batch
+
+    Args:
+        contact_repo: Contact data access
+        user_id: Owner of the contacts
+        format: One of EXPORT_FORMATS
+        batch_size: Contacts fetched and encoded per chunk
+
+    Raises:
+        ExportError: If the format is not one of EXPORT_FORMATS
+    """
+    export_format(format)
+    _, _, header, encode = EXPORT_FORMATS[format]
+    if header:
+        yield header.encode("utf-8")
+    async for batch in contact_repo.iter_batches(user_id, batch_size):
+        yield encode(batch).encode("utf-8")
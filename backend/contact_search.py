@@ -0,0 +1,199 @@
+"""
+Indexed contact search
+
+GET /api/contacts/search answers two kinds of lookup, both from indexes:
+
+- As you type: every contact stores search_keys, the normalized words of its
+  name, email, relationship and tags, and its phone number's digits from each
+  group onwards (so "555" and "0101" both find +1-555-0101). A query matches
+  when each of its words is a prefix of some key, which is an anchored regex
+  range scan on the multikey (user_id, search_keys) index.
+- Full text: when prefix matches do not fill the page, a text index over
+  name, email, phone, relationship, notes and tags (prefixed by user_id)
+  adds stemmed whole-word matches, notably from notes.
+
+Prefix matches rank first: whole name words above name prefixes above
+matches in other fields, then by text score and name. Contacts created
+before search_keys existed are indexed by backfill_search_keys, which the
+API server runs at startup; run it once by hand with:
+
+    python contact_search.py
+"""
+import asyncio
+import os
+import re
+import time
+import unicodedata
+from typing import TYPE_CHECKING, List, Optional
+
+from pymongo import UpdateOne
+
+if TYPE_CHECKING:
+    # repositories imports search_keys from this module
+    from repositories import ContactRepository
+
+SEARCH_FIELDS = ("name", "email", "phone", "relationship", "tags")
+DEFAULT_SEARCH_RESULTS = 20
+MAX_SEARCH_RESULTS = 100
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "200"))
+SEARCH_BACKFILL_BATCH_SIZE = int(os.getenv("SEARCH_BACKFILL_BATCH_SIZE", "1000"))
+MAX_SEARCH_KEYS = 64
+MAX_QUERY_TERMS = 8
+MIN_PHONE_DIGITS = 3
+PHONE_QUERY = re.compile(r"[\d\s()+.\-]+")
+
+
+def normalize(text: str) -> str:
+    """Case-fold and strip accents, so "José" and "jose" compare equal"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def words(text: Optional[str]) -> List[str]:
+    return re.findall(r"\w+", normalize(text)) if text else []
+
+
+def phone_keys(phone: Optional[str]) -> List[str]:
+    """The phone's digits starting at each digit group: +1-555-0101 -> 15550101, 5550101, 0101"""
+    groups = re.findall(r"\d+", phone or "")
+    digits = "".join(groups)
+    keys, offset = [], 0
+    for group in groups:
+        if len(digits) - offset >= MIN_PHONE_DIGITS:
+            keys.append(digits[offset:])
+        offset += len(group)
+    return keys
+
+
+def search_keys(contact: dict) -> List[str]:
+    """Normalized lookup keys for a contact's SEARCH_FIELDS"""
+    keys = set(words(contact.get("name")) + words(contact.get("email")) + words(contact.get("relationship")))
+    for tag in contact.get("tags") or []:
+        keys.update(words(tag))
+    keys.update(phone_keys(contact.get("phone")))
+    return sorted(keys)[:MAX_SEARCH_KEYS]
+
+
+def query_terms(query: str) -> List[str]:
+    """Words of a query, longest (most selective) first; a phone-like query is one run of digits"""
+    if PHONE_QUERY.fullmatch(query):
+        digits = re.sub(r"\D", "", query)
+        if len(digits) >= MIN_PHONE_DIGITS:
+            return [digits]
+    terms = list(dict.fromkeys(words(query)))[:MAX_QUERY_TERMS]
+    return sorted(terms, key=len, reverse=True)
+
+
+def prefix_score(contact: dict, terms: List[str], query: str) -> int:
+    """0 for a contact no key of which starts with every term, higher for better name matches"""
+    name_words = words(contact.get("name"))
+    keys = contact.get("search_keys") or search_keys(contact)
+    score = 0
+    for term in terms:
+        if term in name_words:
+            score += 3
+        elif any(word.startswith(term) for word in name_words):
+            score += 2
+        elif any(key.startswith(term) for key in keys):
+            score += 1
+        else:
+            return 0
+    if normalize(contact.get("name") or "").startswith(normalize(query.strip())):
+        score += 1
+    return score
+
+
+async def search_contacts(contact_repo: "ContactRepository", user_id: str, query: str, limit: int) -> List[dict]:
+    """
+    A user's contacts matching query, best first
+
+    Args:
+        contact_repo: Contact data access
+        user_id: Owner of the contacts
+        query: Text typed by the user
+        limit: Maximum contacts returned
+
+    Returns:
+        Contacts with their public fields
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    found = {
+        contact["contact_id"]: contact
+        for contact in await contact_repo.search_prefix(user_id, terms, max(limit, SEARCH_CANDIDATES))
+    }
+    if len(found) < limit:
+        for contact in await contact_repo.search_text(user_id, " ".join(words(query)), max(limit, SEARCH_CANDIDATES)):
+            found.setdefault(contact["contact_id"], contact)["text_score"] = contact["text_score"]
+
+    ranked = sorted(
+        found.values(),
+        key=lambda contact: (
+            -prefix_score(contact, terms, query),
+            -contact.get("text_score", 0),
+            contact.get("name") or ""
+        )
+    )
+    results = []
+    for contact in ranked[:limit]:
+        contact.pop("search_keys", None)
+        contact.pop("text_score", None)
+        results.append(contact)
+    return results
+
+
+async def backfill_search_keys(contact_repo: "ContactRepository", time_budget: Optional[float] = None) -> int:
+    """
+    Set search_keys on contacts stored without them
+
+    Scans the collection once in _id order, SEARCH_BACKFILL_BATCH_SIZE
+    contacts at a time, and stops early after time_budget seconds.
+
+    Returns:
+        Number of contacts updated
+    """
+    started = time.monotonic()
+    updated = 0
+    after_id = None
+    while time_budget is None or time.monotonic() - started < time_budget:
+        contacts = await contact_repo.list_without_search_keys(after_id, SEARCH_BACKFILL_BATCH_SIZE)
+        if not contacts:
+            break
+        await contact_repo.bulk_write([
+            UpdateOne({"_id": contact["_id"]}, {"$set": {"search_keys": search_keys(contact)}})
+            for contact in contacts
+        ])
+        updated += len(contacts)
+        after_id = contacts[-1]["_id"]
+        if len(contacts) < SEARCH_BACKFILL_BATCH_SIZE:
+            break
+    return updated
+
+
+async def run_backfill(contact_repo: "ContactRepository") -> None:
+    try:
+        updated = await backfill_search_keys(contact_repo)
+    except Exception as e:
+        print(f"Search key backfill error: {e}")
+        return
+    if updated:
+        print(f"Indexed {updated} contacts for search")
+
+
+async def main():
+    from database import Database
+    from repositories import ContactRepository
+
+    db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+    try:
+        await run_backfill(ContactRepository(db))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    asyncio.run(main())
@@ -0,0 +1,182 @@
+"""
+Streaming CSV contact importer
+
+Parses the upload incrementally with the csv module, normalizes the header row
+once, and writes each chunk with a single unordered insert_many. Rows that
+fail validation or are rejected by MongoDB are reported individually instead
+of failing the whole file.
+"""
+import asyncio
+import codecs
+import csv
+import os
+import uuid
+from datetime import datetime
+from typing import Awaitable, BinaryIO, Callable, Dict, List, Optional
+
+from email_validator import EmailNotValidError, validate_email
+
+from repositories import ContactRepository
+
+CONTACT_COLUMNS = ("name", "email", "phone", "birthday", "relationship", "notes")
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "1000"))
+MAX_REPORTED_ERRORS = 100
+DUPLICATE_KEY_ERROR = 11000
+
+
+class CSVImportError(ValueError):
+    """Raised when the file as a whole cannot be imported"""
+
+
+class ImportReport:
+    def __init__(self, rows_processed: int = 0, imported: int = 0, failed: int = 0, errors: Optional[List[dict]] = None):
+        self.rows_processed = rows_processed
+        self.imported = imported
+        self.failed = failed
+        self.errors: List[dict] = list(errors or [])
+        self.complete = False
+
+    def add_error(self, row: int, error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+    def to_dict(self) -> dict:
+        return {
+            "message": f"Successfully imported {self.imported} contacts",
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors
+        }
+
+
+def normalize_headers(fieldnames: Optional[List[str]]) -> Dict[str, str]:
+    """Map raw CSV headers (Name, EMAIL, ' phone ') to contact fields"""
+    header_map = {}
+    for header in fieldnames or []:
+        field = (header or "").strip().lower()
+        if field in CONTACT_COLUMNS and field not in header_map.values():
+            header_map[header] = field
+    if "name" not in header_map.values():
+        raise CSVImportError("CSV must include a name column")
+    return header_map
+
+
+def build_contact(row: dict, header_map: Dict[str, str], user_id: str, created_at: str) -> dict:
+    values = {field: None for field in CONTACT_COLUMNS}
+    for header, field in header_map.items():
+        value = (row.get(header) or "").strip()
+        values[field] = value or None
+
+    if not values["name"]:
+        raise ValueError("Missing name")
+    if values["email"]:
+        try:
+            values["email"] = validate_email(values["email"], check_deliverability=False).normalized
+        except EmailNotValidError as e:
+            raise ValueError(f"Invalid email: {e}")
+
+    return {
+        "contact_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        **values,
+        "tags": [],
+        "custom_fields": {},
+        "created_at": created_at,
+        "last_contacted": None,
+        "contact_frequency": 0
+    }
+
+
+def open_csv(stream: BinaryIO) -> csv.DictReader:
+    text = codecs.getreader("utf-8-sig")(stream)
+    return csv.DictReader(text)
+
+
+def skip_rows(reader: csv.DictReader, count: int) -> int:
+    skipped = 0
+    for _ in reader:
+        skipped += 1
+        if skipped >= count:
+            break
+    return skipped
+
+
+def read_chunk(reader: csv.DictReader, size: int) -> List[dict]:
+    rows = []
+    for row in reader:
+        rows.append(row)
+        if len(rows) >= size:
+            break
+    return rows
+
+
+async def import_contacts(
+    stream: BinaryIO,
+    user_id: str,
+    contact_repo: ContactRepository,
+    chunk_rows: int = IMPORT_CHUNK_ROWS,
+    report: Optional[ImportReport] = None,
+    id_namespace: Optional[uuid.UUID] = None,
+    on_chunk: Optional[Callable[[ImportReport], Awaitable[bool]]] = None
+) -> ImportReport:
+    """
+    Import contacts from a binary CSV stream
+
+    Args:
+        stream: File-like object positioned at the start of the CSV
+        user_id: Owner of the imported contacts
+        contact_repo: Repository the contacts are written to
+        chunk_rows: Number of rows parsed and inserted per batch
+        report: Progress to resume from; its first rows_processed rows are skipped
+        id_namespace: Derive contact ids from the row number so a replayed
+            chunk hits the unique (user_id, contact_id) index instead of
+            inserting twice
+        on_chunk: Awaited after every chunk; returning False stops the import
+
+    Returns:
+        ImportReport with imported/failed counts and per-row errors
+    """
+    report = report or ImportReport()
+    try:
+        reader = await asyncio.to_thread(open_csv, stream)
+        header_map = await asyncio.to_thread(normalize_headers, reader.fieldnames)
+    except UnicodeDecodeError:
+        raise CSVImportError("CSV must be UTF-8 encoded")
+
+    row_number = await asyncio.to_thread(skip_rows, reader, report.rows_processed) if report.rows_processed else 0
+    while True:
+        try:
+            rows = await asyncio.to_thread(read_chunk, reader, chunk_rows)
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise CSVImportError(f"Malformed CSV after row {row_number}: {e}")
+        if not rows:
+            report.complete = True
+            break
+
+        created_at = datetime.utcnow().isoformat()
+        contacts, contact_rows = [], []
+        for row in rows:
+            row_number += 1
+            try:
+                contact = build_contact(row, header_map, user_id, created_at)
+                if id_namespace:
+                    contact["contact_id"] = str(uuid.uuid5(id_namespace, str(row_number)))
+                contacts.append(contact)
+                contact_rows.append(row_number)
+            except ValueError as e:
+                report.add_error(row_number, str(e))
+
+        write_errors = [
+            error for error in await contact_repo.insert_many(contacts)
+            if error.get("code") != DUPLICATE_KEY_ERROR
+        ]
+        for error in write_errors:
+            report.add_error(contact_rows[error["index"]], error.get("errmsg", "Write failed"))
+        report.imported += len(contacts) - len(write_errors)
+        report.rows_processed = row_number
+
+        if on_chunk and not await on_chunk(report):
+            break
+
+    return report
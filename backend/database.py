@@ -0,0 +1,168 @@
+"""
+Async MongoDB access for ReMindMe
+
+Motor is used by default. Setting MONGO_DRIVER=threadpool falls back to the
+synchronous pymongo driver with every call offloaded to a worker thread, so
+route handlers never block the event loop with either driver.
+"""
+import asyncio
+import os
+from typing import Any, Callable, List, Optional
+
+MONGO_DRIVER = os.getenv("MONGO_DRIVER", "motor")
+CURSOR_BATCH_SIZE = int(os.getenv("MONGO_CURSOR_BATCH_SIZE", "500"))
+
+
+class ThreadedCursor:
+    """Async facade over a pymongo cursor, mirroring the Motor cursor API"""
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._modifiers = []
+        self._cursor = None
+        self._buffer: List[dict] = []
+        self._exhausted = False
+
+    def _chain(self, name: str, *args, **kwargs) -> "ThreadedCursor":
+        if self._cursor is not None:
+            raise RuntimeError(f"Cannot call {name}() after iteration has started")
+        self._modifiers.append((name, args, kwargs))
+        return self
+
+    def sort(self, *args, **kwargs) -> "ThreadedCursor":
+        return self._chain("sort", *args, **kwargs)
+
+    def skip(self, *args, **kwargs) -> "ThreadedCursor":
+        return self._chain("skip", *args, **kwargs)
+
+    def limit(self, *args, **kwargs) -> "ThreadedCursor":
+        return self._chain("limit", *args, **kwargs)
+
+    def batch_size(self, *args, **kwargs) -> "ThreadedCursor":
+        return self._chain("batch_size", *args, **kwargs)
+
+    def _open(self):
+        if self._cursor is None:
+            cursor = self._factory()
+            for name, args, kwargs in self._modifiers:
+                cursor = getattr(cursor, name)(*args, **kwargs)
+            self._cursor = cursor
+        return self._cursor
+
+    def _take(self, length: Optional[int]) -> List[dict]:
+        cursor = self._open()
+        docs = []
+        for doc in cursor:
+            docs.append(doc)
+            if length is not None and len(docs) >= length:
+                break
+        return docs
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        docs, self._buffer = self._buffer, []
+        if length is not None and len(docs) >= length:
+            self._buffer = docs[length:]
+            return docs[:length]
+        remaining = None if length is None else length - len(docs)
+        docs.extend(await asyncio.to_thread(self._take, remaining))
+        return docs
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        if not self._buffer:
+            if self._exhausted:
+                raise StopAsyncIteration
+            self._buffer = await asyncio.to_thread(self._take, CURSOR_BATCH_SIZE)
+            if len(self._buffer) < CURSOR_BATCH_SIZE:
+                self._exhausted = True
+            if not self._buffer:
+                raise StopAsyncIteration
+        return self._buffer.pop(0)
+
+
+class ThreadedCollection:
+    """Async facade over a pymongo collection, mirroring the Motor collection API"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    @property
+    def name(self) -> str:
+        return self._collection.name
+
+    def find(self, *args, **kwargs) -> ThreadedCursor:
+        return ThreadedCursor(lambda: self._collection.find(*args, **kwargs))
+
+    def aggregate(self, pipeline: list, **kwargs) -> ThreadedCursor:
+        return ThreadedCursor(lambda: self._collection.aggregate(pipeline, **kwargs))
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(attr, *args, **kwargs)
+
+        return call
+
+
+class Database:
+    """Lazily connected database handle returning async collections"""
+
+    def __init__(self, url: str, driver: str = MONGO_DRIVER, **client_options):
+        if driver not in ("motor", "threadpool"):
+            raise ValueError(f"Unknown MONGO_DRIVER '{driver}', expected 'motor' or 'threadpool'")
+        self.url = url
+        self.driver = driver
+        self.client_options = client_options
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            if self.driver == "motor":
+                from motor.motor_asyncio import AsyncIOMotorClient
+                self._client = AsyncIOMotorClient(self.url, **self.client_options)
+            else:
+                from pymongo import MongoClient
+                self._client = MongoClient(self.url, **self.client_options)
+        return self._client
+
+    def __getitem__(self, name: str):
+        collection = self.client.get_database()[name]
+        if self.driver == "threadpool":
+            return ThreadedCollection(collection)
+        return collection
+
+    def warm_up(self) -> None:
+        """
+        Create the client and start connecting in background threads
+
+        Returns at once; server discovery and the minPoolSize connections are
+        set up by the driver's monitor threads, so the first query finds an
+        open connection instead of paying for DNS, TLS and auth itself.
+        """
+        if self._client is None:
+            # Motor otherwise defers connecting until the first operation
+            self.client_options.setdefault("connect", True)
+        self.client
+
+    async def command(self, *args, **kwargs) -> dict:
+        """Run a database command, e.g. explain"""
+        database = self.client.get_database()
+        if self.driver == "motor":
+            return await database.command(*args, **kwargs)
+        return await asyncio.to_thread(database.command, *args, **kwargs)
+
+    async def ping(self) -> dict:
+        if self.driver == "motor":
+            return await self.client.admin.command("ping")
+        return await asyncio.to_thread(self.client.admin.command, "ping")
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
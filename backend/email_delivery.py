@@ -0,0 +1,225 @@
+"""
+Outbound email delivery
+
+/api/email/send enqueues the email in the email_outbox collection and
+returns right away. A sender drains the queue: it claims due emails with a
+time-limited lease (so several senders never deliver the same email) and
+sends them over a pool of persistent SMTP sessions (see smtp_pool.py).
+
+Temporary failures are retried with exponential backoff up to
+EMAIL_MAX_ATTEMPTS; permanent ones (5xx replies, refused recipients) fail
+at once. The outcome is recorded on the outbox entry and, when the email
+carries a generated message, on that message's record too. Each user may
+enqueue at most EMAIL_RATE_LIMIT_PER_HOUR emails per hour; reminder emails
+queued by the dispatcher (source "reminder") do not count towards it.
+
+Run a standalone sender with:
+
+    python email_delivery.py
+"""
+import asyncio
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import TYPE_CHECKING, Optional
+
+from repositories import EmailRepository, MessageRepository
+
+if TYPE_CHECKING:
+    # aiosmtplib is only imported once SMTP is configured
+    from smtp_pool import SMTPPool
+
+SMTP_FROM = os.getenv("SMTP_FROM") or os.getenv("SMTP_USER") or "remindme@localhost"
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_RATE_LIMIT_PER_HOUR = int(os.getenv("EMAIL_RATE_LIMIT_PER_HOUR", "50"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+EMAIL_LEASE_SECONDS = int(os.getenv("EMAIL_LEASE_SECONDS", "120"))
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "2"))
+
+
+class EmailRateLimited(Exception):
+    """Raised when a user has reached EMAIL_RATE_LIMIT_PER_HOUR"""
+
+
+def create_smtp_pool() -> Optional["SMTPPool"]:
+    """Pool configured from SMTP_* settings, or None when SMTP_HOST is unset"""
+    hostname = os.getenv("SMTP_HOST")
+    if not hostname:
+        return None
+    from smtp_pool import SMTPPool
+
+    return SMTPPool(
+        hostname=hostname,
+        port=int(os.getenv("SMTP_PORT", "587")),
+        username=os.getenv("SMTP_USER"),
+        password=os.getenv("SMTP_PASSWORD"),
+        use_tls=os.getenv("SMTP_USE_TLS", "false").lower() == "true",
+        size=int(os.getenv("SMTP_POOL_SIZE", "4")),
+        max_messages=int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+    )
+
+
+async def enqueue_email(
+    email_repo: EmailRepository,
+    user_id: str,
+    to_email: str,
+    subject: str,
+    body: str,
+    message_id: Optional[str] = None,
+    source: str = "user"
+) -> dict:
+    """Queue an email for delivery, enforcing the per-user hourly limit on emails users send"""
+    now = datetime.utcnow()
+    if source == "user":
+        sent_last_hour = await email_repo.count_since(user_id, (now - timedelta(hours=1)).isoformat())
+        if sent_last_hour >= EMAIL_RATE_LIMIT_PER_HOUR:
+            raise EmailRateLimited(f"At most {EMAIL_RATE_LIMIT_PER_HOUR} emails per hour")
+
+    email = {
+        "email_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "message_id": message_id,
+        "source": source,
+        "to_email": to_email,
+        "subject": subject,
+        "body": body,
+        "status": "queued",
+        "attempts": 0,
+        "last_error": None,
+        "next_attempt_at": now,
+        "created_at": now.isoformat(),
+        "sent_at": None
+    }
+    await email_repo.create(email)
+    return email
+
+
+def build_message(email: dict) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = SMTP_FROM
+    message["To"] = email["to_email"]
+    message["Subject"] = email["subject"]
+    message["Message-ID"] = f"<{email['email_id']}@remindme>"
+    message.set_content(email["body"])
+    return message
+
+
+def is_permanent(error: Exception) -> bool:
+    from aiosmtplib import SMTPRecipientsRefused, SMTPResponseException
+
+    if isinstance(error, SMTPRecipientsRefused):
+        return True
+    return isinstance(error, SMTPResponseException) and 500 <= error.code < 600
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter after the given number of failed attempts"""
+    return EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+
+
+async def deliver(
+    email: dict,
+    pool: "SMTPPool",
+    email_repo: EmailRepository,
+    message_repo: MessageRepository,
+    worker_id: str
+) -> bool:
+    """Send one claimed email and record the outcome; returns True if it was sent"""
+    now = datetime.utcnow()
+    try:
+        await pool.send(build_message(email))
+    except Exception as e:
+        attempts = email["attempts"] + 1
+        failed = is_permanent(e) or attempts >= EMAIL_MAX_ATTEMPTS
+        fields = {
+            "status": "failed" if failed else "queued",
+            "attempts": attempts,
+            "last_error": repr(e),
+            "next_attempt_at": now + timedelta(seconds=retry_delay(attempts))
+        }
+        sent = False
+    else:
+        fields = {"status": "sent", "attempts": email["attempts"] + 1, "sent_at": now.isoformat()}
+        sent = True
+
+    if await email_repo.update(email["email_id"], worker_id, fields) and email.get("message_id"):
+        await message_repo.set_delivery_status(email["user_id"], email["message_id"], {
+            "delivery_status": fields["status"],
+            "email_id": email["email_id"],
+            "delivery_updated_at": now.isoformat()
+        })
+    return sent
+
+
+async def drain_outbox(
+    email_repo: EmailRepository,
+    message_repo: MessageRepository,
+    pool: "SMTPPool",
+    worker_id: str,
+    time_budget: Optional[float] = None
+) -> int:
+    """
+    Deliver due emails until none are left or time_budget seconds have passed
+
+    Returns:
+        Number of emails claimed
+    """
+    started = time.monotonic()
+    claimed_total = 0
+    while time_budget is None or time.monotonic() - started < time_budget:
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=EMAIL_LEASE_SECONDS)
+        batch = []
+        for _ in range(EMAIL_BATCH_SIZE):
+            email = await email_repo.claim(worker_id, now, lease_until)
+            if email is None:
+                break
+            batch.append(email)
+        if not batch:
+            break
+        claimed_total += len(batch)
+        # The pool bounds how many of these are on the wire at once
+        await asyncio.gather(*(deliver(email, pool, email_repo, message_repo, worker_id) for email in batch))
+    return claimed_total
+
+
+async def run_sender(
+    email_repo: EmailRepository,
+    message_repo: MessageRepository,
+    pool: "SMTPPool",
+    worker_id: Optional[str] = None
+) -> None:
+    worker_id = worker_id or f"email-{uuid.uuid4()}"
+    while True:
+        try:
+            claimed = await drain_outbox(email_repo, message_repo, pool, worker_id)
+        except Exception as e:
+            print(f"Email sender error: {e}")
+            claimed = 0
+        if not claimed:
+            await asyncio.sleep(EMAIL_POLL_SECONDS)
+
+
+async def main():
+    from database import Database
+
+    pool = create_smtp_pool()
+    if pool is None:
+        raise SystemExit("SMTP_HOST is not set")
+    db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+    try:
+        await run_sender(EmailRepository(db), MessageRepository(db), pool)
+    finally:
+        await pool.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""
+Conditional GET for per-user views
+
+Every write to a user's contacts or reminders bumps the version counter in
+their user_stats document (see UserStatsRepository.increment), after the
+write itself. GET /api/contacts, /api/reminders, /api/reminders/upcoming
+and /api/analytics/dashboard derive a strong ETag from that version, the
+request URL and the current UTC date (the upcoming and dashboard views
+move with the calendar), so a client that sends it back in If-None-Match
+gets 304 Not Modified after one indexed user_stats lookup, without the
+contacts or reminders collections being read.
+
+Responses are marked private, no-cache: browsers keep them but revalidate
+on every request, so no frontend change is needed to benefit.
+"""
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+from repositories import UserStatsRepository
+
+# Bump when a tagged view's representation changes, so clients cannot keep bodies of the old shape
+REPRESENTATION_VERSION = 2
+ETAG_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+
+def make_etag(user_id: str, version: int, url: str, day: str) -> str:
+    key = f"{REPRESENTATION_VERSION}:{user_id}:{version}:{day}:{url}"
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    stats_repo: UserStatsRepository,
+    user_id: str
+) -> Optional[Response]:
+    """
+    Tag a per-user view with its ETag
+
+    Returns:
+        A 304 response when the client already has the current view,
+        otherwise None after setting the ETag on `response`
+    """
+    version = await stats_repo.get_version(user_id)
+    url = request.url.path + ("?" + request.url.query if request.url.query else "")
+    etag = make_etag(user_id, version, url, datetime.utcnow().date().isoformat())
+    headers = {"ETag": etag, **ETAG_HEADERS}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
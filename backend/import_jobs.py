@@ -0,0 +1,182 @@
+"""
+Background CSV import jobs
+
+The upload endpoint stores the file in Mongo and returns a job id right away.
+A worker then claims the job with a time-limited lease and imports it chunk by
+chunk, checkpointing progress on the job document after every chunk. If the
+worker dies, the lease expires and the next worker resumes from the last
+checkpoint; deterministic contact ids make the replayed chunk idempotent
+against the unique (user_id, contact_id) index, which is checked before a
+job starts.
+
+Run a standalone worker with:
+
+    python import_jobs.py
+"""
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import UploadFile
+
+from csv_import import CSVImportError, ImportReport, import_contacts
+from repositories import ContactRepository, ImportJobRepository
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+JOB_LEASE_SECONDS = int(os.getenv("IMPORT_JOB_LEASE_SECONDS", "60"))
+WORKER_POLL_SECONDS = float(os.getenv("IMPORT_WORKER_POLL_SECONDS", "2"))
+
+
+async def create_import_job(file: UploadFile, user_id: str, job_repo: ImportJobRepository) -> dict:
+    """Store the upload and register a pending job for it"""
+    job_id = str(uuid.uuid4())
+    n = 0
+    while True:
+        data = await file.read(UPLOAD_CHUNK_BYTES)
+        if not data:
+            break
+        await job_repo.save_upload_chunk(job_id, n, data)
+        n += 1
+
+    now = datetime.utcnow().isoformat()
+    job = {
+        "job_id": job_id,
+        "user_id": user_id,
+        "filename": file.filename,
+        "status": "pending",
+        "rows_processed": 0,
+        "rows_imported": 0,
+        "rows_failed": 0,
+        "errors": [],
+        "rows_per_second": 0.0,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "finished_at": None
+    }
+    await job_repo.create(job)
+    return job
+
+
+async def process_job(
+    job_repo: ImportJobRepository,
+    contact_repo: ContactRepository,
+    worker_id: str,
+    job_id: Optional[str] = None,
+    time_budget: Optional[float] = None
+) -> Optional[dict]:
+    """
+    Claim one import job and run it until it finishes or the time budget runs out
+
+    Args:
+        job_repo: Repository holding jobs and their uploads
+        contact_repo: Repository the contacts are written to
+        worker_id: Identifier recorded as the lease holder
+        job_id: Claim this specific job instead of the oldest claimable one
+        time_budget: Seconds after which the job is checkpointed and its lease
+            released for the next invocation (used by serverless functions)
+
+    Returns:
+        The claimed job document, or None if nothing was claimable
+    """
+    now = datetime.utcnow()
+    job = await job_repo.claim(worker_id, now, now + timedelta(seconds=JOB_LEASE_SECONDS), job_id)
+    if not job:
+        return None
+
+    job_id = job["job_id"]
+    if not await contact_repo.has_unique_contact_index():
+        # Without it a resumed chunk would insert its contacts a second time
+        await job_repo.update(job_id, worker_id, {
+            "status": "failed",
+            "error": "Contacts are missing the unique (user_id, contact_id) index; run python indexes.py",
+            "finished_at": datetime.utcnow().isoformat()
+        })
+        await job_repo.delete_upload(job_id)
+        return job
+
+    started = time.monotonic()
+    resumed_from = job["rows_processed"]
+    report = ImportReport(
+        rows_processed=job["rows_processed"],
+        imported=job["rows_imported"],
+        failed=job["rows_failed"],
+        errors=job["errors"]
+    )
+
+    def progress(report: ImportReport) -> dict:
+        elapsed = time.monotonic() - started
+        return {
+            "rows_processed": report.rows_processed,
+            "rows_imported": report.imported,
+            "rows_failed": report.failed,
+            "errors": report.errors,
+            "rows_per_second": round((report.rows_processed - resumed_from) / elapsed, 1) if elapsed else 0.0,
+            "updated_at": datetime.utcnow().isoformat()
+        }
+
+    async def checkpoint(report: ImportReport) -> bool:
+        fields = progress(report)
+        fields["lease_expires_at"] = datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)
+        if not await job_repo.update(job_id, worker_id, fields):
+            return False
+        return time_budget is None or time.monotonic() - started < time_budget
+
+    with tempfile.TemporaryFile() as upload:
+        async for chunk in job_repo.iter_upload_chunks(job_id):
+            await asyncio.to_thread(upload.write, chunk["data"])
+        upload.seek(0)
+
+        try:
+            report = await import_contacts(
+                upload,
+                job["user_id"],
+                contact_repo,
+                report=report,
+                id_namespace=uuid.UUID(job_id),
+                on_chunk=checkpoint
+            )
+        except CSVImportError as e:
+            await job_repo.update(job_id, worker_id, {
+                "status": "failed",
+                "error": str(e),
+                "finished_at": datetime.utcnow().isoformat()
+            })
+            await job_repo.delete_upload(job_id)
+            return job
+
+    if report.complete:
+        fields = progress(report)
+        fields.update({"status": "completed", "finished_at": datetime.utcnow().isoformat()})
+        if await job_repo.update(job_id, worker_id, fields):
+            await job_repo.delete_upload(job_id)
+    else:
+        # Expire the lease so the next invocation picks the job straight back up
+        await job_repo.update(job_id, worker_id, {"lease_expires_at": datetime.utcnow()})
+    return job
+
+
+async def run_worker(job_repo: ImportJobRepository, contact_repo: ContactRepository):
+    """Process import jobs forever, resuming any whose previous worker died"""
+    worker_id = f"worker-{uuid.uuid4()}"
+    while True:
+        try:
+            job = await process_job(job_repo, contact_repo, worker_id)
+        except Exception as e:
+            print(f"Import worker error: {e}")
+            job = None
+        if not job:
+            await asyncio.sleep(WORKER_POLL_SECONDS)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from database import Database
+
+    load_dotenv()
+    db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+    asyncio.run(run_worker(ImportJobRepository(db), ContactRepository(db)))
@@ -0,0 +1,214 @@
+"""
+Declarative index registry for the ReMindMe collections
+
+Indexes are applied idempotently at API startup, or from the command line:
+
+    python indexes.py            # create any missing indexes
+    python indexes.py --verify   # explain() every hot query, exit 1 on COLLSCAN
+
+With VERIFY_QUERY_PLANS=true the API server runs the same check after
+applying indexes at startup and refuses to start on a COLLSCAN, so CI or a
+staging deploy fails when an index or query change regresses a plan.
+
+When adding a query to a repository, add its shape to HOT_QUERIES so the
+verify step keeps covering it.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from database import Database
+
+
+class CollectionScanError(RuntimeError):
+    pass
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique"),
+    ],
+    "contacts": [
+        IndexModel([("user_id", ASCENDING), ("contact_id", ASCENDING)], unique=True, name="user_contact_unique"),
+        IndexModel([("user_id", ASCENDING), ("last_contacted", ASCENDING)], name="user_last_contacted"),
+        # Keyset pagination: (sort key, id) within a user
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING), ("contact_id", ASCENDING)], name="user_created_page"),
+        IndexModel([("user_id", ASCENDING), ("name", ASCENDING), ("contact_id", ASCENDING)], name="user_name_page"),
+        # Tag and relationship filters; the multikey (user_id, tags) prefix also serves the facet counts
+        IndexModel([("user_id", ASCENDING), ("tags", ASCENDING), ("created_at", ASCENDING), ("contact_id", ASCENDING)], name="user_tags_page"),
+        IndexModel([("user_id", ASCENDING), ("relationship", ASCENDING), ("created_at", ASCENDING), ("contact_id", ASCENDING)], name="user_relationship_page"),
+        # Search (see contact_search.py): prefix lookups, then full text within a user
+        IndexModel([("user_id", ASCENDING), ("search_keys", ASCENDING)], name="user_search_keys"),
+        IndexModel(
+            [("user_id", ASCENDING), *((field, TEXT) for field in ("name", "email", "phone", "relationship", "notes", "tags"))],
+            weights={"name": 10, "email": 5, "tags": 5, "relationship": 3, "phone": 3, "notes": 1},
+            name="user_search_text"
+        ),
+    ],
+    "reminders": [
+        # Also serves (user_id, status) lookups through its prefix
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("next_fire_at", ASCENDING)], name="user_status_next_fire"),
+        IndexModel([("status", ASCENDING), ("next_fire_at", ASCENDING)], name="status_next_fire"),
+        IndexModel([("status", ASCENDING), ("dispatch_at", ASCENDING)], name="status_dispatch_at"),
+        IndexModel([("contact_id", ASCENDING)], name="contact_id"),
+        IndexModel([("reminder_id", ASCENDING)], unique=True, name="reminder_id_unique"),
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING), ("reminder_id", ASCENDING)], name="user_created_page"),
+        IndexModel([("user_id", ASCENDING), ("occasion_date", ASCENDING), ("reminder_id", ASCENDING)], name="user_occasion_page"),
+    ],
+    "user_stats": [
+        IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique"),
+    ],
+    "ai_message_cache": [
+        IndexModel([("key", ASCENDING)], unique=True, name="key_unique"),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    "email_outbox": [
+        IndexModel([("email_id", ASCENDING)], unique=True, name="email_id_unique"),
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease"),
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING)], name="user_created"),
+    ],
+    "messages": [
+        IndexModel([("message_id", ASCENDING)], unique=True, name="message_id_unique"),
+    ],
+    "import_jobs": [
+        IndexModel([("job_id", ASCENDING)], unique=True, name="job_id_unique"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease"),
+    ],
+    "import_uploads": [
+        IndexModel([("job_id", ASCENDING), ("n", ASCENDING)], unique=True, name="job_chunk_unique"),
+    ],
+}
+
+_SAMPLE_DATE = datetime(2000, 1, 1)
+
+# (collection, filter, sort) shapes of every query issued on a request path
+HOT_QUERIES = [
+    ("users", {"email": "user@example.com"}, None),
+    ("users", {"user_id": "u"}, None),
+    ("users", {"user_id": {"$in": ["u1", "u2"]}}, None),
+    ("contacts", {"user_id": "u"}, None),
+    ("contacts", {"user_id": "u"}, {"created_at": 1, "contact_id": 1}),
+    ("contacts", {"user_id": "u"}, {"name": -1, "contact_id": -1}),
+    ("contacts", {"user_id": "u", "tags": {"$all": ["t"]}}, {"created_at": 1, "contact_id": 1}),
+    ("contacts", {"user_id": "u", "relationship": "r"}, {"created_at": 1, "contact_id": 1}),
+    ("contacts", {"user_id": "u", "tags": {"$all": ["t"]}, "relationship": "r"}, {"created_at": -1, "contact_id": -1}),
+    ("contacts", {"user_id": "u", "contact_id": "c"}, None),
+    ("contacts", {"user_id": "u", "contact_id": {"$in": ["c1", "c2"]}}, None),
+    ("contacts", {"user_id": "u", "$or": [{"last_contacted": {"$lt": "2000-01-01"}}, {"last_contacted": None}]}, None),
+    ("contacts", {"user_id": "u", "$and": [{"search_keys": re.compile("^jo")}, {"search_keys": re.compile("^d")}]}, None),
+    ("contacts", {"user_id": "u", "$text": {"$search": "hiking"}}, {"text_score": {"$meta": "textScore"}}),
+    ("reminders", {"user_id": "u"}, None),
+    ("reminders", {"user_id": "u"}, {"created_at": 1, "reminder_id": 1}),
+    ("reminders", {"user_id": "u"}, {"occasion_date": 1, "reminder_id": 1}),
+    ("reminders", {"user_id": "u", "status": "active"}, None),
+    ("reminders", {"user_id": "u", "status": "active", "next_fire_at": {"$gte": _SAMPLE_DATE, "$lt": _SAMPLE_DATE}}, {"next_fire_at": 1}),
+    ("reminders", {"user_id": "u", "status": "active", "$or": [
+        {"is_recurring": True, "next_fire_at": {"$lt": _SAMPLE_DATE}},
+        {"next_fire_at": {"$exists": False}},
+        {"dispatch_at": {"$exists": False}}
+    ], "dispatch_lease_expires_at": {"$not": {"$gt": _SAMPLE_DATE}}}, None),
+    ("reminders", {"status": "active", "$or": [
+        {"is_recurring": True, "next_fire_at": {"$lt": _SAMPLE_DATE}},
+        {"next_fire_at": {"$exists": False}},
+        {"dispatch_at": {"$exists": False}}
+    ], "dispatch_lease_expires_at": {"$not": {"$gt": _SAMPLE_DATE}}}, None),
+    ("reminders", {"reminder_id": "r", "user_id": "u"}, None),
+    ("reminders", {"status": "active", "dispatch_at": {"$gte": _SAMPLE_DATE, "$lte": _SAMPLE_DATE},
+                   "dispatch_lease_expires_at": {"$not": {"$gt": _SAMPLE_DATE}}}, {"dispatch_at": 1}),
+    ("reminders", {"reminder_id": {"$in": ["r1", "r2"]}, "dispatch_token": "t"}, None),
+    ("reminders", {"status": "active", "dispatch_at": {"$gt": _SAMPLE_DATE}}, {"dispatch_at": 1}),
+    ("reminders", {"user_id": "u", "contact_id": {"$in": ["c1", "c2"]}, "status": "active"}, None),
+    ("reminders", {"user_id": "u", "contact_id": {"$in": ["c1", "c2"]}}, None),
+    ("user_stats", {"user_id": "u"}, None),
+    ("ai_message_cache", {"key": "k", "expires_at": {"$gt": _SAMPLE_DATE}}, None),
+    ("ai_message_cache", {"key": {"$in": ["k1", "k2"]}, "expires_at": {"$gt": _SAMPLE_DATE}}, None),
+    ("email_outbox", {"email_id": "e", "user_id": "u"}, None),
+    ("email_outbox", {"user_id": "u", "created_at": {"$gte": "2000-01-01"}, "source": "user"}, None),
+    ("email_outbox", {"$or": [
+        {"status": "queued", "next_attempt_at": {"$lte": _SAMPLE_DATE}},
+        {"status": "sending", "lease_expires_at": {"$lte": _SAMPLE_DATE}}
+    ]}, {"next_attempt_at": 1}),
+    ("messages", {"message_id": "m", "user_id": "u"}, None),
+    ("import_jobs", {"job_id": "j", "user_id": "u"}, None),
+    ("import_jobs", {"$or": [{"status": "pending"}, {"status": "running", "lease_expires_at": {"$lte": _SAMPLE_DATE}}]}, None),
+    ("import_uploads", {"job_id": "j"}, {"n": 1}),
+]
+
+
+async def ensure_indexes(db: Database) -> None:
+    """Create every registered index; existing identical indexes are a no-op"""
+    for collection_name, models in INDEXES.items():
+        try:
+            await db[collection_name].create_indexes(models)
+        except OperationFailure as e:
+            # e.g. duplicate data blocking a unique index; keep serving
+            print(f"Index creation failed on {collection_name}: {e}")
+
+
+def find_collscans(plan) -> List[dict]:
+    if isinstance(plan, dict):
+        found = [plan] if plan.get("stage") == "COLLSCAN" else []
+        for value in plan.values():
+            found.extend(find_collscans(value))
+        return found
+    if isinstance(plan, list):
+        return [stage for value in plan for stage in find_collscans(value)]
+    return []
+
+
+async def verify_query_plans(db: Database) -> List[str]:
+    """Return a description of every hot query whose winning plan is a COLLSCAN"""
+    failures = []
+    for collection_name, query, sort in HOT_QUERIES:
+        find = {"find": collection_name, "filter": query}
+        if sort:
+            find["sort"] = sort
+        explain = await db.command({"explain": find, "verbosity": "queryPlanner"})
+        if find_collscans(explain["queryPlanner"]["winningPlan"]):
+            failures.append(f"{collection_name}: {query}")
+    return failures
+
+
+async def check_query_plans(db: Database) -> None:
+    """Raise CollectionScanError if any hot query plans a COLLSCAN"""
+    failures = await verify_query_plans(db)
+    if failures:
+        raise CollectionScanError("Hot queries without an index: " + "; ".join(failures))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Apply and verify MongoDB indexes")
+    parser.add_argument("--verify", action="store_true", help="fail if any hot query plans a COLLSCAN")
+    args = parser.parse_args()
+
+    db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+    try:
+        await ensure_indexes(db)
+        print("Indexes applied")
+        if not args.verify:
+            return
+        failures = await verify_query_plans(db)
+    finally:
+        db.close()
+
+    for failure in failures:
+        print(f"COLLSCAN: {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"All {len(HOT_QUERIES)} hot queries use an index")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    asyncio.run(main())
@@ -0,0 +1,196 @@
+"""
+LLM providers behind one interface
+
+LLM_BACKEND selects the provider:
+
+    emergent  Gemini through the Emergent LLM key (EMERGENT_LLM_KEY), default
+    google    Gemini through the google-genai SDK (GEMINI_API_KEY), streams tokens
+    stub      Offline canned replies with configurable latency, for load tests
+
+Providers create their SDK clients lazily on first use (or in warm_up), so
+importing this module needs neither an API key nor the SDK installed; a
+missing key surfaces as a failed call, which the generator turns into its
+template fallback.
+"""
+import asyncio
+import json
+import os
+import random
+import uuid
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Optional
+
+from prompt_packing import is_packed_prompt, unpack_requests
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "emergent")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+LLM_STUB_LATENCY_SECONDS = float(os.getenv("LLM_STUB_LATENCY_SECONDS", "0.5"))
+LLM_STUB_ITEM_SECONDS = float(os.getenv("LLM_STUB_ITEM_SECONDS", "0.05"))
+LLM_STUB_FAILURE_RATE = float(os.getenv("LLM_STUB_FAILURE_RATE", "0"))
+
+
+class LLMProvider(ABC):
+    """Base class; `name` identifies provider and model in cache keys"""
+
+    name = "base"
+
+    @abstractmethod
+    async def complete(self, system_message: str, prompt: str) -> str:
+        """The whole reply to prompt"""
+
+    async def stream(self, system_message: str, prompt: str) -> AsyncIterator[str]:
+        """Reply chunks as they are produced; by default the whole reply at once"""
+        yield await self.complete(system_message, prompt)
+
+    async def warm_up(self) -> None:
+        """Create clients ahead of the first request"""
+
+
+class EmergentProvider(LLMProvider):
+    """
+    Gemini via emergentintegrations
+
+    LlmChat is a stateful conversation, so each call opens a fresh chat; the
+    SDK import and key check happen once.
+    """
+
+    def __init__(self, api_key: Optional[str], provider: str = "gemini", model: str = LLM_MODEL):
+        self.api_key = api_key
+        self.provider = provider
+        self.model = model
+        self.name = f"{provider}/{model}"
+        self._sdk = None
+
+    def _load_sdk(self):
+        if self._sdk is None:
+            if not self.api_key:
+                raise ValueError("EMERGENT_LLM_KEY not found in environment variables")
+            from emergentintegrations.llm.chat import LlmChat, UserMessage
+            self._sdk = (LlmChat, UserMessage)
+        return self._sdk
+
+    async def complete(self, system_message: str, prompt: str) -> str:
+        LlmChat, UserMessage = self._load_sdk()
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=f"message_gen_{uuid.uuid4().hex}",
+            system_message=system_message
+        ).with_model(self.provider, self.model)
+        return await chat.send_message(UserMessage(text=prompt))
+
+    async def warm_up(self) -> None:
+        await asyncio.to_thread(self._load_sdk)
+
+
+class GoogleGenAIProvider(LLMProvider):
+    """
+    Gemini via google-genai
+
+    One client (and its HTTP connection pool) serves every call; request
+    configs are built once per system prompt.
+    """
+
+    def __init__(self, api_key: Optional[str], model: str = LLM_MODEL):
+        self.api_key = api_key
+        self.model = model
+        self.name = f"gemini/{model}"
+        self._client = None
+        self._configs: Dict[str, object] = {}
+
+    def _get_client(self):
+        if self._client is None:
+            if not self.api_key:
+                raise ValueError("GEMINI_API_KEY not found in environment variables")
+            from google import genai
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    def _get_config(self, system_message: str):
+        config = self._configs.get(system_message)
+        if config is None:
+            from google.genai import types
+            config = types.GenerateContentConfig(system_instruction=system_message)
+            self._configs[system_message] = config
+        return config
+
+    async def complete(self, system_message: str, prompt: str) -> str:
+        response = await self._get_client().aio.models.generate_content(
+            model=self.model, contents=prompt, config=self._get_config(system_message)
+        )
+        return response.text or ""
+
+    async def stream(self, system_message: str, prompt: str) -> AsyncIterator[str]:
+        chunks = await self._get_client().aio.models.generate_content_stream(
+            model=self.model, contents=prompt, config=self._get_config(system_message)
+        )
+        async for chunk in chunks:
+            if chunk.text:
+                yield chunk.text
+
+    async def warm_up(self) -> None:
+        client = await asyncio.to_thread(self._get_client)
+        # Opens the connection so the first generation skips the TLS handshake
+        await client.aio.models.get(model=self.model)
+
+
+class StubProvider(LLMProvider):
+    """
+    Canned replies, failing at LLM_STUB_FAILURE_RATE
+
+    Each call takes LLM_STUB_LATENCY_SECONDS of fixed overhead plus
+    LLM_STUB_ITEM_SECONDS per message written, and packed prompts get a JSON
+    array reply, so packing can be benchmarked offline.
+    """
+
+    def __init__(
+        self,
+        latency: float = LLM_STUB_LATENCY_SECONDS,
+        failure_rate: float = LLM_STUB_FAILURE_RATE,
+        item_latency: float = LLM_STUB_ITEM_SECONDS
+    ):
+        self.latency = latency
+        self.item_latency = item_latency
+        self.failure_rate = failure_rate
+        self.name = "stub/canned"
+        self.calls = 0
+
+    def _reply(self, prompt: str) -> str:
+        # The prompt opens with "Write a <tone> <occasion> message for <name>."
+        request = prompt.split(".")[0]
+        return f"Thinking of you today! (Stub reply to: {request}.)"
+
+    def _maybe_fail(self) -> None:
+        if random.random() < self.failure_rate:
+            raise RuntimeError("Stub provider failure")
+
+    async def complete(self, system_message: str, prompt: str) -> str:
+        self.calls += 1
+        if is_packed_prompt(prompt):
+            requests = unpack_requests(prompt)
+            await asyncio.sleep(self.latency + self.item_latency * len(requests))
+            self._maybe_fail()
+            return json.dumps([
+                {"id": request["id"], "message": self._reply(request["request"])} for request in requests
+            ])
+        await asyncio.sleep(self.latency + self.item_latency)
+        self._maybe_fail()
+        return self._reply(prompt)
+
+    async def stream(self, system_message: str, prompt: str) -> AsyncIterator[str]:
+        self.calls += 1
+        words = self._reply(prompt).split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep((self.latency + self.item_latency) / len(words))
+            if i == len(words) // 2:
+                self._maybe_fail()
+            yield word if i == 0 else f" {word}"
+
+
+def create_provider(backend: str = LLM_BACKEND) -> LLMProvider:
+    if backend == "emergent":
+        return EmergentProvider(os.getenv("EMERGENT_LLM_KEY"))
+    if backend == "google":
+        return GoogleGenAIProvider(os.getenv("GEMINI_API_KEY"))
+    if backend == "stub":
+        return StubProvider()
+    raise ValueError(f"Unknown LLM_BACKEND '{backend}', expected 'emergent', 'google' or 'stub'")
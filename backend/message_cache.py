@@ -0,0 +1,115 @@
+"""
+Two-tier cache for AI-generated messages
+
+Entries are content-addressed: the key is a hash of the model, the system
+message and the normalized prompt, so any change to the contact details,
+occasion, tone or context that would change the prompt also changes the key.
+An in-process LRU answers repeated requests without a round-trip; the Mongo
+tier (expired by a TTL index on expires_at) shares drafts across processes
+and serverless invocations.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from cache import TTLCache
+from database import Database
+
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "2000"))
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", "86400"))
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def cache_key(model: str, system_message: str, prompt: str) -> str:
+    raw = json.dumps([model, _normalize(system_message), _normalize(prompt)])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class MessageCache:
+    def __init__(self, db: Database, ttl: float = AI_CACHE_TTL_SECONDS):
+        self.collection = db["ai_message_cache"]
+        self.ttl = ttl
+        self.local = TTLCache("ai_messages", AI_CACHE_SIZE, ttl)
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        message = self.local.get(key)
+        if message is not None:
+            self.hits += 1
+            return message
+
+        now = datetime.utcnow()
+        # The TTL monitor only runs once a minute, so filter on expiry too
+        entry = await self.collection.find_one(
+            {"key": key, "expires_at": {"$gt": now}},
+            {"_id": 0, "message": 1, "expires_at": 1}
+        )
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.shared_hits += 1
+        self.local.set(key, entry["message"], ttl=(entry["expires_at"] - now).total_seconds())
+        return entry["message"]
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Cached messages for several keys, with one round-trip for those missing locally"""
+        found = {}
+        remote = []
+        for key in dict.fromkeys(keys):
+            message = self.local.get(key)
+            if message is None:
+                remote.append(key)
+            else:
+                found[key] = message
+        self.hits += len(found)
+        if not remote:
+            return found
+
+        now = datetime.utcnow()
+        cursor = self.collection.find(
+            {"key": {"$in": remote}, "expires_at": {"$gt": now}},
+            {"_id": 0, "key": 1, "message": 1, "expires_at": 1}
+        )
+        for entry in await cursor.to_list(length=None):
+            found[entry["key"]] = entry["message"]
+            self.local.set(entry["key"], entry["message"], ttl=(entry["expires_at"] - now).total_seconds())
+            self.hits += 1
+            self.shared_hits += 1
+        self.misses += sum(1 for key in remote if key not in found)
+        return found
+
+    async def set(self, key: str, message: str, model: str) -> None:
+        self.local.set(key, message)
+        now = datetime.utcnow()
+        try:
+            await self.collection.update_one(
+                {"key": key},
+                {"$set": {
+                    "message": message,
+                    "model": model,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            # A failed cache write must never fail the generation itself
+            print(f"Failed to store cached message: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
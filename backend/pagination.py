@@ -0,0 +1,132 @@
+"""
+Keyset pagination, sorting and sparse fieldsets for list endpoints
+
+A page is addressed by an opaque cursor holding the sort key and unique id of
+the last item served. The next page resumes with a range query on those two
+values instead of a skip, so deep pages cost the same as the first one and
+items inserted meanwhile never shift results between pages.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+
+class PaginationError(ValueError):
+    """Raised for an unknown sort key or field, or a malformed cursor"""
+
+
+def parse_sort(sort: str, allowed: Sequence[str]) -> Tuple[str, int]:
+    """
+    Parse a sort parameter such as "name" or "-created_at"
+
+    Returns:
+        (field, direction) with direction 1 for ascending, -1 for descending
+    """
+    field = sort[1:] if sort.startswith("-") else sort
+    if field not in allowed:
+        raise PaginationError(f"Cannot sort by '{field}', expected one of: {', '.join(allowed)}")
+    return field, -1 if sort.startswith("-") else 1
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str], always: Sequence[str]) -> dict:
+    """
+    Map a comma-separated fields parameter to a Mongo projection
+
+    The fields in `always` (the id and sort key) are included in every
+    projection so the page can still produce its next cursor.
+    """
+    projection = {"_id": 0}
+    if not fields:
+        return projection
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    projection.update({field: 1 for field in (*always, *requested)})
+    return projection
+
+
+def encode_cursor(sort: str, value, item_id: str) -> str:
+    payload = {"s": sort, "id": item_id}
+    if isinstance(value, datetime):
+        payload["d"] = value.isoformat()
+    else:
+        payload["v"] = value
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[object, str]:
+    """Return the (sort value, id) stored in a cursor issued for the same sort"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        value = datetime.fromisoformat(payload["d"]) if "d" in payload else payload["v"]
+        item_id = payload["id"]
+        cursor_sort = payload["s"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise PaginationError("Invalid cursor")
+    if cursor_sort != sort:
+        raise PaginationError("Cursor was issued for a different sort order")
+    return value, item_id
+
+
+async def fetch_page(
+    collection,
+    query: dict,
+    sort: str,
+    sort_field: str,
+    direction: int,
+    id_field: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[dict] = None,
+    include_total: bool = False
+) -> dict:
+    """
+    Fetch one page of documents ordered by (sort_field, id_field)
+
+    Args:
+        collection: Async collection to query
+        query: Filter selecting every document in the listing
+        sort: The raw sort parameter, bound into issued cursors
+        sort_field: Field to order by; must be present on every document
+        direction: 1 for ascending, -1 for descending
+        id_field: Unique field breaking ties between equal sort values
+        limit: Maximum documents in the page
+        cursor: next_cursor from the previous page, if any
+        projection: Mongo projection for the returned documents
+        include_total: Also count every document matching query
+
+    Returns:
+        {"items": [...], "next_cursor": str or None} plus "total" on request
+    """
+    page_query = query
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        op = "$gt" if direction == 1 else "$lt"
+        page_query = {"$and": [query, {"$or": [
+            {sort_field: {op: value}},
+            {sort_field: value, id_field: {op: last_id}}
+        ]}]}
+
+    # One extra document tells whether another page exists
+    items = await collection.find(page_query, projection or {"_id": 0}).sort(
+        [(sort_field, direction), (id_field, direction)]
+    ).limit(limit + 1).to_list(length=None)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(sort, last[sort_field], last[id_field])
+
+    page = {"items": items, "next_cursor": next_cursor}
+    if include_total:
+        page["total"] = await collection.count_documents(query)
+    return page
@@ -0,0 +1,91 @@
+"""
+Password hashing off the event loop
+
+bcrypt costs ~100-300ms of CPU per call, so hashing and verification run in a
+dedicated executor behind a semaphore: at most PASSWORD_HASH_CONCURRENCY calls
+run at once, up to PASSWORD_HASH_MAX_QUEUE more wait their turn, and anything
+beyond that is rejected so a login storm cannot pile up unbounded work.
+
+Raising BCRYPT_ROUNDS takes effect for existing users on their next login,
+when verify_password returns a replacement hash. passlib is only imported on
+first use, as most requests never hash a password.
+"""
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "256"))
+
+_context = None
+_executor: Optional[Executor] = None
+_semaphore = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+_waiting = 0
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when more password operations are queued than PASSWORD_HASH_MAX_QUEUE"""
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY)
+        else:
+            # bcrypt releases the GIL while hashing, so threads run in parallel
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix="bcrypt")
+    return _executor
+
+
+def _get_context():
+    global _context
+    if _context is None:
+        from passlib.context import CryptContext
+        _context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+    return _context
+
+
+def _hash(password: str) -> str:
+    return _get_context().hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return _get_context().verify_and_update(password, hashed)
+
+
+async def _run(fn, *args):
+    global _waiting
+    if _waiting >= PASSWORD_HASH_CONCURRENCY + PASSWORD_HASH_MAX_QUEUE:
+        raise PasswordHasherBusy("Too many password operations in progress")
+    _waiting += 1
+    try:
+        async with _semaphore:
+            return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _waiting -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password against its stored hash
+
+    Returns:
+        (valid, new_hash) where new_hash is set when the stored hash uses
+        outdated settings and should be replaced
+    """
+    return await _run(_verify_and_update, password, hashed)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
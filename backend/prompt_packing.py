@@ -0,0 +1,61 @@
+"""
+Packing several message prompts into one model request
+
+The packed prompt carries the individual prompts as a JSON array of
+{"id", "request"} objects and asks for a JSON array of {"id", "message"}
+objects back. Replies are validated item by item: anything missing,
+malformed or with an unknown id is simply absent from the parsed result, so
+the caller can fall back for just those items.
+"""
+import json
+from typing import Dict, Iterable, List
+
+PACKED_PROMPT_HEADER = "Write a separate message for each request in the JSON array below."
+
+
+def build_packed_prompt(prompts: Dict[str, str]) -> str:
+    """Combine prompts keyed by id into a single request"""
+    requests = [{"id": item_id, "request": prompt} for item_id, prompt in prompts.items()]
+    return (
+        f"{PACKED_PROMPT_HEADER} Reply with only a JSON array holding one object per request, "
+        '{"id": <the request id>, "message": <the message text>}, and nothing else.\n'
+        f"{json.dumps(requests)}"
+    )
+
+
+def is_packed_prompt(prompt: str) -> bool:
+    return prompt.startswith(PACKED_PROMPT_HEADER)
+
+
+def unpack_requests(prompt: str) -> List[dict]:
+    """The {"id", "request"} objects inside a packed prompt"""
+    return json.loads(prompt.split("\n", 1)[1])
+
+
+def parse_packed_reply(reply: str, ids: Iterable[str]) -> Dict[str, str]:
+    """
+    Extract the messages from a packed reply
+
+    Returns:
+        Messages keyed by id, for every well-formed item with a known id
+    """
+    expected = set(ids)
+    # Tolerate code fences or chatter around the array
+    start, end = reply.find("["), reply.rfind("]")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        items = json.loads(reply[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    messages = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        item_id, message = str(item.get("id")), item.get("message")
+        if item_id in expected and isinstance(message, str) and message.strip():
+            messages[item_id] = message
+    return messages
@@ -0,0 +1,246 @@
+"""
+Reminder dispatcher
+
+Reminders fire on their own instead of only showing up when a user opens
+the dashboard. Each tick the dispatcher leases up to
+REMINDER_DISPATCH_BATCH_SIZE active reminders whose dispatch_at day has
+arrived, drafts a message for each (one packed AI request per LLM_PACK_SIZE
+reminders, templates if the AI is slow or down), saves the drafts, queues a
+reminder email with the draft to the reminder's owner, and clears
+dispatch_at, or moves it on to next_fire_at when reminder_schedule already
+rolled a recurring reminder past the firing just sent. Otherwise recurring
+reminders get a new dispatch_at when they are rolled forward, so
+next_fire_at and the upcoming views are unchanged.
+
+dispatch_at is a day bucket (UTC midnight) and is null once fired, so
+finding due work is a range scan on the (status, dispatch_at) index and a
+tick costs the same however many reminders exist. Between ticks the
+dispatcher sleeps until the next bucket opens, checking at least every
+REMINDER_DISPATCH_POLL_SECONDS for reminders created already due.
+
+Leases make it safe to run several dispatchers; a reminder whose dispatcher
+died is fired after REMINDER_DISPATCH_LEASE_SECONDS by another one.
+Reminders more than REMINDER_DISPATCH_MAX_LAG_HOURS overdue (after an
+outage, or on first deploy) are not fired.
+
+Run a standalone dispatcher with:
+
+    python reminder_dispatch.py
+"""
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from ai_service import AIMessageGenerator
+from email_delivery import enqueue_email
+from repositories import ContactRepository, EmailRepository, MessageRepository, ReminderRepository, UserRepository
+
+REMINDER_DISPATCH_BATCH_SIZE = int(os.getenv("REMINDER_DISPATCH_BATCH_SIZE", "100"))
+REMINDER_DISPATCH_LEASE_SECONDS = int(os.getenv("REMINDER_DISPATCH_LEASE_SECONDS", "300"))
+REMINDER_DISPATCH_POLL_SECONDS = float(os.getenv("REMINDER_DISPATCH_POLL_SECONDS", "60"))
+REMINDER_DISPATCH_MAX_LAG_HOURS = float(os.getenv("REMINDER_DISPATCH_MAX_LAG_HOURS", "36"))
+REMINDER_GENERATION_TIMEOUT_SECONDS = float(os.getenv("REMINDER_GENERATION_TIMEOUT_SECONDS", "60"))
+REMINDER_MESSAGE_TONE = os.getenv("REMINDER_MESSAGE_TONE", "friendly")
+
+
+def build_reminder_email(user: dict, contact: dict, reminder: dict, message: str) -> Tuple[str, str]:
+    """Subject and body of the email telling a user about a reminder"""
+    occasion = reminder["occasion_type"].replace("-", " ")
+    occasion_day = (reminder["dispatch_at"] + timedelta(days=reminder.get("reminder_days_before") or 0)).date()
+    when = f"{occasion_day:%B} {occasion_day.day}"
+    subject = f"Reminder: {contact['name']}'s {occasion} is on {when}"
+    body = (
+        f"Hi {user.get('name') or 'there'},\n\n"
+        f"{contact['name']}'s {occasion} is on {when}. Here's a draft message you can send:\n\n"
+        f"{message}\n\n"
+        "- ReMindMe"
+    )
+    return subject, body
+
+
+async def dispatch_due(
+    reminder_repo: ReminderRepository,
+    contact_repo: ContactRepository,
+    user_repo: UserRepository,
+    message_repo: MessageRepository,
+    email_repo: EmailRepository,
+    generator: AIMessageGenerator,
+    worker_id: str,
+    send_email: bool = True,
+    now: Optional[datetime] = None,
+    generation_timeout: float = REMINDER_GENERATION_TIMEOUT_SECONDS
+) -> int:
+    """
+    Fire one batch of due reminders
+
+    Args:
+        reminder_repo, contact_repo, user_repo, message_repo, email_repo: Data access
+        generator: Drafts the message for each reminder
+        worker_id: Identifies this dispatcher in claim tokens
+        send_email: Queue reminder emails; drafts are saved either way
+        now: Current UTC time, defaults to now
+        generation_timeout: Seconds to wait for the AI before using templates
+
+    Returns:
+        Number of reminders claimed
+    """
+    now = now or datetime.utcnow()
+    token = f"{worker_id}:{uuid.uuid4()}"
+    reminders = await reminder_repo.claim_due(
+        token,
+        now - timedelta(hours=REMINDER_DISPATCH_MAX_LAG_HOURS),
+        now,
+        now + timedelta(seconds=REMINDER_DISPATCH_LEASE_SECONDS),
+        REMINDER_DISPATCH_BATCH_SIZE
+    )
+    if not reminders:
+        return 0
+
+    contact_ids: Dict[str, set] = {}
+    for reminder in reminders:
+        contact_ids.setdefault(reminder["user_id"], set()).add(reminder["contact_id"])
+    users, *summaries = await asyncio.gather(
+        user_repo.get_many(contact_ids.keys()),
+        *(contact_repo.get_summaries(user_id, ids, ("name", "relationship", "notes")) for user_id, ids in contact_ids.items())
+    )
+    contacts = {
+        (user_id, contact_id): contact
+        for user_id, found in zip(contact_ids, summaries)
+        for contact_id, contact in found.items()
+    }
+
+    # Reminders whose contact or owner is gone are marked fired without a draft
+    firing = [
+        reminder for reminder in reminders
+        if reminder["user_id"] in users and (reminder["user_id"], reminder["contact_id"]) in contacts
+    ]
+    requests = []
+    for reminder in firing:
+        contact = contacts[(reminder["user_id"], reminder["contact_id"])]
+        requests.append({
+            "contact_name": contact["name"],
+            "occasion_type": reminder["occasion_type"],
+            "tone": REMINDER_MESSAGE_TONE,
+            "custom_context": reminder.get("custom_message"),
+            "relationship": contact.get("relationship"),
+            "notes": contact.get("notes")
+        })
+    try:
+        messages = await asyncio.wait_for(generator.generate_messages(requests), generation_timeout)
+    except asyncio.TimeoutError:
+        messages = [
+            generator.fallback_message(request["contact_name"], request["occasion_type"], request["tone"])
+            for request in requests
+        ]
+
+    documents = []
+    emails = []
+    message_ids = {}
+    for reminder, message in zip(firing, messages):
+        message_id = str(uuid.uuid4())
+        message_ids[reminder["reminder_id"]] = message_id
+        documents.append({
+            "message_id": message_id,
+            "user_id": reminder["user_id"],
+            "contact_id": reminder["contact_id"],
+            "reminder_id": reminder["reminder_id"],
+            "occasion_type": reminder["occasion_type"],
+            "tone": REMINDER_MESSAGE_TONE,
+            "generated_message": message,
+            "created_at": now.isoformat()
+        })
+        user = users[reminder["user_id"]]
+        if send_email and user.get("email"):
+            subject, body = build_reminder_email(user, contacts[(reminder["user_id"], reminder["contact_id"])], reminder, message)
+            emails.append(enqueue_email(email_repo, reminder["user_id"], user["email"], subject, body, source="reminder"))
+    await message_repo.insert_many(documents)
+    await asyncio.gather(*emails)
+
+    await reminder_repo.finish_dispatch(token, {
+        reminder["reminder_id"]: {
+            "last_fired_at": now,
+            "last_message_id": message_ids.get(reminder["reminder_id"]),
+            # Rolled forward while this firing was pending: arm the next one
+            "dispatch_at": reminder["next_fire_at"] if reminder.get("next_fire_at") and reminder["next_fire_at"] > reminder["dispatch_at"] else None
+        }
+        for reminder in reminders
+    }, (reminder["user_id"] for reminder in reminders))
+    return len(reminders)
+
+
+async def dispatch_until_idle(*args, time_budget: Optional[float] = None, **kwargs) -> int:
+    """
+    Run dispatch_due until a batch comes back short or time_budget seconds have passed
+
+    Within a budget, each batch waits for the AI only as long as the budget has
+    left, so a slow model cannot carry the last batch far past it.
+
+    Returns:
+        Number of reminders claimed
+    """
+    started = time.monotonic()
+    claimed_total = 0
+    while time_budget is None or time.monotonic() - started < time_budget:
+        if time_budget is not None:
+            remaining = time_budget - (time.monotonic() - started)
+            kwargs["generation_timeout"] = min(REMINDER_GENERATION_TIMEOUT_SECONDS, remaining)
+        claimed = await dispatch_due(*args, **kwargs)
+        claimed_total += claimed
+        if claimed < REMINDER_DISPATCH_BATCH_SIZE:
+            break
+    return claimed_total
+
+
+async def run_dispatcher(
+    reminder_repo: ReminderRepository,
+    contact_repo: ContactRepository,
+    user_repo: UserRepository,
+    message_repo: MessageRepository,
+    email_repo: EmailRepository,
+    generator: AIMessageGenerator,
+    send_email: bool = True,
+    worker_id: Optional[str] = None
+) -> None:
+    worker_id = worker_id or f"dispatch-{uuid.uuid4()}"
+    while True:
+        delay = REMINDER_DISPATCH_POLL_SECONDS
+        try:
+            await dispatch_until_idle(
+                reminder_repo, contact_repo, user_repo, message_repo, email_repo, generator, worker_id, send_email
+            )
+            now = datetime.utcnow()
+            next_dispatch_at = await reminder_repo.next_dispatch_after(now)
+            if next_dispatch_at is not None:
+                delay = min(delay, max((next_dispatch_at - now).total_seconds(), 1))
+        except Exception as e:
+            print(f"Reminder dispatcher error: {e}")
+        await asyncio.sleep(delay)
+
+
+async def main():
+    from database import Database
+    from message_cache import MessageCache
+
+    db = Database(os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme"))
+    try:
+        await run_dispatcher(
+            ReminderRepository(db),
+            ContactRepository(db),
+            UserRepository(db),
+            MessageRepository(db),
+            EmailRepository(db),
+            AIMessageGenerator(MessageCache(db)),
+            send_email=bool(os.getenv("SMTP_HOST"))
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    asyncio.run(main())
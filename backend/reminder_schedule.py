@@ -0,0 +1,121 @@
+"""
+Reminder scheduling: materialized next_fire_at dates
+
+Each reminder stores next_fire_at, the UTC midnight of the day it should fire
+(occasion_date minus reminder_days_before). Recurring reminders are rolled
+forward a year at a time once that day has passed, so "due in the next N days"
+is an indexed range scan on (user_id, status, next_fire_at).
+
+dispatch_at holds the next_fire_at the reminder dispatcher has yet to fire
+(see reminder_dispatch.py). Rolling a reminder forward only moves dispatch_at
+when it is null (already fired) or too overdue to be fired; a firing still
+pending keeps its dispatch_at, and the dispatcher moves it on to next_fire_at
+once it has been sent. Reminders leased by a dispatcher are left for the next
+pass.
+"""
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from reminder_dispatch import REMINDER_DISPATCH_MAX_LAG_HOURS
+from repositories import ReminderRepository
+
+ROLL_FORWARD_INTERVAL_SECONDS = int(os.getenv("REMINDER_ROLL_INTERVAL_SECONDS", "3600"))
+ROLL_FORWARD_BATCH_SIZE = 1000
+
+
+def add_years(day: date, years: int) -> date:
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        # Feb 29 occasions fire on Feb 28 in non-leap years
+        return day.replace(year=day.year + years, day=28)
+
+
+def compute_next_fire_at(
+    occasion_date: str,
+    reminder_days_before: int,
+    is_recurring: bool,
+    today: Optional[date] = None
+) -> Optional[datetime]:
+    """
+    Compute when a reminder should next fire
+
+    Args:
+        occasion_date: ISO date (or datetime) string of the occasion
+        reminder_days_before: Days before the occasion the reminder fires
+        is_recurring: Roll the occasion forward yearly once it has fired
+        today: Reference day, defaults to the current UTC date
+
+    Returns:
+        Naive UTC midnight datetime, or None if occasion_date is unparseable
+    """
+    try:
+        occasion = datetime.fromisoformat(occasion_date).date()
+    except (TypeError, ValueError):
+        return None
+
+    today = today or datetime.utcnow().date()
+    lead = timedelta(days=reminder_days_before or 0)
+    if is_recurring and occasion - lead < today:
+        years = max(today.year - occasion.year - 1, 0)
+        while add_years(occasion, years) - lead < today:
+            years += 1
+        occasion = add_years(occasion, years)
+
+    return datetime.combine(occasion - lead, datetime.min.time())
+
+
+async def roll_forward(reminder_repo: ReminderRepository, user_id: Optional[str] = None, today: Optional[date] = None) -> int:
+    """Recompute next_fire_at and dispatch_at for fired recurring reminders and legacy reminders without them"""
+    today = today or datetime.utcnow().date()
+    cutoff = datetime.combine(today, datetime.min.time())
+    # Pending firings older than this are past the dispatcher's window and never sent
+    stale_before = cutoff - timedelta(hours=REMINDER_DISPATCH_MAX_LAG_HOURS)
+    now = datetime.utcnow()
+    unleased = {"dispatch_lease_expires_at": {"$not": {"$gt": now}}}
+    updated = 0
+    while True:
+        reminders = await reminder_repo.list_needing_reschedule(cutoff, now, user_id, ROLL_FORWARD_BATCH_SIZE)
+        if not reminders:
+            return updated
+        updates = []
+        for reminder in reminders:
+            next_fire_at = compute_next_fire_at(
+                reminder.get("occasion_date"),
+                reminder.get("reminder_days_before", 3),
+                reminder.get("is_recurring", False),
+                today
+            )
+            updates.append(UpdateOne(
+                {"reminder_id": reminder["reminder_id"], **unleased},
+                {"$set": {"next_fire_at": next_fire_at}}
+            ))
+            updates.append(UpdateOne(
+                {
+                    "reminder_id": reminder["reminder_id"],
+                    **unleased,
+                    "$or": [{"dispatch_at": None}, {"dispatch_at": {"$lt": stale_before}}]
+                },
+                {
+                    "$set": {"dispatch_at": next_fire_at},
+                    "$unset": {"dispatch_token": "", "dispatch_lease_expires_at": ""}
+                }
+            ))
+        await reminder_repo.bulk_write(updates, (reminder["user_id"] for reminder in reminders))
+        updated += len(reminders)
+        if len(reminders) < ROLL_FORWARD_BATCH_SIZE:
+            return updated
+
+
+async def run_roll_forward(reminder_repo: ReminderRepository):
+    """Periodic roll-forward pass across all users"""
+    while True:
+        try:
+            await roll_forward(reminder_repo)
+        except Exception as e:
+            print(f"Reminder roll-forward error: {e}")
+        await asyncio.sleep(ROLL_FORWARD_INTERVAL_SECONDS)
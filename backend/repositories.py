@@ -0,0 +1,693 @@
+"""
+Repository classes wrapping the ReMindMe collections
+
+Every method is a coroutine so route handlers stay non-blocking regardless of
+which driver backs the Database (see database.py).
+"""
+import os
+import re
+from datetime import datetime
+from collections import Counter
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from cache import TTLCache
+from contact_search import SEARCH_FIELDS, search_keys
+from database import Database
+from pagination import DEFAULT_PAGE_SIZE, fetch_page, parse_fields, parse_sort
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+FACET_CACHE_SIZE = int(os.getenv("FACET_CACHE_SIZE", "10000"))
+FACET_CACHE_TTL_SECONDS = float(os.getenv("FACET_CACHE_TTL_SECONDS", "300"))
+MAX_FACET_VALUES = 100
+
+
+class UserRepository:
+    """
+    Users, with a per-process cache of documents looked up by user_id
+
+    Every write through this repository invalidates the cached document; the
+    TTL bounds staleness for writes made by other processes.
+    """
+
+    def __init__(self, db: Database):
+        self.collection = db["users"]
+        self.cache = TTLCache("users", USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
+    async def get_by_email(self, email: str) -> Optional[dict]:
+        return await self.collection.find_one({"email": email})
+
+    async def get_by_id(self, user_id: str) -> Optional[dict]:
+        user = self.cache.get(user_id)
+        if user is None:
+            user = await self.collection.find_one({"user_id": user_id})
+            if user is None:
+                return None
+            self.cache.set(user_id, user)
+        return dict(user)
+
+    async def get_many(self, user_ids: Iterable[str], fields: Iterable[str] = ("email", "name")) -> Dict[str, dict]:
+        """Selected fields for many users in one round-trip, keyed by user_id"""
+        cursor = self.collection.find(
+            {"user_id": {"$in": list(user_ids)}},
+            {"_id": 0, "user_id": 1, **{field: 1 for field in fields}}
+        )
+        return {user["user_id"]: user for user in await cursor.to_list(length=None)}
+
+    async def create(self, user: dict) -> None:
+        await self.collection.insert_one(user)
+        self.invalidate(user["user_id"])
+
+    async def update(self, user_id: str, fields: dict) -> int:
+        result = await self.collection.update_one({"user_id": user_id}, {"$set": fields})
+        self.invalidate(user_id)
+        return result.matched_count
+
+    def invalidate(self, user_id: str) -> None:
+        self.cache.invalidate(user_id)
+
+
+class UserStatsRepository:
+    """
+    Per-user counters (contacts, active_reminders) kept current with $inc
+
+    Contact and reminder writes adjust the counters as they happen. Because an
+    increment can still be lost (a crash between the write and the $inc, or a
+    write racing a recount), the counters are periodically replaced by a
+    recount; see user_stats.py.
+
+    Every increment also bumps the user's data version, which the ETags of
+    their contact, reminder and dashboard views are derived from (see
+    etags.py). Writes call it after changing the data, so a reader can never
+    pair a new version with the old data.
+    """
+
+    def __init__(self, db: Database):
+        self.collection = db["user_stats"]
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"user_id": user_id}, {"_id": 0})
+
+    async def get_version(self, user_id: str) -> int:
+        stats = await self.collection.find_one({"user_id": user_id}, {"_id": 0, "version": 1})
+        return stats.get("version", 0) if stats else 0
+
+    async def increment(self, user_id: str, **deltas: int) -> None:
+        """Adjust counters and bump the data version; call with no deltas after writes that leave the counts alone"""
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        await self.collection.update_one({"user_id": user_id}, {"$inc": {**deltas, "version": 1}}, upsert=True)
+
+    async def bump_versions(self, user_ids: Iterable[str]) -> None:
+        """Bump the data version of several users with one bulk_write"""
+        requests = [
+            UpdateOne({"user_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+            for user_id in set(user_ids)
+        ]
+        if requests:
+            await self.collection.bulk_write(requests, ordered=False)
+
+    async def replace_counts(self, user_id: str, counts: dict, reconciled_at: datetime) -> None:
+        previous = await self.collection.find_one_and_update(
+            {"user_id": user_id},
+            {"$set": {**counts, "reconciled_at": reconciled_at}},
+            projection={"_id": 0, **{field: 1 for field in counts}},
+            upsert=True
+        ) or {}
+        # Corrected drift changes the dashboard, so its ETag must change too (missing counters read as 0)
+        if any(previous.get(field, 0) != count for field, count in counts.items()):
+            await self.increment(user_id)
+
+
+class ContactRepository:
+    """
+    Contacts, with a per-process cache of each user's tag and relationship counts
+
+    Writes through this repository that can change the counts invalidate the
+    user's cached facets; the TTL bounds staleness for writes made by other
+    processes.
+    """
+
+    SORT_FIELDS = ("created_at", "name")
+    FIELDS = (
+        "contact_id", "name", "email", "phone", "birthday", "relationship", "notes",
+        "tags", "custom_fields", "created_at", "updated_at", "last_contacted", "contact_frequency"
+    )
+    # search_keys is internal; see contact_search.py
+    PROJECTION = {"_id": 0, "search_keys": 0}
+
+    def __init__(self, db: Database):
+        self.collection = db["contacts"]
+        self.stats = UserStatsRepository(db)
+        self.facet_cache = TTLCache("contact_facets", FACET_CACHE_SIZE, FACET_CACHE_TTL_SECONDS)
+
+    async def list_page(
+        self,
+        user_id: str,
+        sort: str = "created_at",
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None,
+        include_total: bool = False,
+        tags: Optional[List[str]] = None,
+        relationship: Optional[str] = None
+    ) -> dict:
+        """One keyset page of a user's contacts, optionally only those with all of tags and the relationship"""
+        sort_field, direction = parse_sort(sort, self.SORT_FIELDS)
+        projection = parse_fields(fields, self.FIELDS, ("contact_id", sort_field)) if fields else self.PROJECTION
+        query = {"user_id": user_id}
+        if tags:
+            query["tags"] = {"$all": tags}
+        if relationship:
+            query["relationship"] = relationship
+        return await fetch_page(
+            self.collection, query, sort, sort_field, direction,
+            "contact_id", limit, cursor, projection, include_total
+        )
+
+    async def facets(self, user_id: str) -> dict:
+        """
+        Number of contacts per tag and per relationship, most common first
+
+        Both are counted by one aggregation whose $match is served by the
+        (user_id, tags, ...) index.
+
+        Returns:
+            {"tags": [{"value": ..., "count": ...}], "relationships": [...]}
+        """
+        facets = self.facet_cache.get(user_id)
+        if facets is None:
+            def count_by(field: str) -> list:
+                return [
+                    {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+                    {"$match": {"_id": {"$nin": [None, ""]}}},
+                    {"$sort": {"count": -1, "_id": 1}},
+                    {"$limit": MAX_FACET_VALUES},
+                    {"$project": {"_id": 0, "value": "$_id", "count": 1}}
+                ]
+
+            cursor = self.collection.aggregate([
+                {"$match": {"user_id": user_id}},
+                {"$project": {"_id": 0, "tags": 1, "relationship": 1}},
+                {"$facet": {
+                    "tags": [{"$unwind": "$tags"}, *count_by("tags")],
+                    "relationships": count_by("relationship")
+                }}
+            ])
+            facets = (await cursor.to_list(length=None))[0]
+            self.facet_cache.set(user_id, facets)
+        return facets
+
+    async def get(self, user_id: str, contact_id: str) -> Optional[dict]:
+        return await self.collection.find_one(
+            {"contact_id": contact_id, "user_id": user_id},
+            self.PROJECTION
+        )
+
+    async def get_summaries(
+        self,
+        user_id: str,
+        contact_ids: Iterable[str],
+        fields: Iterable[str] = ("name", "email")
+    ) -> Dict[str, dict]:
+        """Selected fields (name and email by default) for many contacts in one round-trip, keyed by contact_id"""
+        cursor = self.collection.find(
+            {"user_id": user_id, "contact_id": {"$in": list(contact_ids)}},
+            {"_id": 0, "contact_id": 1, **{field: 1 for field in fields}}
+        )
+        return {contact["contact_id"]: contact for contact in await cursor.to_list(length=None)}
+
+    async def iter_batches(self, user_id: str, batch_size: int) -> AsyncIterator[List[dict]]:
+        """
+        All of a user's contacts in creation order, batch_size documents at a time
+
+        Each batch is one server round-trip and only the current batch is held
+        in memory; the (user_id, created_at, contact_id) index supplies the
+        order, so no in-memory sort is needed.
+        """
+        cursor = self.collection.find(
+            {"user_id": user_id},
+            {"_id": 0, **{field: 1 for field in self.FIELDS}}
+        ).sort([("created_at", 1), ("contact_id", 1)]).batch_size(batch_size)
+        while True:
+            batch = await cursor.to_list(length=batch_size)
+            if not batch:
+                break
+            yield batch
+
+    async def search_prefix(self, user_id: str, terms: List[str], limit: int) -> List[dict]:
+        """Contacts with a search key starting with each of terms; the first term bounds the index scan"""
+        query = {"user_id": user_id, "$and": [{"search_keys": re.compile("^" + re.escape(term))} for term in terms]}
+        cursor = self.collection.find(query, {"_id": 0}).limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def search_text(self, user_id: str, text: str, limit: int) -> List[dict]:
+        """Best text index matches for text, with their relevance as text_score"""
+        cursor = self.collection.find(
+            {"user_id": user_id, "$text": {"$search": text}},
+            {**self.PROJECTION, "text_score": {"$meta": "textScore"}}
+        ).sort([("text_score", {"$meta": "textScore"})]).limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def list_without_search_keys(self, after_id, limit: int) -> List[dict]:
+        """Contacts lacking search_keys, in _id order after after_id, for backfill_search_keys"""
+        query = {"search_keys": {"$exists": False}}
+        if after_id is not None:
+            query["_id"] = {"$gt": after_id}
+        cursor = self.collection.find(query, {field: 1 for field in SEARCH_FIELDS}).sort("_id", 1).limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def bulk_write(self, requests: list) -> None:
+        if requests:
+            await self.collection.bulk_write(requests, ordered=False)
+
+    async def create(self, contact: dict) -> None:
+        contact["search_keys"] = search_keys(contact)
+        await self.collection.insert_one(contact)
+        self.facet_cache.invalidate(contact["user_id"])
+        await self.stats.increment(contact["user_id"], contacts=1)
+
+    async def has_unique_contact_index(self) -> bool:
+        """Whether (user_id, contact_id) is uniquely indexed, which import replays rely on"""
+        indexes = await self.collection.index_information()
+        return any(
+            index.get("unique") and [tuple(key) for key in index["key"]] == [("user_id", 1), ("contact_id", 1)]
+            for index in indexes.values()
+        )
+
+    async def insert_many(self, contacts: List[dict]) -> List[dict]:
+        """Unordered bulk insert returning the write errors of rejected documents"""
+        if not contacts:
+            return []
+        for contact in contacts:
+            contact["search_keys"] = search_keys(contact)
+        errors = []
+        try:
+            await self.collection.insert_many(contacts, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+
+        rejected = {error["index"] for error in errors}
+        inserted = Counter(
+            contact["user_id"] for i, contact in enumerate(contacts) if i not in rejected
+        )
+        for user_id, count in inserted.items():
+            self.facet_cache.invalidate(user_id)
+            await self.stats.increment(user_id, contacts=count)
+        return errors
+
+    async def update(self, user_id: str, contact_id: str, fields: dict) -> int:
+        query = {"contact_id": contact_id, "user_id": user_id}
+        if not any(field in fields for field in SEARCH_FIELDS):
+            result = await self.collection.update_one(query, {"$set": fields})
+            if result.matched_count:
+                await self.stats.increment(user_id)
+            return result.matched_count
+
+        # search_keys are derived from the updated document
+        contact = await self.collection.find_one_and_update(
+            query,
+            {"$set": fields},
+            projection={"_id": 0, **{field: 1 for field in SEARCH_FIELDS}},
+            return_document=ReturnDocument.AFTER
+        )
+        if contact is None:
+            return 0
+        # tags and relationship are search fields, so facet changes always come this way
+        if "tags" in fields or "relationship" in fields:
+            self.facet_cache.invalidate(user_id)
+        await self.collection.update_one(*self._search_keys_write(query, contact))
+        await self.stats.increment(user_id)
+        return 1
+
+    async def delete(self, user_id: str, contact_id: str) -> int:
+        result = await self.collection.delete_one(
+            {"contact_id": contact_id, "user_id": user_id}
+        )
+        if result.deleted_count:
+            self.facet_cache.invalidate(user_id)
+            await self.stats.increment(user_id, contacts=-result.deleted_count)
+        return result.deleted_count
+
+    async def bulk_mutate(self, user_id: str, requests: list) -> List[dict]:
+        """
+        Run a user's contact writes as one unordered bulk_write
+
+        Returns:
+            The write errors, each with the index of its request
+        """
+        if not requests:
+            return []
+        try:
+            result = await self.collection.bulk_write(requests, ordered=False)
+            inserted, deleted, errors = result.inserted_count, result.deleted_count, []
+        except BulkWriteError as e:
+            inserted, deleted = e.details.get("nInserted", 0), e.details.get("nRemoved", 0)
+            errors = e.details.get("writeErrors", [])
+        self.facet_cache.invalidate(user_id)
+        await self.stats.increment(user_id, contacts=inserted - deleted)
+        return errors
+
+    async def refresh_search_keys(self, user_id: str, contact_ids: List[str]) -> None:
+        """Recompute search_keys of contacts changed by writes that bypassed update()"""
+        if not contact_ids:
+            return
+        contacts = await self.get_summaries(user_id, contact_ids, SEARCH_FIELDS)
+        await self.bulk_write([
+            UpdateOne(*self._search_keys_write({"user_id": user_id, "contact_id": contact_id}, contact))
+            for contact_id, contact in contacts.items()
+        ])
+
+    @staticmethod
+    def _search_keys_write(query: dict, contact: dict) -> tuple:
+        """
+        Filter and update setting search_keys from the search fields read back after a write
+
+        The filter pins those fields to the values read, so if a concurrent
+        update changed them in between, this write matches nothing and keys
+        computed from the newer document stand instead.
+        """
+        pinned = {field: contact.get(field) for field in SEARCH_FIELDS}
+        return {**query, **pinned}, {"$set": {"search_keys": search_keys(contact)}}
+
+    async def count_for_user(self, user_id: str) -> int:
+        return await self.collection.count_documents({"user_id": user_id})
+
+    @staticmethod
+    def _stale_query(user_id: str, cutoff: str) -> dict:
+        return {
+            "user_id": user_id,
+            "$or": [
+                {"last_contacted": {"$lt": cutoff}},
+                {"last_contacted": None}
+            ]
+        }
+
+    async def list_stale(self, user_id: str, cutoff: str) -> List[dict]:
+        cursor = self.collection.find(self._stale_query(user_id, cutoff), self.PROJECTION)
+        return await cursor.to_list(length=None)
+
+    async def count_stale(self, user_id: str, cutoff: str) -> int:
+        return await self.collection.count_documents(self._stale_query(user_id, cutoff))
+
+
+class ReminderRepository:
+    SORT_FIELDS = ("created_at", "occasion_date")
+    FIELDS = (
+        "reminder_id", "contact_id", "occasion_type", "occasion_date", "reminder_days_before",
+        "custom_message", "is_recurring", "status", "next_fire_at", "created_at"
+    )
+    # The dispatcher's schedule and lease are internal; see reminder_dispatch.py
+    PROJECTION = {"_id": 0, "dispatch_at": 0, "dispatch_token": 0, "dispatch_lease_expires_at": 0}
+
+    def __init__(self, db: Database):
+        self.collection = db["reminders"]
+        self.stats = UserStatsRepository(db)
+
+    async def list_page(
+        self,
+        user_id: str,
+        sort: str = "created_at",
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None,
+        include_total: bool = False
+    ) -> dict:
+        """One keyset page of a user's reminders; see pagination.fetch_page"""
+        sort_field, direction = parse_sort(sort, self.SORT_FIELDS)
+        projection = parse_fields(fields, self.FIELDS, ("reminder_id", sort_field)) if fields else self.PROJECTION
+        return await fetch_page(
+            self.collection, {"user_id": user_id}, sort, sort_field, direction,
+            "reminder_id", limit, cursor, projection, include_total
+        )
+
+    async def list_upcoming(self, user_id: str, start: datetime, end: datetime) -> List[dict]:
+        """Active reminders whose next_fire_at falls in [start, end), soonest first"""
+        cursor = self.collection.find(
+            {"user_id": user_id, "status": "active", "next_fire_at": {"$gte": start, "$lt": end}},
+            self.PROJECTION
+        ).sort("next_fire_at", 1)
+        return await cursor.to_list(length=None)
+
+    async def count_upcoming(self, user_id: str, start: datetime, end: datetime) -> int:
+        return await self.collection.count_documents(
+            {"user_id": user_id, "status": "active", "next_fire_at": {"$gte": start, "$lt": end}}
+        )
+
+    async def list_needing_reschedule(
+        self,
+        cutoff: datetime,
+        now: datetime,
+        user_id: Optional[str] = None,
+        limit: int = 1000
+    ) -> List[dict]:
+        """
+        Active recurring reminders that fired before cutoff, plus any never
+        scheduled for firing or dispatch; reminders a dispatcher holds a
+        lease on at `now` are skipped
+        """
+        query = {
+            "status": "active",
+            "$or": [
+                {"is_recurring": True, "next_fire_at": {"$lt": cutoff}},
+                {"next_fire_at": {"$exists": False}},
+                {"dispatch_at": {"$exists": False}}
+            ],
+            "dispatch_lease_expires_at": {"$not": {"$gt": now}}
+        }
+        if user_id:
+            query["user_id"] = user_id
+        cursor = self.collection.find(
+            query,
+            {"_id": 0, "reminder_id": 1, "user_id": 1, "occasion_date": 1, "reminder_days_before": 1, "is_recurring": 1}
+        ).limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def bulk_write(self, requests: list, user_ids: Iterable[str]) -> None:
+        """Unordered bulk_write of reminders belonging to user_ids"""
+        if requests:
+            await self.collection.bulk_write(requests, ordered=False)
+            await self.stats.bump_versions(user_ids)
+
+    async def claim_due(
+        self,
+        token: str,
+        window_start: datetime,
+        now: datetime,
+        lease_until: datetime,
+        limit: int
+    ) -> List[dict]:
+        """
+        Lease up to `limit` active reminders whose dispatch_at is in [window_start, now]
+
+        Candidates come from the (status, dispatch_at) index; the lease is
+        taken with a conditional update_many, so a reminder another
+        dispatcher leased in the meantime is skipped rather than fired twice.
+
+        Args:
+            token: Identifies this claim; pass it to finish_dispatch
+            window_start: Reminders due before this are not claimed
+            now: Current UTC time; unexpired leases are respected
+            lease_until: When the lease lapses if the claimant dies
+            limit: Maximum reminders to claim
+
+        Returns:
+            The leased reminders
+        """
+        due = {
+            "status": "active",
+            "dispatch_at": {"$gte": window_start, "$lte": now},
+            "dispatch_lease_expires_at": {"$not": {"$gt": now}}
+        }
+        candidates = await self.collection.find(
+            due, {"_id": 0, "reminder_id": 1, "user_id": 1}
+        ).sort("dispatch_at", 1).limit(limit).to_list(length=None)
+        if not candidates:
+            return []
+        reminder_ids = [reminder["reminder_id"] for reminder in candidates]
+        await self.collection.update_many(
+            {"reminder_id": {"$in": reminder_ids}, **due},
+            {"$set": {"dispatch_token": token, "dispatch_lease_expires_at": lease_until}}
+        )
+        cursor = self.collection.find({"reminder_id": {"$in": reminder_ids}, "dispatch_token": token}, {"_id": 0})
+        return await cursor.to_list(length=None)
+
+    async def finish_dispatch(self, token: str, fired: Dict[str, dict], user_ids: Iterable[str]) -> None:
+        """
+        Mark leased reminders as fired and release their lease
+
+        Args:
+            token: The claim token the reminders were leased with
+            fired: Extra fields to set, keyed by reminder_id; dispatch_at is
+                cleared unless they set it
+            user_ids: Owners of the reminders
+        """
+        await self.bulk_write([
+            UpdateOne(
+                {"reminder_id": reminder_id, "dispatch_token": token},
+                {
+                    "$set": {"dispatch_at": None, **fields},
+                    "$unset": {"dispatch_token": "", "dispatch_lease_expires_at": ""}
+                }
+            )
+            for reminder_id, fields in fired.items()
+        ], user_ids)
+
+    async def next_dispatch_after(self, now: datetime) -> Optional[datetime]:
+        """Earliest dispatch_at still in the future, to sleep until it"""
+        reminder = await self.collection.find_one(
+            {"status": "active", "dispatch_at": {"$gt": now}},
+            {"_id": 0, "dispatch_at": 1},
+            sort=[("dispatch_at", 1)]
+        )
+        return reminder["dispatch_at"] if reminder else None
+
+    async def create(self, reminder: dict) -> None:
+        # Pending dispatch for its first firing (see reminder_dispatch.py)
+        reminder.setdefault("dispatch_at", reminder.get("next_fire_at"))
+        await self.collection.insert_one(reminder)
+        await self.stats.increment(reminder["user_id"], active_reminders=int(reminder["status"] == "active"))
+
+    async def delete(self, user_id: str, reminder_id: str) -> int:
+        deleted = await self.collection.find_one_and_delete(
+            {"reminder_id": reminder_id, "user_id": user_id},
+            {"status": 1}
+        )
+        if deleted is None:
+            return 0
+        await self.stats.increment(user_id, active_reminders=-int(deleted.get("status") == "active"))
+        return 1
+
+    async def delete_for_contact(self, user_id: str, contact_id: str) -> int:
+        return await self.delete_for_contacts(user_id, [contact_id])
+
+    async def delete_for_contacts(self, user_id: str, contact_ids: List[str]) -> int:
+        """Delete every reminder of the user's given contacts, two delete_many calls however many contacts"""
+        if not contact_ids:
+            return 0
+        # Active reminders go first so the counter moves by exactly what was deleted
+        active = await self.collection.delete_many(
+            {"user_id": user_id, "contact_id": {"$in": contact_ids}, "status": "active"}
+        )
+        rest = await self.collection.delete_many({"user_id": user_id, "contact_id": {"$in": contact_ids}})
+        if active.deleted_count or rest.deleted_count:
+            await self.stats.increment(user_id, active_reminders=-active.deleted_count)
+        return active.deleted_count + rest.deleted_count
+
+    async def count_active(self, user_id: str) -> int:
+        return await self.collection.count_documents(
+            {"user_id": user_id, "status": "active"}
+        )
+
+
+class MessageRepository:
+    def __init__(self, db: Database):
+        self.collection = db["messages"]
+
+    async def create(self, message: dict) -> None:
+        await self.collection.insert_one(message)
+
+    async def insert_many(self, messages: List[dict]) -> None:
+        if messages:
+            await self.collection.insert_many(messages, ordered=False)
+
+    async def set_delivery_status(self, user_id: str, message_id: str, fields: dict) -> None:
+        await self.collection.update_one(
+            {"message_id": message_id, "user_id": user_id},
+            {"$set": fields}
+        )
+
+
+class EmailRepository:
+    """Outbound email queue drained by the background sender (see email_delivery.py)"""
+
+    def __init__(self, db: Database):
+        self.collection = db["email_outbox"]
+
+    async def create(self, email: dict) -> None:
+        await self.collection.insert_one(email)
+
+    async def get(self, user_id: str, email_id: str) -> Optional[dict]:
+        return await self.collection.find_one(
+            {"email_id": email_id, "user_id": user_id},
+            {"_id": 0, "worker_id": 0, "lease_expires_at": 0}
+        )
+
+    async def count_since(self, user_id: str, since: str, source: str = "user") -> int:
+        return await self.collection.count_documents({"user_id": user_id, "created_at": {"$gte": since}, "source": source})
+
+    async def claim(self, worker_id: str, now: datetime, lease_until: datetime) -> Optional[dict]:
+        """Atomically take a due queued email, or one whose sender's lease expired"""
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "queued", "next_attempt_at": {"$lte": now}},
+                    {"status": "sending", "lease_expires_at": {"$lte": now}}
+                ]
+            },
+            {"$set": {"status": "sending", "worker_id": worker_id, "lease_expires_at": lease_until}},
+            sort=[("next_attempt_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def update(self, email_id: str, worker_id: str, fields: dict) -> bool:
+        """Update an email only while worker_id still holds its lease"""
+        result = await self.collection.update_one(
+            {"email_id": email_id, "worker_id": worker_id},
+            {"$set": fields}
+        )
+        return result.matched_count == 1
+
+
+class ImportJobRepository:
+    """Background CSV import jobs and the uploaded file chunks they read from"""
+
+    def __init__(self, db: Database):
+        self.collection = db["import_jobs"]
+        self.uploads = db["import_uploads"]
+
+    async def create(self, job: dict) -> None:
+        await self.collection.insert_one(job)
+
+    async def get(self, user_id: str, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one(
+            {"job_id": job_id, "user_id": user_id},
+            {"_id": 0, "worker_id": 0, "lease_expires_at": 0}
+        )
+
+    async def claim(self, worker_id: str, now: datetime, lease_until: datetime, job_id: Optional[str] = None) -> Optional[dict]:
+        """Atomically take a pending job, or a running job whose worker lease expired"""
+        query = {
+            "$or": [
+                {"status": "pending"},
+                {"status": "running", "lease_expires_at": {"$lte": now}}
+            ]
+        }
+        if job_id:
+            query["job_id"] = job_id
+        return await self.collection.find_one_and_update(
+            query,
+            {"$set": {"status": "running", "worker_id": worker_id, "lease_expires_at": lease_until}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def update(self, job_id: str, worker_id: str, fields: dict) -> bool:
+        """Update a job only while worker_id still holds its lease"""
+        result = await self.collection.update_one(
+            {"job_id": job_id, "worker_id": worker_id},
+            {"$set": fields}
+        )
+        return result.matched_count == 1
+
+    async def save_upload_chunk(self, job_id: str, n: int, data: bytes) -> None:
+        await self.uploads.insert_one({"job_id": job_id, "n": n, "data": data})
+
+    def iter_upload_chunks(self, job_id: str):
+        return self.uploads.find({"job_id": job_id}).sort("n", 1)
+
+    async def delete_upload(self, job_id: str) -> None:
+        await self.uploads.delete_many({"job_id": job_id})
@@ -1,21 +1,44 @@
-from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, Query, Header, Request, Response, status, UploadFile, File
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime, timedelta
-from pymongo import MongoClient
-from passlib.context import CryptContext
 from jose import JWTError, jwt
+from pymongo.errors import DuplicateKeyError
 import os
 from dotenv import load_dotenv
+import asyncio
+import hashlib
+import json
 import uuid
-import pandas as pd
-import io
-import pytz
 
+# Before the shared modules, which read their settings at import time
 load_dotenv()
 
+from cache import TTLCache, cache_stats
+from database import Database
+from message_cache import MessageCache
+from ai_service import AIMessageGenerator
+from sse import SSE_HEADERS, sse_event
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PaginationError
+import passwords
+from passwords import PasswordHasherBusy, hash_password, verify_password
+from indexes import check_query_plans, ensure_indexes
+from repositories import UserRepository, ContactRepository, ReminderRepository, MessageRepository, ImportJobRepository, UserStatsRepository, EmailRepository
+from csv_import import CSVImportError, import_contacts
+from contact_bulk import MAX_BULK_OPERATIONS, apply_bulk
+from contact_export import ExportError, export_contacts, export_format
+from etags import conditional_get
+from contact_search import DEFAULT_SEARCH_RESULTS, MAX_SEARCH_RESULTS, run_backfill, search_contacts
+from reminder_schedule import compute_next_fire_at, roll_forward, run_roll_forward
+from user_stats import get_dashboard
+from email_delivery import EmailRateLimited, create_smtp_pool, enqueue_email, run_sender
+from reminder_dispatch import run_dispatcher
+from batch_generation import MAX_BATCH_ITEMS, generate_batch, items_due
+from import_jobs import create_import_job, run_worker
+
 # Initialize FastAPI
 app = FastAPI(title="ReMindMe API")
 
@@ -30,21 +53,47 @@ app.add_middleware(
 
 # MongoDB Setup
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/remindme")
-client = MongoClient(MONGO_URL)
-db = client.get_database()
-
-# Collections
-users_collection = db["users"]
-contacts_collection = db["contacts"]
-reminders_collection = db["reminders"]
-messages_collection = db["messages"]
+db = Database(MONGO_URL)
+
+# Repositories
+user_repo = UserRepository(db)
+contact_repo = ContactRepository(db)
+reminder_repo = ReminderRepository(db)
+message_repo = MessageRepository(db)
+import_job_repo = ImportJobRepository(db)
+user_stats_repo = UserStatsRepository(db)
+email_repo = EmailRepository(db)
+message_cache = MessageCache(db)
+ai_generator = AIMessageGenerator(message_cache)
+smtp_pool = create_smtp_pool()
+
+# Run an in-process import worker unless a dedicated one is deployed
+IMPORT_WORKER_ENABLED = os.getenv("IMPORT_WORKER_ENABLED", "true").lower() == "true"
+# Likewise for the email sender (python email_delivery.py)
+EMAIL_SENDER_ENABLED = os.getenv("EMAIL_SENDER_ENABLED", "true").lower() == "true"
+# ...and for the reminder dispatcher (python reminder_dispatch.py)
+REMINDER_DISPATCHER_ENABLED = os.getenv("REMINDER_DISPATCHER_ENABLED", "true").lower() == "true"
+# Refuse to start when a hot query plans a COLLSCAN (see indexes.py); meant for CI and staging
+VERIFY_QUERY_PLANS = os.getenv("VERIFY_QUERY_PLANS", "false").lower() == "true"
+# /api/metrics requires "Authorization: Bearer $METRICS_TOKEN" and is disabled while unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+import_worker_task = None
+email_sender_task = None
+reminder_dispatch_task = None
+ai_warm_up_task = None
+reminder_roll_task = None
+search_backfill_task = None
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 JWT_SECRET = os.getenv("JWT_SECRET_KEY", "your-secret-key")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXPIRATION = int(os.getenv("JWT_EXPIRATION_MINUTES", "43200"))
+token_cache = TTLCache(
+    "tokens",
+    int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "3600"))
+)
 
 # Pydantic Models
 class UserSignup(BaseModel):
@@ -77,6 +126,15 @@ class ContactUpdate(BaseModel):
     tags: Optional[List[str]] = None
     custom_fields: Optional[Dict[str, Any]] = None
 
+class ContactBulkOperation(BaseModel):
+    op: Literal["create", "update", "delete", "add_tags", "remove_tags"]
+    contact_id: Optional[str] = None  # all but create
+    contact: Optional[ContactUpdate] = None  # fields for create and update
+    tags: Optional[List[str]] = None  # for add_tags and remove_tags
+
+class ContactBulk(BaseModel):
+    operations: List[ContactBulkOperation]
+
 class ReminderCreate(BaseModel):
     contact_id: str
     occasion_type: str  # birthday, anniversary, follow-up, custom
@@ -90,19 +148,27 @@ class MessageGenerate(BaseModel):
     occasion_type: str
     tone: str = "friendly"  # friendly, professional, warm, concise
     custom_context: Optional[str] = None
+    force_regenerate: bool = False
+
+class BatchMessageItem(BaseModel):
+    contact_id: str
+    occasion_type: str
+    tone: str = "friendly"
+    custom_context: Optional[str] = None
+
+class MessageGenerateBatch(BaseModel):
+    items: Optional[List[BatchMessageItem]] = None
+    due_within_days: Optional[int] = Field(None, ge=0, le=365)  # or every reminder due in this window
+    tone: str = "friendly"  # used for reminders due within the window
+    force_regenerate: bool = False
 
 class EmailSend(BaseModel):
     to_email: str
     subject: str
     body: str
+    message_id: Optional[str] = None
 
 # Utility Functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=JWT_EXPIRATION)
@@ -110,14 +176,20 @@ def create_access_token(data: dict) -> str:
     return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 def decode_token(token: str) -> dict:
+    # Verified payloads are cached by token hash until the token's exp
+    token_key = hashlib.sha256(token.encode()).hexdigest()
+    payload = token_cache.get(token_key)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
         )
+    token_cache.set(token_key, payload, expires_at=payload.get("exp"))
+    return payload
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
@@ -128,7 +200,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
         )
-    user = users_collection.find_one({"user_id": user_id})
+    user = await user_repo.get_by_id(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -136,16 +208,68 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
     return user
 
+@app.on_event("startup")
+async def start_background_tasks():
+    global import_worker_task, reminder_roll_task, ai_warm_up_task, email_sender_task, reminder_dispatch_task
+    global search_backfill_task
+    await ensure_indexes(db)
+    if VERIFY_QUERY_PLANS:
+        await check_query_plans(db)
+    ai_warm_up_task = asyncio.create_task(ai_generator.warm_up())
+    reminder_roll_task = asyncio.create_task(run_roll_forward(reminder_repo))
+    search_backfill_task = asyncio.create_task(run_backfill(contact_repo))
+    if IMPORT_WORKER_ENABLED:
+        import_worker_task = asyncio.create_task(run_worker(import_job_repo, contact_repo))
+    if smtp_pool and EMAIL_SENDER_ENABLED:
+        email_sender_task = asyncio.create_task(run_sender(email_repo, message_repo, smtp_pool))
+    if REMINDER_DISPATCHER_ENABLED:
+        reminder_dispatch_task = asyncio.create_task(run_dispatcher(
+            reminder_repo, contact_repo, user_repo, message_repo, email_repo, ai_generator,
+            send_email=smtp_pool is not None
+        ))
+
+@app.on_event("shutdown")
+async def close_database():
+    for task in (
+        import_worker_task, reminder_roll_task, ai_warm_up_task, email_sender_task, reminder_dispatch_task,
+        search_backfill_task
+    ):
+        if task:
+            task.cancel()
+    if smtp_pool:
+        await smtp_pool.close()
+    passwords.shutdown()
+    db.close()
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy(request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
 # API Routes
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "service": "ReMindMe API"}
 
+@app.get("/api/metrics")
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    if not METRICS_TOKEN or authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return {
+        "caches": cache_stats(),
+        "ai_message_cache": message_cache.stats(),
+        "ai_generator": ai_generator.stats(),
+        "email": smtp_pool.stats() if smtp_pool else None
+    }
+
 # Authentication Routes
 @app.post("/api/auth/signup")
 async def signup(user_data: UserSignup):
     # Check if user exists
-    if users_collection.find_one({"email": user_data.email}):
+    if await user_repo.get_by_email(user_data.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -156,7 +280,7 @@ async def signup(user_data: UserSignup):
     user = {
         "user_id": user_id,
         "email": user_data.email,
-        "password": hash_password(user_data.password),
+        "password": await hash_password(user_data.password),
         "name": user_data.name,
         "timezone": user_data.timezone,
         "subscription_tier": "free",
@@ -166,7 +290,14 @@ async def signup(user_data: UserSignup):
             "reminder_advance_days": 3
         }
     }
-    users_collection.insert_one(user)
+    try:
+        await user_repo.create(user)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent signup for the same email
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     
     # Generate token
     token = create_access_token({"sub": user_id})
@@ -180,13 +311,18 @@ async def signup(user_data: UserSignup):
 
 @app.post("/api/auth/login")
 async def login(credentials: UserLogin):
-    user = users_collection.find_one({"email": credentials.email})
-    if not user or not verify_password(credentials.password, user["password"]):
+    user = await user_repo.get_by_email(credentials.email)
+    valid, new_hash = await verify_password(credentials.password, user["password"]) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
+    # Transparently upgrade hashes made with an outdated bcrypt cost
+    if new_hash:
+        await user_repo.update(user["user_id"], {"password": new_hash})
+    
     token = create_access_token({"sub": user["user_id"]})
     
     return {
@@ -218,23 +354,70 @@ async def create_contact(contact: ContactCreate, current_user: dict = Depends(ge
         "last_contacted": None,
         "contact_frequency": 0
     }
-    contacts_collection.insert_one(contact_data)
+    await contact_repo.create(contact_data)
     return {"contact_id": contact_id, "message": "Contact created successfully"}
 
 @app.get("/api/contacts")
-async def get_contacts(current_user: dict = Depends(get_current_user)):
-    contacts = list(contacts_collection.find(
-        {"user_id": current_user["user_id"]},
-        {"_id": 0}
-    ))
+async def get_contacts(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+    include_total: bool = False,
+    tag: Optional[List[str]] = Query(None),
+    relationship: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    not_modified = await conditional_get(request, response, user_stats_repo, current_user["user_id"])
+    if not_modified:
+        return not_modified
+    try:
+        page = await contact_repo.list_page(
+            current_user["user_id"], sort, limit, cursor, fields, include_total, tag, relationship
+        )
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    body = {"contacts": page["items"], "next_cursor": page["next_cursor"]}
+    if include_total:
+        body["total"] = page["total"]
+    return body
+
+# Declared before /api/contacts/{contact_id}, which would otherwise match them
+@app.get("/api/contacts/facets")
+async def get_contact_facets(current_user: dict = Depends(get_current_user)):
+    return await contact_repo.facets(current_user["user_id"])
+
+@app.get("/api/contacts/search")
+async def find_contacts(
+    q: str,
+    limit: int = Query(DEFAULT_SEARCH_RESULTS, ge=1, le=MAX_SEARCH_RESULTS),
+    current_user: dict = Depends(get_current_user)
+):
+    contacts = await search_contacts(contact_repo, current_user["user_id"], q, limit)
     return {"contacts": contacts}
 
+@app.get("/api/contacts/export")
+async def export_contacts_file(
+    format: str = "csv",
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        media_type, extension = export_format(format)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        export_contacts(contact_repo, current_user["user_id"], format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="contacts.{extension}"'}
+    )
+
 @app.get("/api/contacts/{contact_id}")
 async def get_contact(contact_id: str, current_user: dict = Depends(get_current_user)):
-    contact = contacts_collection.find_one(
-        {"contact_id": contact_id, "user_id": current_user["user_id"]},
-        {"_id": 0}
-    )
+    contact = await contact_repo.get(current_user["user_id"], contact_id)
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
     return contact
@@ -249,74 +432,65 @@ async def update_contact(
     if not update_data:
         raise HTTPException(status_code=400, detail="No data to update")
     
-    result = contacts_collection.update_one(
-        {"contact_id": contact_id, "user_id": current_user["user_id"]},
-        {"$set": update_data}
-    )
+    matched = await contact_repo.update(current_user["user_id"], contact_id, update_data)
     
-    if result.matched_count == 0:
+    if matched == 0:
         raise HTTPException(status_code=404, detail="Contact not found")
     
     return {"message": "Contact updated successfully"}
 
 @app.delete("/api/contacts/{contact_id}")
 async def delete_contact(contact_id: str, current_user: dict = Depends(get_current_user)):
-    result = contacts_collection.delete_one(
-        {"contact_id": contact_id, "user_id": current_user["user_id"]}
-    )
-    if result.deleted_count == 0:
+    deleted = await contact_repo.delete(current_user["user_id"], contact_id)
+    if deleted == 0:
         raise HTTPException(status_code=404, detail="Contact not found")
     
     # Also delete associated reminders
-    reminders_collection.delete_many({"contact_id": contact_id})
+    await reminder_repo.delete_for_contact(current_user["user_id"], contact_id)
     
     return {"message": "Contact deleted successfully"}
 
+@app.post("/api/contacts/bulk")
+async def bulk_update_contacts(bulk: ContactBulk, current_user: dict = Depends(get_current_user)):
+    if len(bulk.operations) > MAX_BULK_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_OPERATIONS} operations per request")
+    
+    operations = [operation.dict() for operation in bulk.operations]
+    return await apply_bulk(contact_repo, reminder_repo, current_user["user_id"], operations)
+
 @app.post("/api/contacts/import/csv")
 async def import_contacts_csv(
     file: UploadFile = File(...),
+    background: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
     
+    # Large files: store the upload and let the import worker pick it up
+    if background:
+        job = await create_import_job(file, current_user["user_id"], import_job_repo)
+        return {"job_id": job["job_id"], "status": job["status"], "message": "Import queued"}
+    
     try:
-        contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-        
-        imported_count = 0
-        for _, row in df.iterrows():
-            contact_id = str(uuid.uuid4())
-            contact_data = {
-                "contact_id": contact_id,
-                "user_id": current_user["user_id"],
-                "name": row.get('name', row.get('Name', '')),
-                "email": row.get('email', row.get('Email', None)),
-                "phone": row.get('phone', row.get('Phone', None)),
-                "birthday": row.get('birthday', row.get('Birthday', None)),
-                "relationship": row.get('relationship', row.get('Relationship', None)),
-                "notes": row.get('notes', row.get('Notes', None)),
-                "tags": [],
-                "custom_fields": {},
-                "created_at": datetime.utcnow().isoformat(),
-                "last_contacted": None,
-                "contact_frequency": 0
-            }
-            contacts_collection.insert_one(contact_data)
-            imported_count += 1
-        
-        return {"message": f"Successfully imported {imported_count} contacts"}
-    except Exception as e:
+        report = await import_contacts(file.file, current_user["user_id"], contact_repo)
+    except CSVImportError as e:
         raise HTTPException(status_code=400, detail=f"Error importing CSV: {str(e)}")
+    
+    return report.to_dict()
+
+@app.get("/api/contacts/import/jobs/{job_id}")
+async def get_import_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await import_job_repo.get(current_user["user_id"], job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
 
 # Reminder Routes
 @app.post("/api/reminders")
 async def create_reminder(reminder: ReminderCreate, current_user: dict = Depends(get_current_user)):
     # Verify contact belongs to user
-    contact = contacts_collection.find_one({
-        "contact_id": reminder.contact_id,
-        "user_id": current_user["user_id"]
-    })
+    contact = await contact_repo.get(current_user["user_id"], reminder.contact_id)
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
     
@@ -326,57 +500,72 @@ async def create_reminder(reminder: ReminderCreate, current_user: dict = Depends
         "user_id": current_user["user_id"],
         **reminder.dict(),
         "status": "active",
+        "next_fire_at": compute_next_fire_at(
+            reminder.occasion_date, reminder.reminder_days_before, reminder.is_recurring
+        ),
         "created_at": datetime.utcnow().isoformat()
     }
-    reminders_collection.insert_one(reminder_data)
+    await reminder_repo.create(reminder_data)
     return {"reminder_id": reminder_id, "message": "Reminder created successfully"}
 
 @app.get("/api/reminders")
-async def get_reminders(current_user: dict = Depends(get_current_user)):
-    reminders = list(reminders_collection.find(
-        {"user_id": current_user["user_id"]},
-        {"_id": 0}
-    ))
-    return {"reminders": reminders}
+async def get_reminders(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    fields: Optional[str] = None,
+    include_total: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    not_modified = await conditional_get(request, response, user_stats_repo, current_user["user_id"])
+    if not_modified:
+        return not_modified
+    try:
+        page = await reminder_repo.list_page(
+            current_user["user_id"], sort, limit, cursor, fields, include_total
+        )
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    body = {"reminders": page["items"], "next_cursor": page["next_cursor"]}
+    if include_total:
+        body["total"] = page["total"]
+    return body
 
 @app.get("/api/reminders/upcoming")
-async def get_upcoming_reminders(days: int = 30, current_user: dict = Depends(get_current_user)):
-    reminders = list(reminders_collection.find(
-        {"user_id": current_user["user_id"], "status": "active"},
-        {"_id": 0}
-    ))
-    
-    upcoming = []
+async def get_upcoming_reminders(
+    request: Request,
+    response: Response,
+    days: int = Query(30, ge=1, le=366),
+    current_user: dict = Depends(get_current_user)
+):
+    not_modified = await conditional_get(request, response, user_stats_repo, current_user["user_id"])
+    if not_modified:
+        return not_modified
     today = datetime.utcnow().date()
+    window_start = datetime.combine(today, datetime.min.time())
+    window_end = window_start + timedelta(days=days + 1)
+    
+    await roll_forward(reminder_repo, current_user["user_id"], today)
+    reminders = await reminder_repo.list_upcoming(current_user["user_id"], window_start, window_end)
+    contacts = await contact_repo.get_summaries(
+        current_user["user_id"], {reminder["contact_id"] for reminder in reminders}
+    )
     
     for reminder in reminders:
-        try:
-            occasion_date = datetime.fromisoformat(reminder['occasion_date']).date()
-            reminder_date = occasion_date - timedelta(days=reminder.get('reminder_days_before', 3))
-            
-            if today <= reminder_date <= today + timedelta(days=days):
-                # Get contact info
-                contact = contacts_collection.find_one(
-                    {"contact_id": reminder['contact_id']},
-                    {"_id": 0, "name": 1, "email": 1}
-                )
-                reminder['contact_name'] = contact.get('name', 'Unknown') if contact else 'Unknown'
-                reminder['contact_email'] = contact.get('email', '') if contact else ''
-                reminder['days_until'] = (reminder_date - today).days
-                upcoming.append(reminder)
-        except:
-            continue
-    
-    upcoming.sort(key=lambda x: x.get('days_until', 999))
-    return {"upcoming_reminders": upcoming}
+        contact = contacts.get(reminder["contact_id"])
+        reminder['contact_name'] = contact.get('name', 'Unknown') if contact else 'Unknown'
+        reminder['contact_email'] = contact.get('email', '') if contact else ''
+        reminder['days_until'] = (reminder["next_fire_at"].date() - today).days
+    
+    return {"upcoming_reminders": reminders}
 
 @app.delete("/api/reminders/{reminder_id}")
 async def delete_reminder(reminder_id: str, current_user: dict = Depends(get_current_user)):
-    result = reminders_collection.delete_one({
-        "reminder_id": reminder_id,
-        "user_id": current_user["user_id"]
-    })
-    if result.deleted_count == 0:
+    deleted = await reminder_repo.delete(current_user["user_id"], reminder_id)
+    if deleted == 0:
         raise HTTPException(status_code=404, detail="Reminder not found")
     return {"message": "Reminder deleted successfully"}
 
@@ -384,30 +573,20 @@ async def delete_reminder(reminder_id: str, current_user: dict = Depends(get_cur
 @app.post("/api/messages/generate")
 async def generate_message(message_request: MessageGenerate, current_user: dict = Depends(get_current_user)):
     # Get contact info
-    contact = contacts_collection.find_one(
-        {"contact_id": message_request.contact_id, "user_id": current_user["user_id"]},
-        {"_id": 0}
-    )
+    contact = await contact_repo.get(current_user["user_id"], message_request.contact_id)
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
     
-    # Import AI service
-    try:
-        from ai_service import ai_generator
-        
-        # Generate message using AI
-        message = await ai_generator.generate_message(
-            contact_name=contact['name'],
-            occasion_type=message_request.occasion_type,
-            tone=message_request.tone,
-            custom_context=message_request.custom_context,
-            relationship=contact.get('relationship'),
-            notes=contact.get('notes')
-        )
-    except Exception as e:
-        print(f"AI generation failed: {e}")
-        # Fallback to simple template
-        message = f"Hi {contact['name']}! Hope you're doing well. Looking forward to catching up soon!"
+    # Falls back to a template when the AI is unavailable
+    message = await ai_generator.generate_message(
+        contact_name=contact['name'],
+        occasion_type=message_request.occasion_type,
+        tone=message_request.tone,
+        custom_context=message_request.custom_context,
+        relationship=contact.get('relationship'),
+        notes=contact.get('notes'),
+        force_regenerate=message_request.force_regenerate
+    )
     
     # Save generated message
     message_id = str(uuid.uuid4())
@@ -420,55 +599,128 @@ async def generate_message(message_request: MessageGenerate, current_user: dict
         "generated_message": message,
         "created_at": datetime.utcnow().isoformat()
     }
-    messages_collection.insert_one(message_data)
+    await message_repo.create(message_data)
     
     return {"message": message, "message_id": message_id}
 
+@app.post("/api/messages/generate/stream")
+async def generate_message_stream(message_request: MessageGenerate, current_user: dict = Depends(get_current_user)):
+    contact = await contact_repo.get(current_user["user_id"], message_request.contact_id)
+    if not contact:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    
+    async def events():
+        # "token" events carry text as it is generated; "done" carries the
+        # saved message, which replaces the streamed text if the AI failed midway
+        parts = []
+        replaced = False
+        try:
+            async for text in ai_generator.stream_message(
+                contact_name=contact['name'],
+                occasion_type=message_request.occasion_type,
+                tone=message_request.tone,
+                custom_context=message_request.custom_context,
+                relationship=contact.get('relationship'),
+                notes=contact.get('notes'),
+                force_regenerate=message_request.force_regenerate
+            ):
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+            message = "".join(parts)
+        except Exception:
+            replaced = True
+            message = ai_generator.fallback_message(
+                contact['name'], message_request.occasion_type, message_request.tone
+            )
+        
+        message_id = str(uuid.uuid4())
+        await message_repo.create({
+            "message_id": message_id,
+            "user_id": current_user["user_id"],
+            "contact_id": message_request.contact_id,
+            "occasion_type": message_request.occasion_type,
+            "tone": message_request.tone,
+            "generated_message": message,
+            "created_at": datetime.utcnow().isoformat()
+        })
+        yield sse_event("done", {"message": message, "message_id": message_id, "replaced": replaced})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/api/messages/generate/batch")
+async def generate_messages_batch(
+    batch: MessageGenerateBatch,
+    stream: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    if batch.items:
+        if len(batch.items) > MAX_BATCH_ITEMS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ITEMS} items per batch")
+        items = [item.dict() for item in batch.items]
+    elif batch.due_within_days is not None:
+        await roll_forward(reminder_repo, current_user["user_id"])
+        items = await items_due(current_user["user_id"], batch.due_within_days, batch.tone, reminder_repo)
+    else:
+        raise HTTPException(status_code=400, detail="Provide items or due_within_days")
+    
+    results = generate_batch(
+        current_user["user_id"], items, ai_generator, contact_repo, message_repo, batch.force_regenerate
+    )
+    
+    # Newline-delimited JSON, one line per draft in completion order
+    if stream:
+        async def lines():
+            async for result in results:
+                yield json.dumps(result) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    collected = [result async for result in results]
+    collected.sort(key=lambda result: result["index"])
+    return {"results": collected, "generated": sum(1 for result in collected if "message" in result)}
+
 # Analytics Routes
 @app.get("/api/analytics/stale-contacts")
 async def get_stale_contacts(months: int = 3, current_user: dict = Depends(get_current_user)):
     cutoff_date = datetime.utcnow() - timedelta(days=months * 30)
     
-    contacts = list(contacts_collection.find(
-        {
-            "user_id": current_user["user_id"],
-            "$or": [
-                {"last_contacted": {"$lt": cutoff_date.isoformat()}},
-                {"last_contacted": None}
-            ]
-        },
-        {"_id": 0}
-    ))
+    contacts = await contact_repo.list_stale(current_user["user_id"], cutoff_date.isoformat())
     
     return {"stale_contacts": contacts, "count": len(contacts)}
 
 @app.get("/api/analytics/dashboard")
-async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
-    total_contacts = contacts_collection.count_documents({"user_id": current_user["user_id"]})
-    total_reminders = reminders_collection.count_documents({"user_id": current_user["user_id"], "status": "active"})
-    
-    # Get upcoming events (next 7 days)
-    upcoming = await get_upcoming_reminders(7, current_user)
-    
-    # Get stale contacts (3+ months)
-    stale = await get_stale_contacts(3, current_user)
-    
-    return {
-        "total_contacts": total_contacts,
-        "total_reminders": total_reminders,
-        "upcoming_events_count": len(upcoming["upcoming_reminders"]),
-        "stale_contacts_count": stale["count"]
-    }
-
-# Email sending route (placeholder)
-@app.post("/api/email/send")
+async def get_dashboard_stats(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
+    not_modified = await conditional_get(request, response, user_stats_repo, current_user["user_id"])
+    if not_modified:
+        return not_modified
+    return await get_dashboard(current_user["user_id"], contact_repo, reminder_repo, user_stats_repo)
+
+# Email Routes
+@app.post("/api/email/send", status_code=status.HTTP_202_ACCEPTED)
 async def send_email(email_data: EmailSend, current_user: dict = Depends(get_current_user)):
-    # Placeholder for email sending (will implement SMTP later)
-    return {
-        "message": "Email sending is configured as placeholder. Add SMTP credentials to .env file.",
-        "to": email_data.to_email,
-        "subject": email_data.subject
-    }
+    if smtp_pool is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Email delivery is not configured. Add SMTP credentials to .env file."
+        )
+    try:
+        email = await enqueue_email(
+            email_repo,
+            current_user["user_id"],
+            email_data.to_email,
+            email_data.subject,
+            email_data.body,
+            email_data.message_id
+        )
+    except EmailRateLimited as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    return {"email_id": email["email_id"], "status": email["status"], "message": "Email queued"}
+
+@app.get("/api/email/{email_id}")
+async def get_email_status(email_id: str, current_user: dict = Depends(get_current_user)):
+    email = await email_repo.get(current_user["user_id"], email_id)
+    if not email:
+        raise HTTPException(status_code=404, detail="Email not found")
+    return email
 
 if __name__ == "__main__":
     import uvicorn
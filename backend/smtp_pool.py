@@ -0,0 +1,98 @@
+"""
+Pooled SMTP sessions
+
+Up to `size` authenticated sessions are kept open and reused across
+messages instead of connecting (and negotiating TLS and AUTH) per email.
+A session is retired after `max_messages` messages, when the server drops
+it, or when a send on it fails.
+"""
+import asyncio
+from email.message import EmailMessage
+from typing import List, Optional, Tuple
+
+from aiosmtplib import SMTP, SMTPServerDisconnected
+
+
+class SMTPPool:
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        size: int = 4,
+        max_messages: int = 100,
+        timeout: float = 30
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = size
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self._idle: List[Tuple[SMTP, int]] = []
+        self._semaphore = asyncio.Semaphore(size)
+        self.connections_opened = 0
+        self.messages_sent = 0
+
+    async def _connect(self) -> SMTP:
+        # STARTTLS is negotiated automatically when the server offers it,
+        # and AUTH runs during connect when credentials are set
+        smtp = SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username or None,
+            password=self.password or None,
+            use_tls=self.use_tls,
+            timeout=self.timeout
+        )
+        await smtp.connect()
+        self.connections_opened += 1
+        return smtp
+
+    @staticmethod
+    async def _close(smtp: SMTP) -> None:
+        try:
+            await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def send(self, message: EmailMessage) -> None:
+        async with self._semaphore:
+            smtp, used = self._idle.pop() if self._idle else (None, 0)
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp, used = await self._connect(), 0
+                try:
+                    await smtp.send_message(message)
+                except SMTPServerDisconnected:
+                    # Servers drop idle sessions; retry once on a fresh one
+                    smtp, used = await self._connect(), 0
+                    await smtp.send_message(message)
+            except BaseException:
+                if smtp is not None:
+                    await self._close(smtp)
+                raise
+
+            used += 1
+            self.messages_sent += 1
+            if used >= self.max_messages:
+                await self._close(smtp)
+            else:
+                self._idle.append((smtp, used))
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            await self._close(smtp)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "connections_opened": self.connections_opened,
+            "messages_sent": self.messages_sent
+        }
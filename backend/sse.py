@@ -0,0 +1,15 @@
+"""
+Server-Sent Events helpers
+"""
+import json
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the stream
+    "X-Accel-Buffering": "no"
+}
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one SSE event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,56 @@
+"""
+Identical concurrent generations share one model call (see single_flight.py)
+
+Runs offline against the stub provider.
+"""
+import asyncio
+
+from ai_service import AIMessageGenerator
+from llm_providers import StubProvider
+
+CONCURRENCY = 20
+REQUEST = {"contact_name": "Alex", "occasion_type": "birthday", "tone": "friendly"}
+
+
+def generate_concurrently(generator: AIMessageGenerator, **options) -> list:
+    async def run():
+        return await asyncio.gather(*(
+            generator.generate_message(**REQUEST, **options) for _ in range(CONCURRENCY)
+        ))
+
+    return asyncio.run(run())
+
+
+def test_concurrent_identical_requests_share_one_call():
+    provider = StubProvider(latency=0.05, failure_rate=0, item_latency=0)
+    generator = AIMessageGenerator(provider=provider)
+
+    messages = generate_concurrently(generator)
+
+    assert provider.calls == 1
+    assert len(set(messages)) == 1
+    assert generator.in_flight.coalesced == CONCURRENCY - 1
+
+
+def test_later_request_calls_the_model_again():
+    provider = StubProvider(latency=0.05, failure_rate=0, item_latency=0)
+    generator = AIMessageGenerator(provider=provider)
+
+    generate_concurrently(generator)
+    # Nothing is cached and the shared call has finished
+    asyncio.run(generator.generate_message(**REQUEST))
+    assert provider.calls == 2
+
+    generate_concurrently(generator, force_regenerate=True)
+    assert provider.calls == 3
+
+
+def test_shared_failure_falls_back_for_every_caller():
+    provider = StubProvider(latency=0.05, failure_rate=1, item_latency=0)
+    generator = AIMessageGenerator(provider=provider)
+
+    messages = generate_concurrently(generator)
+
+    assert provider.calls == 1
+    assert messages == [generator.fallback_message(**REQUEST)] * CONCURRENCY
+    assert generator.fallbacks == CONCURRENCY
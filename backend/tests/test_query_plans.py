@@ -0,0 +1,43 @@
+"""
+Every hot query must be served by an index
+
+Runs `python indexes.py --verify` against a real server: MONGO_TEST_URL
+names a throwaway database, which is dropped afterwards. Skipped when no
+server answers there.
+"""
+import asyncio
+import os
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from database import Database
+from indexes import ensure_indexes, verify_query_plans
+
+MONGO_TEST_URL = os.getenv("MONGO_TEST_URL", "mongodb://localhost:27017/remindme_test")
+
+
+@pytest.fixture
+def mongo_url() -> str:
+    client = MongoClient(MONGO_TEST_URL, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        pytest.skip(f"No MongoDB at MONGO_TEST_URL: {e}")
+    finally:
+        client.close()
+    return MONGO_TEST_URL
+
+
+def test_hot_queries_use_an_index(mongo_url):
+    async def collscans():
+        db = Database(mongo_url, driver="motor")
+        try:
+            await ensure_indexes(db)
+            return await verify_query_plans(db)
+        finally:
+            await db.client.drop_database(db.client.get_database().name)
+            db.close()
+
+    assert asyncio.run(collscans()) == []
@@ -0,0 +1,84 @@
+"""
+Dashboard statistics from materialized per-user counters
+
+Total contacts and active reminders are read from the user_stats document
+that contact and reminder writes keep current with $inc (see
+UserStatsRepository). A counter document missing or older than
+USER_STATS_RECONCILE_SECONDS is rebuilt from a recount when the dashboard
+is read, which also repairs any drift from lost increments.
+
+The stale-contact and upcoming-event counts depend on the current date, so
+they cannot be kept as counters; they are index-only counts over the
+(user_id, last_contacted) and (user_id, status, next_fire_at) indexes.
+"""
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from reminder_schedule import roll_forward
+from repositories import ContactRepository, ReminderRepository, UserStatsRepository
+
+USER_STATS_RECONCILE_SECONDS = float(os.getenv("USER_STATS_RECONCILE_SECONDS", "21600"))
+DASHBOARD_UPCOMING_DAYS = 7
+DASHBOARD_STALE_MONTHS = 3
+
+
+async def reconcile(
+    user_id: str,
+    contact_repo: ContactRepository,
+    reminder_repo: ReminderRepository,
+    stats_repo: UserStatsRepository
+) -> dict:
+    """Replace a user's counters with a fresh recount and return them"""
+    contacts, active_reminders = await asyncio.gather(
+        contact_repo.count_for_user(user_id),
+        reminder_repo.count_active(user_id)
+    )
+    counts = {"contacts": contacts, "active_reminders": active_reminders}
+    await stats_repo.replace_counts(user_id, counts, datetime.utcnow())
+    return counts
+
+
+async def get_dashboard(
+    user_id: str,
+    contact_repo: ContactRepository,
+    reminder_repo: ReminderRepository,
+    stats_repo: UserStatsRepository,
+    today: Optional[date] = None
+) -> dict:
+    """
+    Dashboard totals for one user
+
+    Returns:
+        total_contacts, total_reminders, upcoming_events_count (next 7 days)
+        and stale_contacts_count (not contacted for 3+ months)
+    """
+    today = today or datetime.utcnow().date()
+    window_start = datetime.combine(today, datetime.min.time())
+    window_end = window_start + timedelta(days=DASHBOARD_UPCOMING_DAYS + 1)
+    # Whole days, so the dashboard only changes with the data or the date (see etags.py)
+    stale_cutoff = (window_start - timedelta(days=DASHBOARD_STALE_MONTHS * 30)).isoformat()
+
+    async def counters() -> dict:
+        stats = await stats_repo.get(user_id)
+        reconcile_before = datetime.utcnow() - timedelta(seconds=USER_STATS_RECONCILE_SECONDS)
+        if not stats or stats.get("reconciled_at", datetime.min) < reconcile_before:
+            return await reconcile(user_id, contact_repo, reminder_repo, stats_repo)
+        return stats
+
+    async def upcoming() -> int:
+        await roll_forward(reminder_repo, user_id, today)
+        return await reminder_repo.count_upcoming(user_id, window_start, window_end)
+
+    stats, upcoming_count, stale_count = await asyncio.gather(
+        counters(),
+        upcoming(),
+        contact_repo.count_stale(user_id, stale_cutoff)
+    )
+    return {
+        "total_contacts": stats.get("contacts", 0),
+        "total_reminders": stats.get("active_reminders", 0),
+        "upcoming_events_count": upcoming_count,
+        "stale_contacts_count": stale_count
+    }
@@ -4,13 +4,22 @@ import { toast } from 'react-toastify';
 import { contactAPI } from '../utils/api';
 import { FiPlus, FiSearch, FiUpload, FiMail, FiPhone, FiUser, FiX } from 'react-icons/fi';
 
+// Files above this size are imported as a background job to avoid request timeouts
+const BACKGROUND_IMPORT_BYTES = 2 * 1024 * 1024;
+const IMPORT_POLL_INTERVAL_MS = 2000;
+const SEARCH_DEBOUNCE_MS = 250;
+const CONTACTS_PAGE_SIZE = 60;
+
 const Contacts = () => {
   const [contacts, setContacts] = useState([]);
   const [filteredContacts, setFilteredContacts] = useState([]);
   const [searchQuery, setSearchQuery] = useState('');
   const [showAddModal, setShowAddModal] = useState(false);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const fileInputRef = useRef(null);
+  const searchRequest = useRef(0);
 
   const [formData, setFormData] = useState({
     name: '',
@@ -26,15 +35,35 @@ const Contacts = () => {
     fetchContacts();
   }, []);
 
+  // Searches run on the server once typing pauses
   useEffect(() => {
-    filterContacts();
+    const request = ++searchRequest.current;
+    if (!searchQuery.trim()) {
+      setFilteredContacts(contacts);
+      return;
+    }
+
+    const timer = setTimeout(async () => {
+      try {
+        const response = await contactAPI.search(searchQuery);
+        // Ignore responses to queries the user has typed past
+        if (request === searchRequest.current) {
+          setFilteredContacts(response.data.contacts);
+        }
+      } catch (error) {
+        console.error(error);
+      }
+    }, SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
   }, [searchQuery, contacts]);
 
+  // Loads the first page; further pages are fetched on demand and searches
+  // go to the server, so the full contact list is never downloaded
   const fetchContacts = async () => {
     try {
-      const response = await contactAPI.getAll();
+      const response = await contactAPI.getPage({ limit: CONTACTS_PAGE_SIZE });
       setContacts(response.data.contacts);
-      setFilteredContacts(response.data.contacts);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       toast.error('Failed to load contacts');
       console.error(error);
@@ -43,19 +72,18 @@ const Contacts = () => {
     }
   };
 
-  const filterContacts = () => {
-    if (!searchQuery.trim()) {
-      setFilteredContacts(contacts);
-      return;
+  const loadMoreContacts = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await contactAPI.getPage({ limit: CONTACTS_PAGE_SIZE, cursor: nextCursor });
+      setContacts((loaded) => [...loaded, ...response.data.contacts]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      toast.error('Failed to load more contacts');
+      console.error(error);
+    } finally {
+      setLoadingMore(false);
     }
-
-    const query = searchQuery.toLowerCase();
-    const filtered = contacts.filter(contact =>
-      contact.name.toLowerCase().includes(query) ||
-      contact.email?.toLowerCase().includes(query) ||
-      contact.relationship?.toLowerCase().includes(query)
-    );
-    setFilteredContacts(filtered);
   };
 
   const handleAddContact = async (e) => {
@@ -80,13 +108,36 @@ const Contacts = () => {
     }
   };
 
+  const waitForImportJob = async (jobId) => {
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, IMPORT_POLL_INTERVAL_MS));
+      const { data: job } = await contactAPI.getImportJob(jobId);
+      if (job.status === 'failed') throw new Error(job.error);
+      if (job.status === 'completed') {
+        return { imported: job.rows_imported, failed: job.rows_failed };
+      }
+    }
+  };
+
   const handleCSVImport = async (e) => {
     const file = e.target.files[0];
     if (!file) return;
 
     try {
-      await contactAPI.importCSV(file);
-      toast.success('Contacts imported successfully!');
+      let result;
+      if (file.size > BACKGROUND_IMPORT_BYTES) {
+        toast.info('Large file: importing in the background...');
+        const response = await contactAPI.importCSV(file, true);
+        result = await waitForImportJob(response.data.job_id);
+      } else {
+        result = (await contactAPI.importCSV(file)).data;
+      }
+      const { imported, failed } = result;
+      if (failed) {
+        toast.warning(`Imported ${imported} contacts, ${failed} rows skipped`);
+      } else {
+        toast.success('Contacts imported successfully!');
+      }
       fetchContacts();
     } catch (error) {
       toast.error('Failed to import contacts');
@@ -223,6 +274,19 @@ const Contacts = () => {
         </div>
       )}
 
+      {!searchQuery.trim() && nextCursor && (
+        <div className="mt-8 text-center">
+          <button
+            onClick={loadMoreContacts}
+            disabled={loadingMore}
+            data-testid="load-more-contacts-button"
+            className="px-6 py-2 bg-white border border-gray-300 text-gray-700 rounded-lg hover:bg-gray-50 transition-colors disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
+
       {/* Add Contact Modal */}
       {showAddModal && (
         <div className="fixed inset-0 bg-black bg-opacity-50 flex items-center justify-center z-50 p-4">
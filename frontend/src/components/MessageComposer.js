@@ -14,6 +14,9 @@ const MessageComposer = () => {
   const [editedMessage, setEditedMessage] = useState('');
   const [loading, setLoading] = useState(false);
   const [sending, setSending] = useState(false);
+  const [messageId, setMessageId] = useState(null);
+  // Settings of the last draft; asking again with the same settings bypasses the server cache
+  const [lastSettings, setLastSettings] = useState(null);
 
   useEffect(() => {
     fetchContact();
@@ -31,14 +34,25 @@ const MessageComposer = () => {
 
   const handleGenerateMessage = async () => {
     setLoading(true);
+    const settings = `${occasionType}|${tone}`;
     try {
-      const response = await messageAPI.generate({
+      let streamed = '';
+      setGeneratedMessage('');
+      setEditedMessage('');
+      const result = await messageAPI.generateStream({
         contact_id: contactId,
         occasion_type: occasionType,
-        tone: tone
+        tone: tone,
+        force_regenerate: settings === lastSettings
+      }, (text) => {
+        streamed += text;
+        setGeneratedMessage(streamed);
+        setEditedMessage(streamed);
       });
-      setGeneratedMessage(response.data.message);
-      setEditedMessage(response.data.message);
+      setLastSettings(settings);
+      setMessageId(result.message_id);
+      setGeneratedMessage(result.message);
+      setEditedMessage(result.message);
       toast.success('Message generated successfully!');
     } catch (error) {
       toast.error('Failed to generate message');
@@ -64,12 +78,19 @@ const MessageComposer = () => {
       await messageAPI.sendEmail({
         to_email: contact.email,
         subject: `${occasionType.charAt(0).toUpperCase() + occasionType.slice(1)} Message`,
-        body: editedMessage
+        body: editedMessage,
+        message_id: messageId
       });
-      toast.info('Email feature is configured as placeholder. Message copied to clipboard instead.');
-      handleCopyMessage();
+      toast.success(`Email to ${contact.email} queued for delivery`);
     } catch (error) {
-      toast.error('Failed to send email');
+      if (error.response?.status === 503) {
+        toast.info('Email delivery is not configured. Message copied to clipboard instead.');
+        handleCopyMessage();
+      } else if (error.response?.status === 429) {
+        toast.error('Hourly email limit reached, please try again later');
+      } else {
+        toast.error('Failed to send email');
+      }
       console.error(error);
     } finally {
       setSending(false);
@@ -166,8 +187,8 @@ const MessageComposer = () => {
           />
 
           <div className="mt-4 text-sm text-gray-600 bg-indigo-50 p-3 rounded-lg">
-            <strong>Note:</strong> This is a template message. Email sending requires SMTP configuration. 
-            For now, you can copy the message and send it manually.
+            <strong>Note:</strong> Review the message before sending. If email delivery is not configured,
+            the message is copied to your clipboard so you can send it manually.
           </div>
         </div>
       )}
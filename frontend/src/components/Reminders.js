@@ -29,7 +29,7 @@ const Reminders = () => {
     try {
       const [remindersRes, contactsRes] = await Promise.all([
         reminderAPI.getAll(),
-        contactAPI.getAll()
+        contactAPI.getAll({ fields: 'contact_id,name' })
       ]);
       setReminders(remindersRes.data.reminders);
       setContacts(contactsRes.data.contacts);
@@ -34,33 +34,99 @@ export const authAPI = {
   getMe: () => api.get('/api/auth/me')
 };
 
+// Follow next_cursor until a paginated listing is exhausted, returning the
+// same { data: { [key]: [...] } } shape as a single unpaginated response
+const fetchAllPages = async (path, key, params = {}) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const response = await api.get(path, {
+      params: { ...params, limit: 500, ...(cursor ? { cursor } : {}) }
+    });
+    items.push(...response.data[key]);
+    cursor = response.data.next_cursor;
+  } while (cursor);
+  return { data: { [key]: items } };
+};
+
 // Contact APIs
 export const contactAPI = {
-  getAll: () => api.get('/api/contacts'),
+  getPage: (params = {}) => api.get('/api/contacts', { params }),
+  getAll: (params = {}) => fetchAllPages('/api/contacts', 'contacts', params),
+  search: (q, params = {}) => api.get('/api/contacts/search', { params: { q, ...params } }),
   getOne: (id) => api.get(`/api/contacts/${id}`),
   create: (data) => api.post('/api/contacts', data),
   update: (id, data) => api.put(`/api/contacts/${id}`, data),
   delete: (id) => api.delete(`/api/contacts/${id}`),
-  importCSV: (file) => {
+  importCSV: (file, background = false) => {
     const formData = new FormData();
     formData.append('file', file);
-    return api.post('/api/contacts/import/csv', formData, {
+    return api.post(`/api/contacts/import/csv?background=${background}`, formData, {
       headers: { 'Content-Type': 'multipart/form-data' }
     });
-  }
+  },
+  getImportJob: (jobId) => api.get(`/api/contacts/import/jobs/${jobId}`)
 };
 
 // Reminder APIs
 export const reminderAPI = {
-  getAll: () => api.get('/api/reminders'),
+  getPage: (params = {}) => api.get('/api/reminders', { params }),
+  getAll: (params = {}) => fetchAllPages('/api/reminders', 'reminders', params),
   getUpcoming: (days = 30) => api.get(`/api/reminders/upcoming?days=${days}`),
   create: (data) => api.post('/api/reminders', data),
   delete: (id) => api.delete(`/api/reminders/${id}`)
 };
 
+// Parse a text/event-stream response body, calling onEvent(event, data) per event
+const readEventStream = async (response, onEvent) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = 'message';
+      let data = '';
+      block.split('\n').forEach((line) => {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      });
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+};
+
 // Message APIs
 export const messageAPI = {
   generate: (data) => api.post('/api/messages/generate', data),
+  // Streams the draft: onToken(text) per chunk, resolves with { message, message_id, replaced }
+  generateStream: async (data, onToken) => {
+    const response = await fetch(`${BACKEND_URL}/api/messages/generate/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Authorization: api.defaults.headers.common['Authorization']
+      },
+      body: JSON.stringify(data)
+    });
+    if (!response.ok) {
+      throw new Error(`Message generation failed (${response.status})`);
+    }
+    let result = null;
+    await readEventStream(response, (event, payload) => {
+      if (event === 'token') onToken(payload.text);
+      else if (event === 'done') result = payload;
+    });
+    if (!result) {
+      throw new Error('Message stream ended unexpectedly');
+    }
+    return result;
+  },
   sendEmail: (data) => api.post('/api/email/send', data)
 };
 